@@ -5,6 +5,8 @@ from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
 from starlette.middleware.sessions import SessionMiddleware
+from contextlib import asynccontextmanager
+import asyncio
 import logging
 
 
@@ -24,7 +26,19 @@ from app.routers import (
     auth_google,
 )
 from app.db.mongo import client, verify_mongodb_connection
+from app.db.indexes import ensure_indexes
+from app.db.pinecone import ensure_index
 from app.core.config import settings
+from app.core.logger import logger
+from app.core.outbound import CircuitOpenError
+from app.services.specialist_profiles import specialist_profiles, close_async_specialist_index
+from app.services.appointment_sync import appointment_dispatcher, bulk_resync
+from app.services.feegow import close_feegow
+from app.services.kommo import kommo_leads
+from app.services.kommo_client import kommo_client
+from app.services.sheets_exporter import sheet_exporter
+from app.services.transcription import audio_chat_jobs
+from app.utils.email import email_dispatcher
 
 
 def format_error_response(exc: Exception, status_code: int = 500):
@@ -38,10 +52,55 @@ def format_error_response(exc: Exception, status_code: int = 500):
     }
 
 
+# ─── LIFECYCLE ─────────────────────────────────────────────────────────
+async def warm_up():
+    """
+    Connection checks and cache loads that used to run at import time. Runs in
+    the background so the server accepts requests immediately; every client is
+    also created lazily, so a failure here only costs the first request.
+    """
+    async def step(name, make):
+        try:
+            await make()
+        except Exception as e:
+            logger.warning(f"Startup warm-up of {name} failed: {e}")
+
+    await asyncio.gather(
+        step("MongoDB", verify_mongodb_connection),
+        step("MongoDB indexes", ensure_indexes),
+        step("Pinecone index", lambda: asyncio.to_thread(ensure_index)),
+        step("specialist directory", specialist_profiles.ensure_loaded),
+        step("Kommo token", kommo_client.access_token),
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The process-wide Mongo client: connected by the warm-up ping, closed last on shutdown
+    app.state.mongo = client
+    app.state.warm_up = asyncio.create_task(warm_up())
+    appointment_dispatcher.start()
+    sheet_exporter.start()
+    email_dispatcher.start()
+    yield
+    app.state.warm_up.cancel()
+    await bulk_resync.close()
+    await appointment_dispatcher.stop()
+    await close_feegow()
+    await kommo_leads.close()
+    await kommo_client.aclose()
+    await sheet_exporter.stop()
+    await email_dispatcher.stop()
+    await audio_chat_jobs.close()
+    await close_async_specialist_index()
+    client.close()
+
+
 app = FastAPI(
     title="Healthcare AI Assistant",
     version="0.1.0",
     description="Backend for the Healthcare AI chatbot platform",
+    lifespan=lifespan,
 )
 
 # ─── CORS ────────────────────────────────────────────────────────────────
@@ -65,15 +124,6 @@ app.add_middleware(
     https_only=True,                 # ensure Secure cookie in prod
 )
 
-# ─── LIFECYCLE ─────────────────────────────────────────────────────────
-@app.on_event("startup")
-async def on_startup():
-    await verify_mongodb_connection()
-
-@app.on_event("shutdown")
-async def on_shutdown():
-    client.close()
-
 # ─── HEALTH CHECK ────────────────────────────────────────────────────────
 @app.get("/", tags=["root"], summary="Health check")
 async def root():
@@ -94,6 +144,14 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         content=format_error_response(exc, 422),
     )
 
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_handler(request: Request, exc: CircuitOpenError):
+    return JSONResponse(
+        status_code=503,
+        content=format_error_response(exc, 503),
+        headers={"Retry-After": str(max(1, int(exc.retry_in)))},
+    )
+
 @app.exception_handler(Exception)
 async def generic_exception_handler(request: Request, exc: Exception):
     return JSONResponse(
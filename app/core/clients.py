@@ -0,0 +1,54 @@
+# app/core/clients.py
+
+"""
+Process-wide API clients, created on first use. Importing the app must not
+open connections or pull in the heavy SDKs, so every client is built here
+lazily and shared.
+"""
+
+from functools import lru_cache
+
+from app.core.config import settings
+from app.core.outbound import POLICIES, async_transport, sync_transport
+
+OPENAI_MAX_RETRIES = 2   # the SDK retries 429/5xx itself, POSTs included
+# Pass as `_request_timeout` on every sync Pinecone call: the SDK has no client-wide
+# timeout, and a call abandoned by asyncio.wait_for keeps its worker thread until it returns
+PINECONE_REQUEST_TIMEOUT = POLICIES["pinecone"].timeout
+FIRECRAWL_SCRAPE_TIMEOUT_MS = int((POLICIES["firecrawl"].timeout - 10) * 1000)   # the SDK adds 5s of HTTP slack
+
+
+@lru_cache(maxsize=1)
+def get_openai():
+    from openai import DefaultHttpxClient, OpenAI
+    return OpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        base_url=settings.OPENAI_BASE_URL,
+        timeout=POLICIES["openai"].timeout,
+        max_retries=OPENAI_MAX_RETRIES,
+        http_client=DefaultHttpxClient(transport=sync_transport("openai")),
+    )
+
+
+@lru_cache(maxsize=1)
+def get_async_openai():
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+    return AsyncOpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        base_url=settings.OPENAI_BASE_URL,
+        timeout=POLICIES["openai"].timeout,
+        max_retries=OPENAI_MAX_RETRIES,
+        http_client=DefaultAsyncHttpxClient(transport=async_transport("openai")),
+    )
+
+
+@lru_cache(maxsize=1)
+def get_pinecone():
+    from pinecone import Pinecone
+    return Pinecone(api_key=settings.PINECONE_API_KEY)
+
+
+@lru_cache(maxsize=1)
+def get_firecrawl():
+    from firecrawl import FirecrawlApp
+    return FirecrawlApp(api_key=settings.FIRECRAWL_API_KEY)
@@ -14,6 +14,15 @@ class Settings(BaseSettings):
     # MongoDB settings
     MONGODB_URI: str = Field(default="mongodb://localhost:27017", env="MONGODB_URI")
     MONGODB_DB: str = Field(default="healthcare", env="MONGODB_DB")
+    # Connection pool, per worker process
+    MONGODB_MAX_POOL_SIZE: int = Field(default=50, env="MONGODB_MAX_POOL_SIZE")
+    MONGODB_MIN_POOL_SIZE: int = Field(default=5, env="MONGODB_MIN_POOL_SIZE")
+    MONGODB_MAX_IDLE_TIME_MS: int = Field(default=60_000, env="MONGODB_MAX_IDLE_TIME_MS")
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = Field(default=5_000, env="MONGODB_SERVER_SELECTION_TIMEOUT_MS")
+    MONGODB_CONNECT_TIMEOUT_MS: int = Field(default=5_000, env="MONGODB_CONNECT_TIMEOUT_MS")
+    MONGODB_SOCKET_TIMEOUT_MS: int = Field(default=30_000, env="MONGODB_SOCKET_TIMEOUT_MS")
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS: int = Field(default=5_000, env="MONGODB_WAIT_QUEUE_TIMEOUT_MS")
+    MONGODB_READ_PREFERENCE: str = Field(default="primaryPreferred", env="MONGODB_READ_PREFERENCE")
 
     # OpenAI settings
     OPENAI_API_KEY: str = Field(..., env="OPENAI_API_KEY")
@@ -47,6 +56,9 @@ class Settings(BaseSettings):
     KOMMO_SUBDOMAIN: str = Field(..., env="KOMMO_SUBDOMAIN")  # e.g. yourteam
     KOMMO_REDIRECT_URI: str = Field(default="http://localhost:8000/kommo/auth/callback", env="KOMMO_REDIRECT_URI")
     
+    # AssemblyAI (voice notes)
+    ASSEMBLYAI_API_KEY: Optional[str] = Field(default=None, env="ASSEMBLYAI_API_KEY")
+
     GOOGLE_CLIENT_ID: str
     GOOGLE_CLIENT_SECRET: str
     GOOGLE_REDIRECT_URI: str
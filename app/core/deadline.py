@@ -0,0 +1,142 @@
+# app/core/deadline.py
+
+"""
+Per-request time budgets.
+
+A pipeline entry point opens a deadline (`@with_deadline("chat")`), which
+flows to everything it awaits through a context variable. Optional stages,
+like retrieval, run with `degrade()`: they get a slice of what is left and,
+if they miss it, the pipeline carries on without them. Required stages, like
+the LLM call, run with `within_deadline()` and raise DeadlineExceeded (504)
+once the budget is spent.
+"""
+
+import asyncio
+import functools
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from app.core.logger import logger
+from app.utils.errors import GatewayTimeoutError
+
+REQUEST_BUDGETS = {
+    "chat": 30.0,
+    "file": 60.0,
+    "image": 45.0,
+    "specialist": 20.0,
+}
+DEFAULT_BUDGET_SECONDS = 30.0
+RETRIEVAL_SHARE = 0.25          # retrieval may use at most this share of the remaining budget
+RETRIEVAL_MAX_SECONDS = 4.0
+
+degraded_stages = Counter()
+exceeded_stages = Counter()
+
+
+class Deadline:
+    def __init__(self, name: str, seconds: float, clock=time.monotonic):
+        self.name = name
+        self.budget = seconds
+        self.clock = clock
+        self.expires_at = clock() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - self.clock())
+
+
+class DeadlineExceeded(GatewayTimeoutError):
+    def __init__(self, deadline: Deadline, stage: str):
+        super().__init__(f"The {deadline.name} request ran out of its {deadline.budget:.0f}s time budget during {stage}.")
+        self.stage = stage
+
+
+_current: ContextVar[Optional[Deadline]] = ContextVar("request_deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+
+@contextmanager
+def request_deadline(name: str, seconds: Optional[float] = None):
+    """Opens a budget; inside an existing one, the tighter of the two wins."""
+    seconds = seconds if seconds is not None else REQUEST_BUDGETS.get(name, DEFAULT_BUDGET_SECONDS)
+    outer = _current.get()
+    if outer is not None and outer.remaining() <= seconds:
+        yield outer
+        return
+    token = _current.set(Deadline(name, seconds))
+    try:
+        yield _current.get()
+    finally:
+        _current.reset(token)
+
+
+def with_deadline(name: str, seconds: Optional[float] = None):
+    """Decorator form of request_deadline for async endpoints and services."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with request_deadline(name, seconds):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def stage_timeout(limit: Optional[float] = None, share: Optional[float] = None) -> Optional[float]:
+    """Seconds a stage may take: its own limit, capped by the remaining budget (or a share of it)."""
+    deadline = _current.get()
+    candidates = [limit] if limit is not None else []
+    if deadline is not None:
+        remaining = deadline.remaining()
+        candidates.append(remaining * share if share is not None else remaining)
+    return min(candidates) if candidates else None
+
+
+async def degrade(stage: str, coro, fallback, limit: Optional[float] = None, share: Optional[float] = None):
+    """Runs an optional stage in its slice of the budget; returns `fallback` if it misses it."""
+    timeout = stage_timeout(limit, share)
+    if timeout is not None and timeout <= 0:
+        coro.close()
+    else:
+        try:
+            return await asyncio.wait_for(coro, timeout)
+        except asyncio.TimeoutError:
+            pass
+    degraded_stages[stage] += 1
+    deadline = _current.get()
+    logger.warning(
+        f"Degraded: skipped {stage} after {timeout or 0:.2f}s"
+        + (f" ({deadline.remaining():.2f}s left of the {deadline.name} budget)" if deadline else "")
+    )
+    return fallback
+
+
+async def within_deadline(stage: str, coro):
+    """Runs a required stage with whatever budget is left; raises DeadlineExceeded past it."""
+    deadline = _current.get()
+    if deadline is None:
+        return await coro
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        coro.close()
+    else:
+        try:
+            return await asyncio.wait_for(coro, remaining)
+        except asyncio.TimeoutError:
+            if deadline.remaining() > 0.01:
+                raise   # the stage's own timeout, not the request budget
+    exceeded_stages[stage] += 1
+    logger.warning(f"Deadline exceeded: {deadline.name} request out of budget during {stage}")
+    raise DeadlineExceeded(deadline, stage)
+
+
+def snapshot() -> dict:
+    return {
+        "budgets": REQUEST_BUDGETS,
+        "degraded": dict(degraded_stages),
+        "exceeded": dict(exceeded_stages),
+    }
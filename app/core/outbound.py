@@ -0,0 +1,343 @@
+# app/core/outbound.py
+
+"""
+Shared policy for every call to a third-party service.
+
+Each dependency (OpenAI, Pinecone, Kommo, ...) gets a timeout, jittered
+retries for idempotent calls, a circuit breaker that fails fast while the
+dependency is down, and a latency histogram plus error counters, exposed on
+/admin/outbound-metrics. Service modules go through `dependency(name)`, or
+through `async_transport(name)` for httpx clients.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional
+
+import httpx
+
+from app.core.logger import logger
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float("inf"))
+
+
+@dataclass(frozen=True)
+class DependencyPolicy:
+    timeout: float                  # seconds per attempt
+    retries: int = 2                # extra attempts, idempotent calls only
+    failure_threshold: int = 5      # consecutive failures that open the breaker
+    reset_after: float = 30.0       # seconds open before a single probe is let through
+    backoff: float = 0.2            # base of the jittered exponential backoff
+
+
+POLICIES: Dict[str, DependencyPolicy] = {
+    "openai": DependencyPolicy(timeout=60, retries=2),
+    "pinecone": DependencyPolicy(timeout=5, retries=2),
+    "kommo": DependencyPolicy(timeout=15),
+    "feegow": DependencyPolicy(timeout=15),
+    "google_drive": DependencyPolicy(timeout=120, retries=0),   # per chunk request; chunks are retried by the client library
+    "google_sheets": DependencyPolicy(timeout=20),
+    "assemblyai": DependencyPolicy(timeout=30),
+    "firecrawl": DependencyPolicy(timeout=60, retries=1),
+    "sendgrid": DependencyPolicy(timeout=15),
+}
+DEFAULT_POLICY = DependencyPolicy(timeout=15)
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the dependency while its breaker is open."""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} is unavailable (circuit open, retry in {retry_in:.0f}s)")
+        self.dependency = name
+        self.retry_in = retry_in
+
+
+class RetryableStatusError(Exception):
+    """An HTTP response that counts as a dependency failure (5xx, 429)."""
+
+    def __init__(self, response: httpx.Response):
+        super().__init__(f"HTTP {response.status_code}")
+        self.response = response
+
+
+def _status_of(exc: BaseException) -> Optional[int]:
+    for source in (exc, getattr(exc, "response", None)):
+        for attr in ("status_code", "status"):
+            value = getattr(source, attr, None)
+            if isinstance(value, int):
+                return value
+    return None
+
+
+def is_dependency_failure(exc: BaseException) -> bool:
+    """Timeouts, connection errors and 5xx/429 count; a 4xx is our request's fault, not the dependency's."""
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError, httpx.TransportError)):
+        return True
+    status = _status_of(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return True
+
+
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        self.total += 1
+        self.sum += seconds
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th observation."""
+        if not self.total:
+            return None
+        rank = q * self.total
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.total,
+            "mean": round(self.sum / self.total, 4) if self.total else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": {("+Inf" if b == float("inf") else str(b)): c for b, c in zip(self.buckets, self.counts)},
+        }
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_after: float, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()   # also used from worker threads
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if self.clock() - self.opened_at >= self.reset_after else "open"
+
+    def retry_in(self) -> float:
+        return max(0.0, self.reset_after - (self.clock() - (self.opened_at or 0)))
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probing:
+                self._probing = True   # one probe at a time; everyone else keeps failing fast
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures, self.opened_at, self._probing = 0, None, False
+
+    def abandon(self) -> None:
+        """A probe that was cancelled proves nothing; let the next caller probe."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self) -> bool:
+        """Returns True when this failure opened (or re-opened) the breaker."""
+        with self._lock:
+            self.failures += 1
+            reopened = self._probing
+            self._probing = False
+            if reopened or (self.opened_at is None and self.failures >= self.failure_threshold):
+                self.opened_at = self.clock()
+                return True
+            return False
+
+
+class Dependency:
+    def __init__(self, name: str, policy: DependencyPolicy):
+        self.name = name
+        self.policy = policy
+        self.breaker = CircuitBreaker(policy.failure_threshold, policy.reset_after)
+        self.latency = LatencyHistogram()
+        self.counters = {"calls": 0, "errors": 0, "timeouts": 0, "retries": 0, "rejected": 0}
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, self.policy.backoff * 2 ** attempt)
+
+    def _admit(self) -> None:
+        if not self.breaker.allow():
+            self.counters["rejected"] += 1
+            raise CircuitOpenError(self.name, self.breaker.retry_in())
+        self.counters["calls"] += 1
+
+    def _record(self, started: float, exc: Optional[BaseException]) -> bool:
+        """Books one attempt; returns True if it was a dependency failure."""
+        self.latency.observe(time.monotonic() - started)
+        if exc is None or not is_dependency_failure(exc):
+            self.breaker.record_success()
+            return False
+        self.counters["errors"] += 1
+        if isinstance(exc, (asyncio.TimeoutError, TimeoutError, httpx.TimeoutException)):
+            self.counters["timeouts"] += 1
+        if self.breaker.record_failure():
+            logger.warning(f"Circuit for {self.name} opened after {self.breaker.failures} failures: {exc}")
+        return True
+
+    async def call(
+        self,
+        fn: Callable[[], Awaitable],
+        idempotent: bool = False,
+        timeout: Optional[float] = None,
+        retry_timeouts: bool = True,
+    ):
+        """Awaits `fn()` under this dependency's timeout, breaker and retry policy."""
+        attempts = 1 + (self.policy.retries if idempotent else 0)
+        for attempt in range(attempts):
+            self._admit()
+            started = time.monotonic()
+            try:
+                result = await asyncio.wait_for(fn(), timeout or self.policy.timeout)
+            except asyncio.CancelledError:
+                self.breaker.abandon()
+                raise
+            except Exception as e:
+                failed = self._record(started, e)
+                abandoned = isinstance(e, asyncio.TimeoutError) and not retry_timeouts
+                if not failed or abandoned or attempt == attempts - 1:
+                    raise
+                self.counters["retries"] += 1
+                await asyncio.sleep(self._backoff(attempt))
+            else:
+                self._record(started, None)
+                return result
+
+    async def run_sync(self, fn: Callable, *args, idempotent: bool = False, timeout: Optional[float] = None, **kwargs):
+        """
+        Runs a blocking SDK call in a worker thread under the same policy. The timeout only
+        stops the wait, not the thread, so the SDK must have its own request timeout too;
+        a timed-out call is not retried, which would pile another thread onto the stuck one.
+        """
+        return await self.call(
+            lambda: asyncio.to_thread(fn, *args, **kwargs), idempotent=idempotent, timeout=timeout, retry_timeouts=False
+        )
+
+    def call_sync(self, fn: Callable[[], object], idempotent: bool = False):
+        """Blocking variant for code already running in a worker thread; relies on the client's own timeout."""
+        attempts = 1 + (self.policy.retries if idempotent else 0)
+        for attempt in range(attempts):
+            self._admit()
+            started = time.monotonic()
+            try:
+                result = fn()
+            except Exception as e:
+                failed = self._record(started, e)
+                if not failed or attempt == attempts - 1:
+                    raise
+                self.counters["retries"] += 1
+                time.sleep(self._backoff(attempt))
+            else:
+                self._record(started, None)
+                return result
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.breaker.state,
+            "timeout": self.policy.timeout,
+            **self.counters,
+            "latency": self.latency.snapshot(),
+        }
+
+
+_dependencies: Dict[str, Dependency] = {}
+
+
+def dependency(name: str) -> Dependency:
+    dep = _dependencies.get(name)
+    if dep is None:
+        dep = _dependencies.setdefault(name, Dependency(name, POLICIES.get(name, DEFAULT_POLICY)))
+    return dep
+
+
+def snapshot() -> dict:
+    return {name: dep.snapshot() for name, dep in sorted(_dependencies.items())}
+
+
+# ---------------------
+# httpx integration
+# ---------------------
+
+class AsyncResilientTransport(httpx.AsyncBaseTransport):
+    """Applies a dependency's policy to every request of an httpx.AsyncClient; only idempotent methods are retried."""
+
+    def __init__(self, dep: Dependency, inner: Optional[httpx.AsyncBaseTransport] = None):
+        self.dependency = dep
+        self.inner = inner or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        async def send():
+            response = await self.inner.handle_async_request(request)
+            if response.status_code in RETRYABLE_STATUS:
+                await response.aread()
+                raise RetryableStatusError(response)
+            return response
+
+        try:
+            return await self.dependency.call(send, idempotent=request.method in IDEMPOTENT_METHODS)
+        except RetryableStatusError as e:
+            return e.response   # out of retries: hand the error response to the caller as usual
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+class ResilientTransport(httpx.BaseTransport):
+    """Blocking counterpart, for SDKs that take a sync httpx client."""
+
+    def __init__(self, dep: Dependency, inner: Optional[httpx.BaseTransport] = None):
+        self.dependency = dep
+        self.inner = inner or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        def send():
+            response = self.inner.handle_request(request)
+            if response.status_code in RETRYABLE_STATUS:
+                response.read()
+                raise RetryableStatusError(response)
+            return response
+
+        try:
+            return self.dependency.call_sync(send, idempotent=request.method in IDEMPOTENT_METHODS)
+        except RetryableStatusError as e:
+            return e.response
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+def async_transport(name: str, **transport_kwargs) -> AsyncResilientTransport:
+    """Transport for an httpx.AsyncClient; pass `limits` here, the client ignores them with a custom transport."""
+    return AsyncResilientTransport(dependency(name), httpx.AsyncHTTPTransport(**transport_kwargs))
+
+
+def sync_transport(name: str, **transport_kwargs) -> ResilientTransport:
+    return ResilientTransport(dependency(name), httpx.HTTPTransport(**transport_kwargs))
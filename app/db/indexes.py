@@ -0,0 +1,134 @@
+# app/db/indexes.py
+
+"""
+Every index the app relies on, declared per collection.
+
+`ensure_indexes()` runs in the startup warm-up and from
+`python -m app.scripts.ensure_indexes`. Creating an index that already
+exists with the same name and options is a no-op, so applying the registry
+is idempotent; an index whose definition changed has to be dropped by hand
+first, which is logged rather than done silently. tests/test_indexes.py
+explains the hot queries against these indexes and fails on a COLLSCAN.
+"""
+
+import asyncio
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from app.core.logger import logger
+from app.db.mongo import db
+from app.services.appointment_sync import APPOINTMENT_TARGETS, SYNC_FLAG_FIELDS, SYNC_FLAGS_INDEX
+from app.services.outbox import OUTBOX_FIELD
+
+DAY = 24 * 3600
+INDEX_CONFLICT_CODES = {85, 86}   # IndexOptionsConflict, IndexKeySpecsConflict
+
+
+def outbox_due_index(target: str) -> IndexModel:
+    """Serves the dispatcher's claim query and the dead-letter listing of a target."""
+    prefix = f"{OUTBOX_FIELD}.{target}"
+    return IndexModel(
+        [(f"{prefix}.status", ASCENDING), (f"{prefix}.next_attempt_at", ASCENDING)], name=f"{target}_outbox_due"
+    )
+
+
+def resync_job_index(target: str) -> IndexModel:
+    return IndexModel([(f"{OUTBOX_FIELD}.{target}.resync_job", ASCENDING)], name=f"{target}_resync_job", sparse=True)
+
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("verification_token", ASCENDING)], name="verification_token", sparse=True),
+        IndexModel([("created_at", DESCENDING)], name="created_at"),
+        IndexModel([("role", ASCENDING), ("created_at", DESCENDING)], name="role_created_at"),
+    ],
+    "conversations": [
+        IndexModel([("conversation_id", ASCENDING)], name="conversation_id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_id_created_at"),
+    ],
+    "specialist_history": [
+        IndexModel([("user_email", ASCENDING), ("session_id", ASCENDING)], name="user_session_unique", unique=True),
+        IndexModel([("last_updated", DESCENDING)], name="last_updated"),
+    ],
+    "specialist_turns": [
+        IndexModel([("user_email", ASCENDING), ("session_id", ASCENDING), ("timestamp", ASCENDING)],
+                   name="user_session_timestamp"),
+    ],
+    "appointments": [
+        IndexModel([("id", ASCENDING)], name="id"),
+        IndexModel([("user_id", ASCENDING)], name="user_id"),
+        IndexModel([("created_at", DESCENDING)], name="created_at"),
+        IndexModel([(field, ASCENDING) for field in SYNC_FLAG_FIELDS], name=SYNC_FLAGS_INDEX),
+        *[outbox_due_index(target) for target in APPOINTMENT_TARGETS],
+        *[resync_job_index(target) for target in APPOINTMENT_TARGETS],
+    ],
+    "doctors": [
+        IndexModel([("id", ASCENDING)], name="id"),
+    ],
+    "documents": [
+        IndexModel([("created_at", DESCENDING)], name="created_at"),
+    ],
+    "urls": [
+        IndexModel([("created_at", DESCENDING)], name="created_at"),
+    ],
+    "document_tables": [
+        IndexModel([("created_at", DESCENDING)], name="created_at"),
+    ],
+    "crawl_pages": [
+        IndexModel([("url", ASCENDING)], name="url_unique", unique=True),
+    ],
+    "reception_requests": [IndexModel([("user_id", ASCENDING)], name="user_id")],
+    "exam_requests": [IndexModel([("user_id", ASCENDING)], name="user_id")],
+    "quote_requests": [IndexModel([("user_id", ASCENDING)], name="user_id")],
+    "clinical_trial_uploads": [
+        IndexModel([("submitted_at", DESCENDING)], name="submitted_at"),
+    ],
+    "sheet_export_queue": [
+        IndexModel([("next_attempt_at", ASCENDING), ("attempts", ASCENDING), ("created_at", ASCENDING)],
+                   name="due"),
+        IndexModel([("dead_at", DESCENDING)], name="dead_at", sparse=True),
+        IndexModel([("claim_id", ASCENDING)], name="claim_id", sparse=True),
+    ],
+    "email_outbox": [
+        outbox_due_index("email"),
+        # Delivery gives up within a day or two; older entries are kept only for a while for support
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=30 * DAY),
+    ],
+    "audio_chat_jobs": [
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=7 * DAY),
+    ],
+    "transcriptions": [
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=90 * DAY),
+    ],
+    "resync_jobs": [
+        IndexModel([("started_at", ASCENDING)], name="started_at_ttl", expireAfterSeconds=30 * DAY),
+    ],
+}
+
+
+async def _ensure_collection(database, name: str, models: List[IndexModel]) -> List[str]:
+    """One index at a time, so e.g. duplicate emails blocking the unique index don't block the rest."""
+    applied = []
+    for model in models:
+        try:
+            applied += await database[name].create_indexes([model])
+        except OperationFailure as e:
+            index = model.document["name"]
+            if e.code in INDEX_CONFLICT_CODES:
+                logger.warning(f"Index {name}.{index} differs from the registry; drop it to apply the new definition")
+            else:
+                logger.error(f"Creating index {name}.{index} failed: {e}")
+    return applied
+
+
+async def ensure_indexes(database=None) -> Dict[str, List[str]]:
+    """Applies INDEXES; returns the index names in place per collection."""
+    database = database if database is not None else db
+    names = list(INDEXES)
+    created = await asyncio.gather(*[_ensure_collection(database, name, INDEXES[name]) for name in names])
+    applied = dict(zip(names, created))
+    logger.info(f"Ensured {sum(len(v) for v in applied.values())} indexes on {len(applied)} collections")
+    return applied
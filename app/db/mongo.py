@@ -1,11 +1,32 @@
 # app/db/mongo.py
 from motor.motor_asyncio import AsyncIOMotorClient
 from app.core.config import settings
-from motor.motor_asyncio import AsyncIOMotorDatabase
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
 from fastapi import Depends
 
 
-client = AsyncIOMotorClient(settings.MONGODB_URI)
+def create_client() -> AsyncIOMotorClient:
+    """
+    The one Mongo client of the process; every module shares its pool. It is
+    built with connect=False, so importing opens no sockets or monitor threads:
+    the app lifespan connects it (warm-up ping) and closes it on shutdown.
+    """
+    return AsyncIOMotorClient(
+        settings.MONGODB_URI,
+        maxPoolSize=settings.MONGODB_MAX_POOL_SIZE,
+        minPoolSize=settings.MONGODB_MIN_POOL_SIZE,
+        maxIdleTimeMS=settings.MONGODB_MAX_IDLE_TIME_MS,
+        serverSelectionTimeoutMS=settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        connectTimeoutMS=settings.MONGODB_CONNECT_TIMEOUT_MS,
+        socketTimeoutMS=settings.MONGODB_SOCKET_TIMEOUT_MS,
+        waitQueueTimeoutMS=settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+        readPreference=settings.MONGODB_READ_PREFERENCE,
+        retryWrites=True,
+        connect=False,
+    )
+
+
+client = create_client()
 db = client[settings.MONGODB_DB]
 
 # Collections
@@ -19,6 +40,16 @@ kommo_tokens_collection = db.get_collection("kommo_tokens")
 users_collection = db.get_collection("users") 
 conversation_collection = db.get_collection("conversations")
 specialist_history_collection = db.get_collection("specialist_history")
+specialist_turns_collection = db.get_collection("specialist_turns")
+document_tables_collection = db.get_collection("document_tables")
+sheet_rows_collection = db.get_collection("sheet_export_queue")
+llm_settings_collection = db.get_collection("llm_settings")
+urls_collection = db.get_collection("urls")
+crawl_pages_collection = db.get_collection("crawl_pages")
+email_outbox_collection = db.get_collection("email_outbox")
+transcriptions_collection = db.get_collection("transcriptions")
+audio_jobs_collection = db.get_collection("audio_chat_jobs")
+resync_jobs_collection = db.get_collection("resync_jobs")
 
 
 
@@ -32,3 +63,10 @@ async def verify_mongodb_connection():
 
 async def get_db() -> AsyncIOMotorDatabase:
     return db
+
+
+def get_collection(name: str):
+    """Dependency factory: `documents = Depends(get_collection("documents"))`."""
+    async def dependency(database: AsyncIOMotorDatabase = Depends(get_db)) -> AsyncIOMotorCollection:
+        return database[name]
+    return dependency
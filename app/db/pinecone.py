@@ -1,22 +1,30 @@
-from pinecone import Pinecone, ServerlessSpec
-from app.core.config import settings
+# app/db/pinecone.py
 
-# Initialize client
-pc = Pinecone(api_key=settings.PINECONE_API_KEY)
+from functools import lru_cache
+from app.core.clients import get_pinecone
+from app.core.config import settings
 
 index_name = settings.PINECONE_INDEX
 
-# Create index if it doesn't exist
-if index_name not in [i.name for i in pc.list_indexes()]:
-    pc.create_index(
-        name=index_name,
-        dimension=1536,
-        metric="cosine",
-        spec=ServerlessSpec(
-            cloud="aws",
-            region="us-east-1"
+
+def ensure_index() -> None:
+    """Create the knowledge-base index if it doesn't exist. Network call: run it at startup, off the loop."""
+    from pinecone import ServerlessSpec
+
+    pc = get_pinecone()
+    if index_name not in [i.name for i in pc.list_indexes()]:
+        pc.create_index(
+            name=index_name,
+            dimension=1536,
+            metric="cosine",
+            spec=ServerlessSpec(
+                cloud="aws",
+                region="us-east-1"
+            )
         )
-    )
 
-# Load index
-index = pc.Index(index_name)
+
+# Load index on first use (resolving its host is a network call)
+@lru_cache(maxsize=1)
+def get_index():
+    return get_pinecone().Index(index_name)
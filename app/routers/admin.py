@@ -1,16 +1,25 @@
 # app/routers/admin.py
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
 from pydantic import BaseModel, Field, validator
 from typing import List, Dict
-from motor.motor_asyncio import AsyncIOMotorClient
 from bson import ObjectId
 from app.core.config import settings
+from app.core import deadline, outbound
 from app.models.appointment import AppointmentInDB
-from app.db.mongo import appointments_collection
+from app.db.mongo import appointments_collection, llm_settings_collection
 from app.db.mongo import users_collection
-from app.services.kommo import push_appointment_to_kommo
-from app.services.feegow import forward_to_feegow
+from app.services.appointment_sync import (
+    APPOINTMENT_TARGETS,
+    UNSYNCED_QUERY,
+    appointment_dispatcher,
+    bulk_resync,
+    sync_report as build_sync_report,
+)
+from app.services.outbox import DEAD
+from app.services.sheets_exporter import sheet_exporter
+from app.services.specialty_router import router_stats
+from app.services.specialist_directory import sync_specialist_directory
 from app.routers.deps import require_admin
 from app.utils.responses import format_response  # uniform response wrapper
 from app.models.user import UserCreate
@@ -26,10 +35,6 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 router = APIRouter(tags=["admin"])
 
-# MongoDB setup
-mongo_client = AsyncIOMotorClient(settings.MONGODB_URI)
-db = mongo_client[settings.MONGODB_DB]
-llm_settings_collection = db["llm_settings"]
 
 # -----------------------------
 # LLM Settings Schema
@@ -74,15 +79,14 @@ async def update_llm_settings(
     return format_response(success=True, data={"llm_settings": cfg.dict()}, message="LLM settings updated")
 
 @router.get("/unsynced", summary="View unsynced appointments")
-async def get_unsynced_appointments(current_user: dict = Depends(require_admin)):
-    query = {
-        "$or": [
-            {"kommo_synced": {"$ne": True}},
-            {"feegow_synced": {"$ne": True}}
-        ]
-    }
-    docs = await appointments_collection.find(query).to_list(length=100)
-    return format_response(success=True, data={"unsynced_appointments": docs})
+async def get_unsynced_appointments(
+    page: int = 1,
+    page_size: int = 100,
+    current_user: dict = Depends(require_admin),
+):
+    skip, limit = build_pagination(page, min(page_size, 500))
+    docs = await appointments_collection.find(UNSYNCED_QUERY).sort("_id", 1).skip(skip).limit(limit).to_list(length=limit)
+    return format_response(success=True, data={"unsynced_appointments": docs, "page": page, "page_size": limit})
 
 @router.post("/resync/{appointment_id}", summary="Resync a failed appointment")
 async def resync_appointment(
@@ -93,46 +97,73 @@ async def resync_appointment(
     if not rec:
         raise HTTPException(status_code=404, detail="Appointment not found")
 
-    feegow_synced = False
-    kommo_synced = False
-
-    try:
-        await forward_to_feegow(rec)
-        feegow_synced = True
-    except Exception as e:
-        print(f"Feegow resync failed: {e}")
+    # Dead-lettered or never-synced targets go back into the outbox
+    requeued = [
+        target for target in APPOINTMENT_TARGETS
+        if await appointment_dispatcher.requeue(target, rec["_id"])
+    ]
 
-    try:
-        await push_appointment_to_kommo(rec)
-        kommo_synced = True
-    except Exception as e:
-        print(f"Kommo resync failed: {e}")
-
-    await appointments_collection.update_one(
-        {"id": appointment_id},
-        {"$set": {
-            "feegow_synced": feegow_synced,
-            "kommo_synced": kommo_synced
-        }}
+    updated = await appointments_collection.find_one({"id": appointment_id})
+    return format_response(
+        success=True,
+        data={"appointment": updated, "requeued": requeued},
+        message="Resync queued" if requeued else "Already synced",
     )
 
-    updated = await appointments_collection.find_one({"id": appointment_id})
-    return format_response(success=True, data={"appointment": updated}, message="Resync completed")
+@router.post("/resync", status_code=202, summary="Requeue every unsynced appointment in the background")
+async def resync_all_appointments(current_user: dict = Depends(require_admin)):
+    job_id = await bulk_resync.start(started_by=current_user.get("email"))
+    return format_response(success=True, data={"job_id": job_id}, message="Bulk resync started")
+
+@router.get("/resync-jobs/{job_id}", summary="Progress and per-target outcomes of a bulk resync")
+async def get_resync_job(job_id: str, current_user: dict = Depends(require_admin)):
+    job = await bulk_resync.get(job_id)
+    if job is None:
+        raise NotFoundError("Resync job not found")
+    return format_response(success=True, data={"job": job})
 
 @router.get("/sync-report", summary="Get sync summary report")
 async def sync_report(current_user: dict = Depends(require_admin)):
-    total = await appointments_collection.count_documents({})
-    kommo_ok = await appointments_collection.count_documents({"kommo_synced": True})
-    feegow_ok = await appointments_collection.count_documents({"feegow_synced": True})
-    report = {
-        "total_appointments": total,
-        "kommo_synced": kommo_ok,
-        "feegow_synced": feegow_ok,
-        "kommo_unsynced": total - kommo_ok,
-        "feegow_unsynced": total - feegow_ok
-    }
+    report = await build_sync_report()
     return format_response(success=True, data={"sync_report": report})
 
+@router.get("/dead-letters", summary="Appointments whose sync gave up after all retries")
+async def get_dead_letters(current_user: dict = Depends(require_admin)):
+    query = {"$or": [{f"sync.{target}.status": DEAD} for target in APPOINTMENT_TARGETS]}
+    docs = await appointments_collection.find(query).sort("created_at", -1).to_list(length=100)
+    return format_response(success=True, data={"dead_letters": docs})
+
+@router.get("/sheet-dead-letters", summary="Google Sheets rows the exporter gave up on")
+async def get_sheet_dead_letters(current_user: dict = Depends(require_admin)):
+    rows = await sheet_exporter.queue.dead_letters()
+    for row in rows:
+        row["_id"] = str(row["_id"])
+    return format_response(success=True, data={"dead_letters": rows})
+
+@router.get("/specialist-router-stats", summary="Hit rate of the find-specialist pre-router")
+async def specialist_router_stats(current_user: dict = Depends(require_admin)):
+    return format_response(success=True, data={"router_stats": router_stats.as_dict()})
+
+@router.get("/outbound-metrics", summary="Latency, errors and circuit state per external dependency")
+async def outbound_metrics(current_user: dict = Depends(require_admin)):
+    return format_response(success=True, data={
+        "dependencies": outbound.snapshot(),
+        "deadlines": deadline.snapshot(),
+    })
+
+@router.post("/specialist-directory/sync", summary="Sync the specialist directory from a spreadsheet")
+async def sync_specialist_directory_from_sheet(
+    file: UploadFile = File(...),
+    dry_run: bool = Form(False),
+    force: bool = Form(False),
+    current_user: dict = Depends(require_admin)
+):
+    try:
+        report = await sync_specialist_directory(await file.read(), dry_run=dry_run, force=force)
+    except ValueError as e:
+        raise BadRequestError(str(e))
+    return format_response(success=True, data={"sync": report}, message="Dry run" if dry_run else "Directory synced")
+
 @router.post("/create-admin", summary="Create or promote an admin user")
 async def create_admin(user: UserCreate, current_user: dict = Depends(require_admin)):
     existing = await users_collection.find_one({"email": user.email})
@@ -3,7 +3,7 @@
 from fastapi import APIRouter, HTTPException, Depends, Body, Request
 from pydantic import BaseModel, EmailStr, Field
 from passlib.context import CryptContext
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.core.config import settings, FRONTEND_URLS
 import jwt
 from datetime import datetime, timedelta
@@ -18,7 +18,7 @@ from app.routers.deps import get_current_user
 from app.utils.errors import UnauthorizedRequestError, BadRequestError, NotFoundError, ConflictError, InternalServerError
 import secrets
 from datetime import timedelta
-from app.utils.email import send_verification_email, send_password_reset_email
+from app.utils.email import email_status_field, send_verification_email, send_password_reset_email
 from app.services.google import post_to_google_sheets_signup
 import os
 import logging
@@ -30,9 +30,6 @@ FRONTEND_URL = os.getenv("FRONTEND_URL")
 
 router = APIRouter(tags=["auth"])
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-mongo_client = AsyncIOMotorClient(settings.MONGODB_URI)
-db = mongo_client[settings.MONGODB_DB]
-users_collection = db["users"]
 logger = logging.getLogger("auth")
 
 
@@ -106,23 +103,26 @@ async def signup(user: UserSignup, request: Request):
         "verification_token": verification_token,
         "verification_token_expiry": verification_token_expiry,
         "lead_source": lead_source,
+        email_status_field("verification"): "queued",
     }
 
-    result = await users_collection.insert_one(user_doc)
+    await users_collection.insert_one(user_doc)
     verification_link = f"{detected_frontend}/verify-email?token={verification_token}&email={user.email}"
 
     # --- Push to Google Sheets (non-blocking failure) ---
     try:
-        post_to_google_sheets_signup(user_doc)
+        await post_to_google_sheets_signup(user_doc)
     except Exception as e:
         logger.error(f"Google Sheets signup push failed: {e}", exc_info=True)
 
-    # --- Send Verification Email ---
+    # --- Queue Verification Email (delivered in the background, see verification_email_status) ---
     try:
         await send_verification_email(user.email, verification_link)
     except Exception as e:
-        await users_collection.delete_one({"_id": result.inserted_id})
-        raise HTTPException(status_code=500, detail=f"Failed to send verification email: {e}")
+        logger.error(f"Failed to queue verification email for {user.email}: {e}", exc_info=True)
+        await users_collection.update_one(
+            {"email": user.email}, {"$set": {email_status_field("verification"): "failed"}}
+        )
 
     return {
         "message": "User registered successfully. Please check your email to verify your account.",
@@ -273,7 +273,8 @@ async def resend_verification(
         {
             "$set": {
                 "verification_token": verification_token,
-                "verification_token_expiry": verification_token_expiry
+                "verification_token_expiry": verification_token_expiry,
+                email_status_field("verification"): "queued",
             }
         }
     )
@@ -282,13 +283,13 @@ async def resend_verification(
 
     try:
         await send_verification_email(email, verification_link)
-        logger.info(f"Verification email sent to: {email} with link: {verification_link}")
+        logger.info(f"Verification email queued for: {email}")
         return {
             "success": True,
             "message": "Verification email sent successfully! Please check your inbox."
         }
     except Exception as e:
-        logger.error(f"Failed to send verification email to {email}: {e}", exc_info=True)
+        logger.error(f"Failed to queue verification email for {email}: {e}", exc_info=True)
         return {
             "success": False,
             "message": f"Failed to send verification email: {str(e)}"
@@ -333,15 +334,14 @@ async def request_password_reset(
     reset_link = f"{frontend_url}/reset-password?token={token}&email={email}"
 
     try:
-        from app.utils.email import send_password_reset_email
         await send_password_reset_email(email, reset_link)
-        logger.info(f"Password reset email sent to {email} with link: {reset_link}")
+        logger.info(f"Password reset email queued for {email}")
         return {
             "success": True,
             "message": "Reset link sent. Please check your inbox."
         }
     except Exception as e:
-        logger.error(f"Failed to send password reset email to {email}: {e}", exc_info=True)
+        logger.error(f"Failed to queue password reset email for {email}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to send reset email: {e}")
 
 @router.post("/reset-password")
@@ -3,7 +3,7 @@
 from fastapi import APIRouter, Request, HTTPException
 from starlette.responses import RedirectResponse
 from starlette.config import Config
-from authlib.integrations.starlette_client import OAuth
+from functools import lru_cache
 from app.db.mongo import db
 from app.core.jwt import create_jwt_token
 from app.core.config import settings, FRONTEND_URLS
@@ -15,16 +15,21 @@ from datetime import datetime
 
 router = APIRouter(tags=["auth"])
 
-config = Config(".env")
 
-oauth = OAuth(config)
-oauth.register(
-    name="google",
-    server_metadata_url="https://accounts.google.com/.well-known/openid-configuration",
-    client_id=settings.GOOGLE_CLIENT_ID,
-    client_secret=settings.GOOGLE_CLIENT_SECRET,
-    client_kwargs={"scope": "openid email profile"},
-)
+@lru_cache(maxsize=1)
+def get_google_oauth():
+    """Google OAuth client, registered on the first login rather than at import."""
+    from authlib.integrations.starlette_client import OAuth
+
+    oauth = OAuth(Config(".env"))
+    oauth.register(
+        name="google",
+        server_metadata_url="https://accounts.google.com/.well-known/openid-configuration",
+        client_id=settings.GOOGLE_CLIENT_ID,
+        client_secret=settings.GOOGLE_CLIENT_SECRET,
+        client_kwargs={"scope": "openid email profile"},
+    )
+    return oauth.google
 
 def get_frontend_url(request: Request) -> str:
     """
@@ -52,7 +57,7 @@ async def login_with_google(request: Request):
     state = urlencode({"origin": frontend_url})
     logging.info(f"Redirecting to Google OAuth with redirect_uri={redirect_uri} and state={state}")
 
-    return await oauth.google.authorize_redirect(request, redirect_uri, state=state)
+    return await get_google_oauth().authorize_redirect(request, redirect_uri, state=state)
 
 @router.get("/callback/auth", name="auth_callback")
 async def auth_callback(request: Request):
@@ -62,7 +67,7 @@ async def auth_callback(request: Request):
     """
     try:
         # 1. OAuth flow
-        token = await oauth.google.authorize_access_token(request)
+        token = await get_google_oauth().authorize_access_token(request)
         user_info = token.get("userinfo")
         if not user_info:
             raise HTTPException(status_code=400, detail="Failed to retrieve user info")
@@ -131,7 +136,7 @@ async def auth_callback(request: Request):
         try:
             # Remove internal fields for privacy
             user_for_sheets = {k: v for k, v in user.items() if k != "_id"}
-            post_to_google_sheets_signup(user_for_sheets)
+            await post_to_google_sheets_signup(user_for_sheets)
         except Exception as e:
             logging.error(f"Google Sheets signup push failed for Google OAuth: {e}", exc_info=True)
 
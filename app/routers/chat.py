@@ -1,12 +1,8 @@
 # app/routers/chat.py
 
-import os
 import json
 import asyncio
-import tempfile
-from pinecone import Pinecone
 import logging
-import time
 import base64
 from uuid import uuid4
 from datetime import datetime
@@ -20,12 +16,22 @@ from fastapi import (
     Body,
     Depends,
 )
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field, ValidationError
 from bson import ObjectId
-from openai import OpenAI
-import requests
-from app.core.config import settings
+from app.core.clients import get_async_openai
+from app.core.deadline import (
+    RETRIEVAL_MAX_SECONDS,
+    RETRIEVAL_SHARE,
+    DeadlineExceeded,
+    current_deadline,
+    degrade,
+    degraded_stages,
+    request_deadline,
+    stage_timeout,
+    with_deadline,
+    within_deadline,
+)
 from app.core.logger import logger
 from app.db.mongo import (
     db,
@@ -43,7 +49,6 @@ from app.schemas.chat import (
 )
 from app.schemas.specialist import (
     FindSpecialistRequest,
-    SpecialistSuggestion,
 )
 from app.services.chat_engine import (
     chat_with_assistant,
@@ -56,43 +61,26 @@ from app.services.find_specialist_engine import (
     find_specialist_response,
     get_recent_specialist_suggestions,
     save_specialist_history,
-    is_similar_query,
     get_full_specialist_session_history,
-    get_registration,
-    get_specialization
+    stream_specialist_cards,
+    find_routed_specialist_response,
+    routed_specialist_events,
 )
+from app.services.specialist_profiles import specialist_profiles, query_specialist_ids
+from app.services.specialty_router import route_specialist_query
 from app.services.kommo import (
-    push_lead_to_kommo,
     push_clinical_trial_lead,
 )
 from app.services.google import (
-    upload_file_to_drive,
-    post_to_google_sheets,
+    upload_to_drive,
     post_to_google_sheets_clinical_trial,
 )
+from app.services.transcription import TranscriptionError, audio_chat_jobs
 from app.services.vector_search import search_similar_chunks
 from app.services.vector_store import embed_text
-from app.services.prompt_templates import FIND_SPECIALIST_PROMPT
 from fastapi import BackgroundTasks
 
 
-ASSEMBLYAI_API_KEY = "0dd308f8c94e4ec9840bbb0348adaad8"  # You should use an environment variable for security!
-
-# OpenAI client
-client = OpenAI(
-    api_key=settings.OPENAI_API_KEY,
-    base_url=settings.OPENAI_BASE_URL,
-)
-
-PINECONE_API_KEY = settings.PINECONE_API_KEY  # Store in env
-INDEX_HOST = "https://nudii-experts-description-7iqky9x.svc.aped-4627-b74a.pinecone.io"
-NAMESPACE = "specialist"
-
-pc = Pinecone(api_key=PINECONE_API_KEY)
-pinecone_index = pc.Index(host=INDEX_HOST)
-
-UPLOAD_DIR = os.path.abspath("app/uploads")
-
 router = APIRouter(tags=["chat"])
 
 # ---------------------
@@ -125,6 +113,9 @@ async def chat_endpoint(
             conversation_id=conv_id
         )
 
+    except HTTPException:
+        raise   # e.g. the request ran out of its time budget (504)
+
     except RuntimeError as e:
         logging.error("LLM service error: %s", e, exc_info=True)
         # 502 for upstream model failures
@@ -153,6 +144,7 @@ async def chat_endpoint(
     response_model=ChatResponse,
     summary="Send a file and receive a chat response"
 )
+@with_deadline("file")
 async def chat_with_file(
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
@@ -172,7 +164,10 @@ async def chat_with_file(
 
         # 2. Retrieval: Use prompt for semantic context (RAG)
         query = prompt
-        matches = await search_similar_chunks(query)
+        matches = await degrade(
+            "retrieval", search_similar_chunks(query), [],
+            limit=RETRIEVAL_MAX_SECONDS, share=RETRIEVAL_SHARE,
+        )
         context_chunks = [m["metadata"]["chunk_text"] for m in matches]
         context_block = "\n--\n".join(context_chunks[:3])
         logging.info(f"[with-file] Context retrieved: {context_block[:500]}")
@@ -211,12 +206,12 @@ async def chat_with_file(
 
         # 5. Call OpenAI
         try:
-            completion = client.chat.completions.create(
+            completion = await within_deadline("llm", get_async_openai().chat.completions.create(
                 model=cfg["model"],
                 messages=final_messages,
                 temperature=cfg["temperature"],
                 max_tokens=cfg["max_tokens"]
-            )
+            ))
             raw_reply = completion.choices[0].message.content
             try:
                 llm_json = json.loads(raw_reply)
@@ -226,6 +221,8 @@ async def chat_with_file(
                 logging.warning("Failed to parse LLM JSON, returning raw text. Error: %s", e, exc_info=True)
                 reply_text = raw_reply
                 chat_title = "File Analysis"
+        except DeadlineExceeded:
+            raise
         except Exception as llm_exc:
             logging.error("[with-file] OpenAI API error: %s", llm_exc, exc_info=True)
             raise HTTPException(
@@ -260,6 +257,7 @@ async def chat_with_file(
     response_model=ChatResponse,
     summary="Send an image and receive a chat response"
 )
+@with_deadline("image")
 async def chat_with_image(
     background_tasks: BackgroundTasks,
     image: UploadFile = File(...),
@@ -279,7 +277,10 @@ async def chat_with_image(
 
         # 2. Retrieval: Use prompt for semantic context (RAG)
         query = prompt
-        matches = await search_similar_chunks(query)
+        matches = await degrade(
+            "retrieval", search_similar_chunks(query), [],
+            limit=RETRIEVAL_MAX_SECONDS, share=RETRIEVAL_SHARE,
+        )
         context_chunks = [m["metadata"]["chunk_text"] for m in matches]
         context_block = "\n--\n".join(context_chunks[:3])
         logging.info(f"[with-image] Context retrieved: {context_block[:500]}")
@@ -314,12 +315,12 @@ async def chat_with_image(
 
         # 5. Call OpenAI
         try:
-            completion = client.chat.completions.create(
+            completion = await within_deadline("llm", get_async_openai().chat.completions.create(
                 model=cfg["model"],
                 messages=final_messages,
                 temperature=cfg["temperature"],
                 max_tokens=cfg["max_tokens"]
-            )
+            ))
             reply = completion.choices[0].message.content
             try:
                 llm_json = json.loads(reply)
@@ -329,6 +330,8 @@ async def chat_with_image(
                 logging.error("Failed to parse LLM JSON: %s", e, exc_info=True)
                 reply_text = reply
                 chat_title = "File Analysis"
+        except DeadlineExceeded:
+            raise
         except Exception as llm_exc:
             logging.error("[with-image] OpenAI API error: %s", llm_exc, exc_info=True)
             raise HTTPException(
@@ -365,81 +368,31 @@ async def chat_with_audio(
     conversation_id: str = Form(None),
     current_user: dict = Depends(get_current_user)
 ):
-    # 1. Save audio to temp file
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
-        audio_bytes = await audio.read()
-        tmp.write(audio_bytes)
-        filename = tmp.name
-
+    audio_bytes = await audio.read()
     try:
-        # 2. Upload audio to AssemblyAI
-        base_url = "https://api.assemblyai.com"
-        headers = {"authorization": ASSEMBLYAI_API_KEY}
-
-        with open(filename, "rb") as f:
-            upload_res = requests.post(f"{base_url}/v2/upload", headers=headers, data=f)
-        if upload_res.status_code != 200:
-            raise HTTPException(status_code=500, detail=f"Upload failed: {upload_res.text}")
-
-        try:
-            audio_url = upload_res.json().get("upload_url")
-        except Exception:
-            raise HTTPException(status_code=500, detail=f"Upload API did not return JSON: {upload_res.text}")
-
-        # 3. Start transcription
-        data = {"audio_url": audio_url, "speech_model": "universal"}
-        transcript_res = requests.post(f"{base_url}/v2/transcript", json=data, headers=headers)
-        if transcript_res.status_code != 200:
-            raise HTTPException(status_code=500, detail=f"Transcription start failed: {transcript_res.text}")
-
-        try:
-            transcript_id = transcript_res.json()["id"]
-        except Exception:
-            raise HTTPException(status_code=500, detail=f"Transcription start did not return JSON: {transcript_res.text}")
-
-        polling_endpoint = f"{base_url}/v2/transcript/{transcript_id}"
-
-        # 4. Poll for transcription result
-        transcribed_text = None
-        for _ in range(60):  # max 2 minutes
-            poll_res = requests.get(polling_endpoint, headers=headers)
-            if poll_res.status_code != 200:
-                raise HTTPException(status_code=500, detail=f"Polling failed: {poll_res.text}")
+        return await audio_chat_jobs.run(audio_bytes, user_id, conversation_id)
+    except TranscriptionError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
 
-            try:
-                result = poll_res.json()
-            except Exception:
-                raise HTTPException(status_code=500, detail=f"Polling did not return JSON: {poll_res.text}")
-
-            status = result.get('status')
-            if status == 'completed':
-                transcribed_text = result['text']
-                break
-            elif status == 'error':
-                raise HTTPException(status_code=400, detail=f"Transcription failed: {result.get('error', 'unknown error')}")
-            time.sleep(2)
-        else:
-            raise HTTPException(status_code=504, detail="Transcription timed out after 2 minutes.")
-
-        # 5. Use transcribed text as the chat message!
-        msgs = [{"role": "user", "content": transcribed_text}]
 
-        # 6. Call your chat_with_assistant
-        result = await chat_with_assistant(
-            messages=msgs,
-            user_id=user_id,
-            conversation_id=conversation_id
-        )
+@router.post("/with-audio/jobs", status_code=202, summary="Queue audio for transcription and reply")
+async def submit_audio_chat_job(
+    audio: UploadFile = File(...),
+    user_id: str = Form(...),
+    conversation_id: str = Form(None),
+    current_user: dict = Depends(get_current_user)
+):
+    audio_bytes = await audio.read()
+    job_id = await audio_chat_jobs.submit(audio_bytes, user_id, current_user["user_id"], conversation_id)
+    return {"job_id": job_id, "status": "transcribing"}
 
-        return {
-            "reply": result["reply"],
-            "chat_title": result["chat_title"],
-            "transcribed_text": transcribed_text
-        }
 
-    finally:
-        # Clean up temp file
-        os.remove(filename)
+@router.get("/with-audio/jobs/{job_id}", summary="Get the status and result of an audio chat job")
+async def get_audio_chat_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    job = await audio_chat_jobs.get(job_id, current_user["user_id"])
+    if job is None:
+        raise HTTPException(status_code=404, detail="Audio job not found")
+    return job
 
 @router.post("/new", response_model=NewChatResponse, summary="Start a new chat thread")
 async def start_new_chat(req: NewChatRequest, current_user: dict = Depends(get_current_user)):
@@ -492,21 +445,15 @@ async def submit_clinical_trial(
     current_user: dict = Depends(get_current_user)
 ):
     try:
-        os.makedirs(UPLOAD_DIR, exist_ok=True)
-
-        file_path = None
         google_drive_link = None
 
-        # Save locally and upload to Drive
+        # Upload to Drive straight from memory
         if test_results_file:
-            ext = test_results_file.filename.split(".")[-1]
-            local_filename = f"{uuid4()}.{ext}"
-            file_path = os.path.join(UPLOAD_DIR, local_filename)
-
-            with open(file_path, "wb") as f:
-                f.write(await test_results_file.read())
-
-            google_drive_link = upload_file_to_drive(file_path, test_results_file.filename)
+            google_drive_link = await upload_to_drive(
+                await test_results_file.read(),
+                test_results_file.filename,
+                test_results_file.content_type or "application/octet-stream",
+            )
             logger.info("File uploaded to Google Drive: %s", google_drive_link)
 
         # Prepare form data
@@ -533,17 +480,12 @@ async def submit_clinical_trial(
         logger.info("💾 Data saved to MongoDB for %s", email)
 
         #  External integrations
-        # await push_clinical_trial_lead({**form_data, "uploaded_file_path": file_path})
+        # await push_clinical_trial_lead({**form_data, "uploaded_file_path": test_results_file.filename if test_results_file else None})
         logger.info(" Pushed to Kommo")
 
-        post_to_google_sheets_clinical_trial(form_data)
+        await post_to_google_sheets_clinical_trial(form_data)
         logger.info(" Posted to Google Sheets")
 
-        # 🧹 Clean up temp file
-        if file_path and os.path.exists(file_path):
-            os.remove(file_path)
-            logger.info("🧹 Temp file deleted: %s", file_path)
-
         return {
             "success": True,
             "message": "Clinical trial form submitted successfully"
@@ -580,122 +522,173 @@ async def get_user_conversations_by_id(user_id: str, current_user: dict = Depend
         traceback.print_exc()
         raise HTTPException(status_code=500, detail="Error fetching conversations")
 
+# ---------------------
+# Find Specialist
+# ---------------------
+MAX_CONTEXT_TURNS = 1
+TOP_K_RAG = 8
+# Per-stage caps inside the request budget: a slow stage degrades the answer instead of holding the request
+HISTORY_TIMEOUT_SECONDS = 2.0
+EMBED_TIMEOUT_SECONDS = 5.0
+VECTOR_QUERY_TIMEOUT_SECONDS = 3.0
+PROFILE_FETCH_TIMEOUT_SECONDS = 3.0
+
+
+async def _recent_specialist_history(user_email: str, session_id: str) -> list:
+    return await degrade(
+        "specialist_history",
+        get_recent_specialist_suggestions(user_email, MAX_CONTEXT_TURNS, session_id),
+        [],
+        limit=HISTORY_TIMEOUT_SECONDS,
+    )
+
+
+async def _retrieve_specialist_profiles(query: str) -> list:
+    try:
+        query_embedding = await asyncio.wait_for(
+            embed_text(query), stage_timeout(EMBED_TIMEOUT_SECONDS, share=RETRIEVAL_SHARE)
+        )
+        matches = await asyncio.wait_for(
+            query_specialist_ids(query_embedding, TOP_K_RAG),
+            stage_timeout(VECTOR_QUERY_TIMEOUT_SECONDS, share=RETRIEVAL_SHARE),
+        )
+        return await asyncio.wait_for(
+            specialist_profiles.get_many(vector_id for vector_id, _ in matches),
+            stage_timeout(PROFILE_FETCH_TIMEOUT_SECONDS, share=RETRIEVAL_SHARE),
+        )
+    except Exception as pinecone_err:
+        degraded_stages["specialist_retrieval"] += 1
+        logger.warning(f"Degraded: specialist retrieval failed, answering without profiles: {pinecone_err!r}")
+        return []
+
+
+async def _specialist_context(query: str, user_email: str, session_id: str):
+    """
+    Session history (last N turns) plus either the pre-routed candidates for an
+    explicit specialty request, or the retrieved profile block. The history
+    read overlaps with routing and retrieval.
+    Returns (history, rag_context_str, routed_candidates).
+    """
+    history_task = asyncio.create_task(_recent_specialist_history(user_email, session_id))
+    try:
+        # Explicit specialty ("preciso de um nutricionista"): no embedding or vector search
+        routed = await route_specialist_query(query)
+        if routed:
+            return await history_task, "", routed
+
+        # Embed the current query while the history read is in flight
+        profiles = await _retrieve_specialist_profiles(query)
+        history = await history_task
+    finally:
+        history_task.cancel()
+
+    # RAG block: one precomputed JSON line per distinct profile
+    rag_context_str = "\n".join(dict.fromkeys(profile.rendered for profile in profiles))
+    if rag_context_str:
+        logger.info("RAG context: %s", rag_context_str)
+    return history, rag_context_str, None
+
+
+async def _save_specialist_turn(user_email: str, session_id: str, query: str, raw):
+    # Save all recommended doctor names for history
+    doctor_names = []
+    if isinstance(raw, dict):
+        if "specialists" in raw and isinstance(raw["specialists"], list):
+            doctor_names = [d.get("Name", "") for d in raw["specialists"]]
+        elif "Name" in raw:
+            doctor_names = [raw.get("Name", "")]
+    await save_specialist_history(
+        user_email,
+        query,
+        ", ".join([name for name in doctor_names if name]),
+        session_id=session_id,
+        response=raw
+    )
+
+
+def _require_specialist_session(current_user: dict, session_id: Optional[str]) -> str:
+    user_email = current_user.get("email")
+    if not user_email:
+        raise HTTPException(status_code=400, detail="User email not found in current_user")
+    if not session_id:
+        raise HTTPException(status_code=400, detail="Session ID is required for session-based specialist chat.")
+    return user_email
+
+
 @router.post(
     "/find-specialist",
     response_model=Dict[str, Any],  # Accepts both single/multi structures
     summary="Suggest a specialist based on user query"
 )
+@with_deadline("specialist")
 async def suggest_specialist(
     payload: FindSpecialistRequest,
     current_user: dict = Depends(get_current_user),
     session_id: Optional[str] = Body(None, embed=True),
 ):
-    MAX_CONTEXT_TURNS = 1
-    TOP_K_RAG = 8
-
     try:
-        user_email = current_user.get("email")
-        if not user_email:
-            raise HTTPException(status_code=400, detail="User email not found in current_user")
-        if not session_id:
-            raise HTTPException(status_code=400, detail="Session ID is required for session-based specialist chat.")
-
-        # 1️ Get last N turns of chat for this session
-        history = await get_full_specialist_session_history(user_email, session_id)
-        if len(history) > MAX_CONTEXT_TURNS:
-            history = history[-MAX_CONTEXT_TURNS:]
-
-        # 2️ Collect last N user queries for RAG
-        user_queries = [entry["query"] for entry in history if "query" in entry]
-        combined_query = "\n".join(user_queries[-MAX_CONTEXT_TURNS:]) if user_queries else payload.query
-        #logger.info("Combined query: %s", combined_query)
-        # 3️ Pinecone RAG retrieval
-        doctors = []
-        try:
-            query_embedding = await embed_text(combined_query)
-            pinecone_results = pinecone_index.query(
-                vector=query_embedding,
-                top_k=TOP_K_RAG,
-                namespace=NAMESPACE,
-                include_metadata=True
-            )
-            for m in pinecone_results.get("matches", []):
-                doc_json = m['metadata'].get('doc', '{}')
-                try:
-                    doc = json.loads(doc_json)
-                    doctors.append(doc)
-                except Exception as e:
-                    print(f"Error loading doc JSON: {e}")
-        except Exception as pinecone_err:
-            print("Pinecone retrieval failed:", pinecone_err)
-
-        # 4️ Format the RAG block as strict JSON per profile
-        rag_context_str = ""
-        if doctors:
-            rag_context = [
-                {
-                    "Name": doc.get('name', ''),
-                    "Specialization": get_specialization(doc),
-                    "Registration": get_registration(doc),
-                    "Image": doc.get('Image in Google Drive', 'https://nudii.com.br/wp-content/uploads/2025/05/placeholder.png'),
-                    "doctor_description": doc.get('my_story', '')[:1000]
-                }
-                for doc in doctors
-            ]
-            rag_context_str = "\n".join([json.dumps(obj, ensure_ascii=False) for obj in rag_context])
-            logger.info("RAG context: %s", rag_context_str)
-        # 5️ Compose the system prompt: RAG context FIRST, then instructions
-        if rag_context_str:
-            system_prompt = (
-                "Here are the relevant specialist profiles (choose only from these):\n"
-                f"{rag_context_str}\n\n"
-                f"{FIND_SPECIALIST_PROMPT.strip()}"
-            )
-        else:
-            system_prompt = FIND_SPECIALIST_PROMPT.strip()
-
-        # 6️ Build OpenAI message array
-        messages = [{"role": "system", "content": system_prompt}]
-        for entry in history:
-            if "query" in entry:
-                messages.append({"role": "user", "content": entry["query"]})
-            if "response" in entry and entry["response"]:
-                resp_msg = entry["response"].get("response_message", "")
-                if resp_msg:
-                    messages.append({"role": "assistant", "content": resp_msg})
-        messages.append({"role": "user", "content": payload.query})
-
-        # 7️ LLM call (thread-safe)
-        raw = await asyncio.to_thread(
-            find_specialist_response,
-            payload.query,
-            system_prompt,
-            rag_context_str,
-            history
-        )
+        user_email = _require_specialist_session(current_user, session_id)
+        history, rag_context_str, routed = await _specialist_context(payload.query, user_email, session_id)
 
-        # 8️ Save all recommended doctor names for history
-        doctor_names = []
-        if isinstance(raw, dict):
-            if "specialists" in raw and isinstance(raw["specialists"], list):
-                doctor_names = [d.get("Name", "") for d in raw["specialists"]]
-            elif "Name" in raw:
-                doctor_names = [raw.get("Name", "")]
-        await save_specialist_history(
-            user_email,
-            payload.query,
-            ", ".join([name for name in doctor_names if name]),
-            session_id=session_id,
-            response=raw
-        )
+        # LLM call (async client); the engine builds the prompt
+        if routed:
+            raw = await within_deadline("llm", find_routed_specialist_response(payload.query, routed, history))
+        else:
+            raw = await within_deadline("llm", find_specialist_response(payload.query, rag_context_str, history))
 
-        # 9️ Return result directly
+        await _save_specialist_turn(user_email, session_id, payload.query, raw)
         return raw
 
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback; traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+
+@router.post(
+    "/find-specialist/stream",
+    summary="Suggest specialists, streaming each card as soon as it is complete"
+)
+@with_deadline("specialist")
+async def suggest_specialist_stream(
+    payload: FindSpecialistRequest,
+    current_user: dict = Depends(get_current_user),
+    session_id: Optional[str] = Body(None, embed=True),
+):
+    """
+    Same recommendation as /find-specialist, as NDJSON: one {"type": "card"} line
+    per specialist as it completes, then {"type": "done", "response": ...} once
+    the turn is saved. Past the specialist budget the stream ends with a
+    {"type": "error"} line instead.
+    """
+    user_email = _require_specialist_session(current_user, session_id)
+    history, rag_context_str, routed = await _specialist_context(payload.query, user_email, session_id)
+    if routed:
+        source = routed_specialist_events(payload.query, routed, history)
+    else:
+        source = stream_specialist_cards(payload.query, rag_context_str, history)
+    # The decorator's deadline closes when this returns; the stream keeps what is left of it
+    remaining = current_deadline().remaining()
+
+    async def events():
+        with request_deadline("specialist", remaining):
+            try:
+                while True:
+                    try:
+                        event = await within_deadline("llm", source.__anext__())
+                    except StopAsyncIteration:
+                        break
+                    if event["type"] == "done":
+                        await _save_specialist_turn(user_email, session_id, payload.query, event["response"])
+                    yield json.dumps(event, ensure_ascii=False, default=str) + "\n"
+            except DeadlineExceeded as e:
+                yield json.dumps({"type": "error", "detail": e.detail}, ensure_ascii=False) + "\n"
+            finally:
+                await source.aclose()
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
 @router.post("/new-specialist-session-by-email", summary="Create a new specialist session using email")
 async def start_new_specialist_session_by_email(
     email: str = Body(..., embed=True)
@@ -729,11 +722,12 @@ async def get_specialist_session_history(
     if not user_email:
         raise HTTPException(status_code=400, detail="User email not found")
     session_doc = await specialist_history_collection.find_one(
-        {"user_email": user_email, "session_id": session_id}
+        {"user_email": user_email, "session_id": session_id}, {"_id": 1}
     )
     if not session_doc:
         raise HTTPException(status_code=404, detail="Session not found")
-    return {"session_id": session_id, "history": session_doc.get("queries", [])}
+    history = await get_full_specialist_session_history(user_email, session_id)
+    return {"session_id": session_id, "history": history}
 
 @router.get("/all-specialist-sessions", summary="List all specialist chat sessions")
 async def list_all_specialist_sessions():
@@ -6,8 +6,7 @@ from datetime import datetime
 from app.models.appointment import AppointmentCreate, AppointmentInDB
 from app.db.mongo import appointments_collection
 from app.routers.deps import get_current_user
-from app.services.feegow import forward_to_feegow
-from app.services.kommo import push_appointment_to_kommo
+from app.services.appointment_sync import appointment_dispatcher, appointment_outbox
 from app.db.mongo import db
 from fastapi.responses import JSONResponse
 
@@ -40,34 +39,15 @@ async def book_appointment(a: AppointmentCreate):
     # 👇 Set _id explicitly for future updates
     doc = rec.dict(by_alias=True)
     doc["_id"] = rec.id
+    doc["doctor_name"] = doctor["name"]
+    doc["specialization"] = doctor["specialization"]
+    # Feegow/Kommo sync is written with the appointment (one insert) and
+    # delivered by the outbox dispatcher, never inline
+    doc["feegow_synced"] = False
+    doc["kommo_synced"] = False
+    doc["sync"] = appointment_outbox(rec.id)
     await appointments_collection.insert_one(doc)
-
-    feegow_synced = False
-    try:
-        print("Sending appointment to Feegow...")
-        await forward_to_feegow(rec.dict())
-        feegow_synced = True
-        print("Feegow sync successful.")
-    except Exception as e:
-        print(f"Feegow sync failed: {e}")
-
-    kommo_synced = False
-    try:
-        print("Sending appointment to Kommo...")
-        push_appointment_to_kommo(rec.to_kommo_dict())
-        kommo_synced = True
-        print("Kommo sync successful.")
-    except Exception as e:
-        print(f" Kommo sync failed: {e}")
-
-    update_result = await appointments_collection.update_one(
-        {"_id": rec.id},
-        {"$set": {
-            "feegow_synced": feegow_synced,
-            "kommo_synced": kommo_synced
-        }}
-    )
-    print(f" Updated sync flags in DB: {update_result.modified_count} modified")
+    appointment_dispatcher.notify()
 
     return rec
 
@@ -1,21 +1,19 @@
 # app/routers/documents.py
 
 from fastapi import APIRouter, HTTPException, Depends
-from motor.motor_asyncio import AsyncIOMotorClient
 from bson import ObjectId
 
-from app.core.config import settings
-from app.db.pinecone import index
+from app.db.mongo import get_collection
+from app.services.vector_store import delete_chunk_range
 from app.routers.deps import get_current_user
 from app.utils.responses import format_response  # standardized response
 from app.utils.pagination import build_pagination, build_sort
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 
-# MongoDB setup
-mongo_client = AsyncIOMotorClient(settings.MONGODB_URI)
-db = mongo_client[settings.MONGODB_DB]
-documents = db["documents"]
+# Collections come from the shared client through dependency injection
+get_documents = get_collection("documents")
+get_document_tables = get_collection("document_tables")
 
 # -----------------------------
 # Helpers
@@ -38,6 +36,7 @@ async def list_documents(
     sort_by: str = "created_at",
     sort_order: str = "desc",
     current_user: dict = Depends(get_current_user),
+    documents=Depends(get_documents),
 ):
     skip, limit = build_pagination(page, page_size)
     sort = build_sort(sort_by, sort_order)
@@ -62,7 +61,11 @@ async def list_documents(
     )
 
 @router.get("/{document_id}", summary="Get document metadata by ID")
-async def get_document(document_id: str, current_user: dict = Depends(get_current_user)):
+async def get_document(
+    document_id: str,
+    current_user: dict = Depends(get_current_user),
+    documents=Depends(get_documents),
+):
     doc = await documents.find_one({"_id": ObjectId(document_id)})
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
@@ -71,15 +74,21 @@ async def get_document(document_id: str, current_user: dict = Depends(get_curren
 
 
 @router.delete("/{document_id}", summary="Delete a document and its Pinecone chunks")
-async def delete_document(document_id: str, current_user: dict = Depends(get_current_user)):
+async def delete_document(
+    document_id: str,
+    current_user: dict = Depends(get_current_user),
+    documents=Depends(get_documents),
+    document_tables=Depends(get_document_tables),
+):
     doc = await documents.find_one({"_id": ObjectId(document_id)})
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
 
     await documents.delete_one({"_id": ObjectId(document_id)})
+    await document_tables.delete_many({"document_id": document_id})
 
-    pinecone_ids = [f"{document_id}-{i}" for i in range(1000)]
-    index.delete(ids=pinecone_ids)
+    # Large tables can exceed the default 1000-chunk sweep; their exact count is stored
+    await delete_chunk_range(document_id, 0, max(1000, doc.get("chunk_count") or 0))
 
     return format_response(success=True, message="Document and chunks deleted successfully")
 
@@ -24,7 +24,7 @@ async def schedule_exam(req: ExamScheduleRequest, current_user: dict = Depends(g
     await exam_requests_collection.insert_one(doc)
 
     try:
-        push_exam_lead_to_kommo(doc)  # ⬅️ Push to Kommo
+        await push_exam_lead_to_kommo(doc)  # ⬅️ Push to Kommo
     except Exception as e:
         print("❌ Kommo sync failed:", str(e))
 
@@ -4,8 +4,11 @@ from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
 from fastapi.responses import StreamingResponse
 from bson import ObjectId
 import io
+import json
+import asyncio
+from app.core.logger import logger
 from app.routers.deps import require_admin
-from app.services.file_ingestor import process_file
+from app.services.file_ingestor import ingest_file_bytes
 from app.db.mongo import documents_collection
 from app.routers.deps import get_current_user
 from app.utils.responses import format_response  # standardized responses
@@ -18,6 +21,50 @@ router = APIRouter(tags=["documents"])
 
 from fastapi import Form
 
+MAX_CONCURRENT_INGESTIONS = 4  # files OCR'd/parsed in parallel per upload batch
+
+
+async def _ingest_one(semaphore: asyncio.Semaphore, index: int, filename: str, content: bytes, user_id: str) -> dict:
+    async with semaphore:
+        try:
+            data = await ingest_file_bytes(filename, content, user_id)
+            return {"index": index, "filename": filename, "success": True, "data": data}
+        except HTTPException as e:
+            return {"index": index, "filename": filename, "success": False, "error": e.detail}
+        except Exception as e:
+            logger.exception(f"Unexpected ingestion error for {filename}")
+            return {"index": index, "filename": filename, "success": False, "error": str(e)}
+
+
+async def stream_ingestion_results(uploads: list[tuple[str, bytes]], user_id: str):
+    """
+    Yields one NDJSON line per file as soon as it finishes, then a summary line.
+    A failing file is reported in its own line and never aborts the batch.
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_INGESTIONS)
+    tasks = [
+        asyncio.create_task(_ingest_one(semaphore, i, filename, content, user_id))
+        for i, (filename, content) in enumerate(uploads)
+    ]
+    succeeded = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            succeeded += result["success"]
+            yield json.dumps(result, default=str) + "\n"
+    finally:
+        # Client disconnected mid-stream: don't leave orphaned ingestions running
+        for task in tasks:
+            task.cancel()
+
+    yield json.dumps({
+        "done": True,
+        "total": len(uploads),
+        "succeeded": succeeded,
+        "failed": len(uploads) - succeeded,
+    }) + "\n"
+
+
 @router.post("/upload", summary="Upload one or more files (admin only)")
 async def upload_files(
     files: list[UploadFile] = File(...),
@@ -26,13 +73,16 @@ async def upload_files(
 ):
     """
     Admin uploads files to be ingested and stored, associated with a given email.
+    Files are processed concurrently and each result is streamed back as
+    newline-delimited JSON as soon as it completes.
     """
-    results = []
-    for file in files:
-        result = await process_file(file, user_id=email)  # Pass email as user_id or use as needed
-        results.append(result)
+    # Upload handles are closed once this handler returns, so read them before streaming
+    uploads = [(file.filename, await file.read()) for file in files]
 
-    return format_response(success=True, data={"results": results})
+    return StreamingResponse(
+        stream_ingestion_results(uploads, user_id=email),
+        media_type="application/x-ndjson",
+    )
 
 
 # -----------------------------
@@ -22,7 +22,7 @@ async def request_quote(req: QuoteRequest):
     await quote_requests_collection.insert_one(doc)
 
     try:
-        push_quote_to_kommo(doc)
+        await push_quote_to_kommo(doc)
     except Exception as e:
         print("Kommo push failed:", str(e))
 
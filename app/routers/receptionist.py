@@ -1,9 +1,10 @@
 # app/routers/receptionist.py
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, BackgroundTasks, HTTPException
 from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import List
+from app.core.logger import logger
 from app.db.mongo import reception_requests_collection
 from app.services.kommo import push_receptionist_request_to_kommo
 
@@ -15,14 +16,22 @@ class ReceptionRequest(BaseModel):
     phone: str = Field(..., description="Contact phone number")
     reason: str = Field(..., description="Reason for contacting reception")
 
+async def _push_to_kommo(doc: dict) -> None:
+    # The request is already stored; a Kommo outage must not fail it
+    try:
+        await push_receptionist_request_to_kommo(doc)
+    except Exception as e:
+        logger.error(f"Kommo receptionist lead failed for {doc['user_id']}: {e}")
+
+
 @router.post("/request", summary="Connect to a human receptionist")
-async def connect_receptionist(req: ReceptionRequest):
+async def connect_receptionist(req: ReceptionRequest, background_tasks: BackgroundTasks):
     doc = req.dict()
     doc["created_at"] = datetime.utcnow()
     await reception_requests_collection.insert_one(doc)
 
-    # Push to Kommo
-    push_receptionist_request_to_kommo(doc)
+    # Push to Kommo after responding: the lead batcher waits for its window and rate limit
+    background_tasks.add_task(_push_to_kommo, doc)
 
     return {"message": "Request received. Our agent will call you shortly."}
 
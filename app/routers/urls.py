@@ -7,8 +7,10 @@ from typing import List
 from bson import ObjectId
 
 from app.db.mongo import db
-from app.db.pinecone import index
-from app.services.file_ingestor import process_url
+from app.core.clients import PINECONE_REQUEST_TIMEOUT
+from app.core.outbound import dependency
+from app.db.pinecone import get_index
+from app.services.file_ingestor import process_url, crawl_site
 from app.routers.deps import get_current_user, require_admin
 from app.utils.responses import format_response
 from app.utils.pagination import build_pagination, build_sort
@@ -64,6 +66,22 @@ async def ingest_url(
         message="URL ingested successfully"
     )
     
+@router.post("/crawl", summary="Crawl a site section or sitemap and ingest changed pages")
+async def crawl_url(
+    url: str = Form(..., description="Root URL of the section, or a sitemap .xml URL"),
+    email: str = Form(...),
+    max_pages: int = Form(50, ge=1, le=500),
+    max_depth: int = Form(2, ge=0, le=5),
+    current_user: dict = Depends(require_admin)
+):
+    report = await crawl_site(url, user_id=email, max_pages=max_pages, max_depth=max_depth)
+
+    return format_response(
+        success=True,
+        data=report,
+        message=f"Crawl finished: {len(report['changed'])} page(s) ingested, {len(report['unchanged'])} unchanged"
+    )
+
 @router.get("/logs", summary="List all ingested URL documents")
 async def list_full_url_docs(
     page: int = 1,
@@ -107,6 +125,8 @@ async def delete_url(
 
     # Optional: delete up to 1000 chunked vectors
     pinecone_ids = [f"{document_id}-{i}" for i in range(1000)]
-    index.delete(ids=pinecone_ids)
+    await dependency("pinecone").run_sync(
+        get_index().delete, ids=pinecone_ids, _request_timeout=PINECONE_REQUEST_TIMEOUT, idempotent=True
+    )
 
     return format_response(success=True, message="URL document and vectors deleted successfully")
\ No newline at end of file
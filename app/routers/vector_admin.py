@@ -1,7 +1,9 @@
 # app/routers/vector_admin.py
 
 from fastapi import APIRouter, Depends, HTTPException
-from app.db.pinecone import index
+from app.core.clients import PINECONE_REQUEST_TIMEOUT
+from app.core.outbound import dependency
+from app.db.pinecone import get_index
 from app.routers.deps import get_current_user
 from app.utils.responses import format_response
 
@@ -18,6 +20,8 @@ async def delete_document_vectors(
 
     # Delete chunks by predictable ID pattern
     chunk_ids = [f"{doc_id}-{i}" for i in range(1000)]  # Assumes max 1000 chunks per doc
-    index.delete(ids=chunk_ids)
+    await dependency("pinecone").run_sync(
+        get_index().delete, ids=chunk_ids, _request_timeout=PINECONE_REQUEST_TIMEOUT, idempotent=True
+    )
 
     return format_response(success=True, message=f"Embeddings for doc_id {doc_id} deleted from Pinecone.")
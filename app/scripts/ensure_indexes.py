@@ -0,0 +1,20 @@
+# app/scripts/ensure_indexes.py
+
+import asyncio
+from app.db.indexes import ensure_indexes
+from app.db.mongo import client
+
+async def main():
+    """
+    Applies the index registry (app/db/indexes.py) without starting the app,
+    e.g. before a deploy that adds indexes to large collections. Safe to re-run.
+    """
+    try:
+        applied = await ensure_indexes()
+    finally:
+        client.close()
+    for collection, names in applied.items():
+        print(f"✅ {collection}: {', '.join(names) or 'no indexes applied, see log'}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
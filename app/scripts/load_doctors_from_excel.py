@@ -1,38 +1,23 @@
 # scripts/load_doctors_from_excel.py
 
+import argparse
 import asyncio
-import pandas as pd
-from uuid import uuid4
-from motor.motor_asyncio import AsyncIOMotorClient
-from app.core.config import settings
+import json
+import os
+from app.services.specialist_directory import sync_specialist_directory
 
-async def load_doctors():
-    # Load Excel
-    df = pd.read_excel("app\scripts\specialists_nudii.xlsx")
+DEFAULT_SHEET = os.path.join(os.path.dirname(__file__), "specialists_nudii.xlsx")
 
-    # Setup MongoDB
-    client = AsyncIOMotorClient(settings.MONGODB_URI)
-    db = client[settings.MONGODB_DB]
-    doctors_collection = db["doctors"]
-
-    # Optional: clear old records
-    await doctors_collection.delete_many({})
-
-    # Prepare new records
-    records = []
-    for _, row in df.iterrows():
-        records.append({
-            "id": f"doc-{uuid4().hex[:8]}",
-            "name": row["Name"],
-            "specialization": row["Specialization"],
-            "registration": row["Registration"],
-            "image_url": row["Image"],
-        })
-
-    # Insert into MongoDB
-    if records:
-        await doctors_collection.insert_many(records)
-        print(f"✅ Inserted {len(records)} doctors into MongoDB.")
+async def load_doctors(path: str = DEFAULT_SHEET, dry_run: bool = False, force: bool = False):
+    """Incremental sync of the doctors collection and the specialist vectors with the sheet."""
+    with open(path, "rb") as f:
+        report = await sync_specialist_directory(f.read(), dry_run=dry_run, force=force)
+    print(("🔎 Dry run: " if dry_run else "✅ Synced: ") + json.dumps(report, ensure_ascii=False, indent=2))
 
 if __name__ == "__main__":
-    asyncio.run(load_doctors())
+    parser = argparse.ArgumentParser(description="Sync the specialist directory from the spreadsheet")
+    parser.add_argument("path", nargs="?", default=DEFAULT_SHEET)
+    parser.add_argument("--dry-run", action="store_true", help="report changes without writing")
+    parser.add_argument("--force", action="store_true", help="allow removing more than half of the directory")
+    args = parser.parse_args()
+    asyncio.run(load_doctors(args.path, dry_run=args.dry_run, force=args.force))
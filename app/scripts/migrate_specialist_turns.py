@@ -0,0 +1,47 @@
+# app/scripts/migrate_specialist_turns.py
+
+import asyncio
+from app.db.mongo import specialist_history_collection, specialist_turns_collection
+from app.services.find_specialist_engine import SESSION_RECENT_TURNS
+
+async def migrate_specialist_turns():
+    """
+    Copies embedded `queries` of sessions created before the specialist_turns
+    collection existed, then trims the embedded array.
+
+    Run it BEFORE deploying the code that trims `queries` on save: the first
+    new turn on a legacy session keeps only the last SESSION_RECENT_TURNS
+    embedded entries, so anything older that was not copied yet is gone.
+    Entries already in specialist_turns (same timestamp and query) are
+    skipped rather than whole sessions, so re-running is safe and a session
+    that got new turns before it was migrated is still backfilled.
+    """
+    migrated = copied = 0
+    cursor = specialist_history_collection.find(
+        {"queries.0": {"$exists": True}},
+        {"user_email": 1, "session_id": 1, "queries": 1}
+    )
+    async for session in cursor:
+        key = {"user_email": session["user_email"], "session_id": session["session_id"]}
+        existing = {
+            (turn.get("timestamp"), turn.get("query"))
+            async for turn in specialist_turns_collection.find(key, {"timestamp": 1, "query": 1})
+        }
+        missing = [
+            {**key, **entry} for entry in session["queries"]
+            if (entry.get("timestamp"), entry.get("query")) not in existing
+        ]
+        if missing:
+            await specialist_turns_collection.insert_many(missing)
+            copied += len(missing)
+            migrated += 1
+        if len(session["queries"]) > SESSION_RECENT_TURNS:
+            await specialist_history_collection.update_one(
+                {"_id": session["_id"]},
+                {"$push": {"queries": {"$each": [], "$slice": -SESSION_RECENT_TURNS}}}
+            )
+
+    print(f"✅ Backfilled {copied} turns of {migrated} specialist sessions into specialist_turns.")
+
+if __name__ == "__main__":
+    asyncio.run(migrate_specialist_turns())
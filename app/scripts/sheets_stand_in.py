@@ -0,0 +1,44 @@
+# app/scripts/sheets_stand_in.py
+
+"""
+Local stand-in for the Google Sheets Apps Script webhook. Accepts single rows
+and {"rows": [...]} batches and keeps them in memory (and optionally appends
+them to a JSONL file).
+
+    uvicorn app.scripts.sheets_stand_in:app --port 8765
+    GOOGLE_SHEETS_WEBHOOK_URL=http://localhost:8765/exec
+"""
+
+import json
+import os
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+ROWS_FILE = os.getenv("SHEETS_STAND_IN_FILE")
+
+app = FastAPI(title="Sheets webhook stand-in")
+app.state.rows = []
+app.state.requests = 0
+app.state.fail_next = 0   # tests set this to simulate webhook outages
+
+
+@app.post("/exec")
+async def receive(request: Request):
+    app.state.requests += 1
+    if app.state.fail_next > 0:
+        app.state.fail_next -= 1
+        return JSONResponse(status_code=503, content={"result": "error"})
+    payload = await request.json()
+    rows = payload["rows"] if isinstance(payload, dict) and "rows" in payload else [payload]
+    app.state.rows.extend(rows)
+    if ROWS_FILE:
+        with open(ROWS_FILE, "a") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    return {"result": "success", "rows": len(rows)}
+
+
+@app.get("/rows")
+async def list_rows():
+    return {"rows": app.state.rows}
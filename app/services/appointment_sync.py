@@ -0,0 +1,173 @@
+# app/services/appointment_sync.py
+
+import asyncio
+from datetime import datetime
+from typing import Optional, Set
+from uuid import uuid4
+
+import httpx
+
+from app.core.logger import logger
+from app.db.mongo import appointments_collection, resync_jobs_collection
+from app.models.appointment import AppointmentInDB
+from app.services.feegow import forward_to_feegow
+from app.services.kommo import push_appointment_to_kommo
+from app.services.outbox import OUTBOX_FIELD, OutboxDispatcher, OutboxTarget, PermanentDeliveryError, outbox_entry
+
+APPOINTMENT_TARGETS = ("feegow", "kommo")
+RETRYABLE_STATUS = {408, 409, 425, 429}
+SYNC_FLAGS_INDEX = "sync_flags"
+SYNC_FLAG_FIELDS = [f"{target}_synced" for target in APPOINTMENT_TARGETS]
+RESYNC_PAGE_SIZE = 500
+
+
+def appointment_outbox(appointment_id: str) -> dict:
+    """Initial `sync` sub-document for a new appointment: one pending entry per target."""
+    now = datetime.utcnow()
+    return {target: outbox_entry(f"appointment:{appointment_id}:{target}", now) for target in APPOINTMENT_TARGETS}
+
+
+async def _call(delivery) -> None:
+    try:
+        await delivery
+    except httpx.HTTPStatusError as e:
+        status = e.response.status_code if e.response is not None else None
+        if status and 400 <= status < 500 and status not in RETRYABLE_STATUS:
+            raise PermanentDeliveryError(f"{status}: {e.response.text[:300]}") from e
+        raise
+
+
+async def deliver_to_feegow(doc: dict, idempotency_key: str) -> None:
+    appointment = {
+        **AppointmentInDB(**doc).dict(),
+        "doctor_name": doc.get("doctor_name"),
+        "specialization": doc.get("specialization"),
+    }
+    await _call(forward_to_feegow(appointment, idempotency_key))
+
+
+async def deliver_to_kommo(doc: dict, idempotency_key: str) -> None:
+    # Batched with leads from the other flows into one complex-leads request
+    await _call(push_appointment_to_kommo(AppointmentInDB(**doc).to_kommo_dict(), idempotency_key))
+
+
+appointment_dispatcher = OutboxDispatcher([
+    OutboxTarget("feegow", appointments_collection, deliver_to_feegow, on_delivered={"feegow_synced": True}),
+    OutboxTarget("kommo", appointments_collection, deliver_to_kommo, on_delivered={"kommo_synced": True}),
+])
+
+
+# ---------------------
+# Sync report
+# ---------------------
+
+UNSYNCED_QUERY = {"$or": [{field: {"$ne": True}} for field in SYNC_FLAG_FIELDS]}
+
+
+def sync_report_pipeline() -> list:
+    """One pass over the sync-flags index (covered: only the flags are read) instead of a scan per count."""
+    facets = {"total": [{"$count": "n"}]}
+    for target, field in zip(APPOINTMENT_TARGETS, SYNC_FLAG_FIELDS):
+        facets[field] = [{"$match": {field: True}}, {"$count": "n"}]
+    return [
+        {"$sort": {field: 1 for field in SYNC_FLAG_FIELDS}},
+        {"$project": {"_id": 0, **{field: 1 for field in SYNC_FLAG_FIELDS}}},
+        {"$facet": facets},
+    ]
+
+
+async def sync_report() -> dict:
+    rows = await appointments_collection.aggregate(sync_report_pipeline(), hint=SYNC_FLAGS_INDEX).to_list(length=1)
+    counts = {name: (values[0]["n"] if values else 0) for name, values in (rows[0] if rows else {}).items()}
+    total = counts.get("total", 0)
+    report = {"total_appointments": total}
+    for target, field in zip(APPOINTMENT_TARGETS, SYNC_FLAG_FIELDS):
+        report[f"{target}_synced"] = counts.get(field, 0)
+        report[f"{target}_unsynced"] = total - counts.get(field, 0)
+    return report
+
+
+# ---------------------
+# Bulk resync
+# ---------------------
+
+class BulkResync:
+    """
+    Requeues every unsynced appointment, a page at a time, tagging each entry
+    with the job id. Delivery itself is left to the outbox dispatcher, which
+    bounds concurrency per target and records each attempt on the entry, so
+    the job's outcome is read back from the entries it tagged.
+    """
+
+    def __init__(self, dispatcher: OutboxDispatcher = appointment_dispatcher, collection=resync_jobs_collection):
+        self.dispatcher = dispatcher
+        self.collection = collection
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def start(self, started_by: Optional[str] = None) -> str:
+        job_id = uuid4().hex
+        await self.collection.insert_one({
+            "_id": job_id,
+            "status": "running",
+            "started_by": started_by,
+            "started_at": datetime.utcnow(),
+            "scanned": 0,
+            "requeued": {target: 0 for target in APPOINTMENT_TARGETS},
+        })
+        task = asyncio.create_task(self._run(job_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job_id
+
+    async def _run(self, job_id: str) -> None:
+        last_id = None
+        try:
+            while True:
+                query = dict(UNSYNCED_QUERY)
+                if last_id is not None:
+                    query["_id"] = {"$gt": last_id}
+                page = await appointments_collection.find(query, {"_id": 1}).sort("_id", 1).limit(
+                    RESYNC_PAGE_SIZE
+                ).to_list(length=RESYNC_PAGE_SIZE)
+                if not page:
+                    break
+                ids = [doc["_id"] for doc in page]
+                inc = {"scanned": len(ids)}
+                for target in APPOINTMENT_TARGETS:
+                    inc[f"requeued.{target}"] = await self.dispatcher.requeue_many(target, ids, {"resync_job": job_id})
+                await self.collection.update_one({"_id": job_id}, {"$inc": inc})
+                last_id = ids[-1]
+            await self.collection.update_one(
+                {"_id": job_id}, {"$set": {"status": "queued", "queued_at": datetime.utcnow()}}
+            )
+        except asyncio.CancelledError:
+            # Shutdown mid-job: what was requeued stays queued; re-running picks up the rest
+            await self.collection.update_one({"_id": job_id}, {"$set": {"status": "interrupted"}})
+            raise
+        except Exception as e:
+            logger.error(f"Bulk resync {job_id} failed: {e}", exc_info=True)
+            await self.collection.update_one({"_id": job_id}, {"$set": {"status": "failed", "error": str(e)[:500]}})
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        job = await self.collection.find_one({"_id": job_id})
+        if job is None:
+            return None
+        outcomes = {}
+        for target in APPOINTMENT_TARGETS:
+            prefix = f"{OUTBOX_FIELD}.{target}"
+            rows = await appointments_collection.aggregate([
+                {"$match": {f"{prefix}.resync_job": job_id}},
+                {"$group": {"_id": f"${prefix}.status", "n": {"$sum": 1}}},
+            ]).to_list(length=None)
+            outcomes[target] = {row["_id"]: row["n"] for row in rows}
+        job["outcomes"] = outcomes
+        return job
+
+    async def close(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+bulk_resync = BulkResync()
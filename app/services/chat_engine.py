@@ -1,9 +1,18 @@
 # app/services/chat_engine.py
 
-from openai import OpenAI
+from app.core.clients import get_async_openai
 from app.core.config import settings
+from app.core.deadline import (
+    RETRIEVAL_MAX_SECONDS,
+    RETRIEVAL_SHARE,
+    DeadlineExceeded,
+    degrade,
+    with_deadline,
+    within_deadline,
+)
 from app.services.vector_search import search_similar_chunks
-from motor.motor_asyncio import AsyncIOMotorClient
+from app.services.table_qa import answer_table_question
+from app.db.mongo import db
 from datetime import datetime
 from uuid import uuid4
 from typing import List, Dict, Any, Optional
@@ -11,30 +20,19 @@ import asyncio
 import json
 import time
 import re
-import tempfile
-import os
+import mimetypes
 import base64
 import tiktoken
 import logging
 from fastapi import UploadFile, File, Form, Depends, BackgroundTasks
 from app.schemas.chat import ChatModelOutput, Message, ChatRequest, NewChatResponse, NewChatRequest, ChatResponse
 from pydantic import ValidationError      
-from app.services.google import upload_file_to_drive
+from app.services.google import upload_to_drive
 
 
-# MongoDB setup
-mongo_client = AsyncIOMotorClient(settings.MONGODB_URI)
-db = mongo_client[settings.MONGODB_DB]
+# MongoDB setup (shared client)
 conversations = db["conversations"]
 
-UPLOAD_DIR = os.path.abspath("app/uploads")
-
-# OpenAI client
-client = OpenAI(
-    api_key=settings.OPENAI_API_KEY,
-    base_url=settings.OPENAI_BASE_URL,
-)
-
 # Immutable system prompt segments
 SYSTEM_PROMPT_HEAD = "You are a professional medical assistant."
 SYSTEM_PROMPT_TAIL = (
@@ -111,6 +109,7 @@ def count_tokens_openai(messages, model="gpt-4o"):
     num_tokens += 3  # Every reply is primed with <im_start>assistant
     return num_tokens
 
+@with_deadline("chat")
 async def chat_with_assistant(
     messages: List[Dict[str, Any]],
     user_id: str,
@@ -118,20 +117,37 @@ async def chat_with_assistant(
 ) -> Dict[str, str]:
     conv_id = conversation_id or str(uuid4())
 
-    # retrieve semantic context for the last user message
     recent_history = [msg["content"] for msg in messages[-5:] if msg["role"] == "user"]
     query = "\n".join(recent_history)
-    matches = await search_similar_chunks(query)
+
+    # aggregate questions over uploaded spreadsheets are computed exactly and added
+    # on top of the semantic context for the recent user messages.
+    # Both are optional: past their slice of the budget the LLM answers without them.
+    last_user_text = extract_text_from_content(messages[-1]["content"]) if messages else ""
+    table_answer, matches = await asyncio.gather(
+        degrade(
+            "table_qa", answer_table_question(last_user_text), None,
+            limit=RETRIEVAL_MAX_SECONDS, share=RETRIEVAL_SHARE,
+        ),
+        degrade(
+            "retrieval", search_similar_chunks(query), [],
+            limit=RETRIEVAL_MAX_SECONDS, share=RETRIEVAL_SHARE,
+        ),
+    )
     context_chunks = [m["metadata"]["chunk_text"] for m in matches]
     context_block = "\n--\n".join(context_chunks[:3])
+    context_section = f"### Retrieval Content:\n{context_block}"
     logging.info("Context retrieved: %s", context_block)
+    if table_answer:
+        context_section += f"\n\n### Computed Table Results (exact, use these numbers):\n{table_answer}"
+        logging.info("Answered from stored tables: %s", table_answer)
 
     # assemble the fixed + admin prompt
     cfg = await get_llm_config()
 
     # build labeled sections in system prompt
     sections = [
-        f"### Retrieval Content:\n{context_block}",
+        context_section,
         "### Previous Messages:",
     ]
     # flatten prior messages as simple text
@@ -168,12 +184,14 @@ async def chat_with_assistant(
         }
 
     try:
-        response = client.chat.completions.create(
+        response = await within_deadline("llm", get_async_openai().chat.completions.create(
             model=cfg["model"],
             messages=final_messages,
             temperature=cfg["temperature"],
             max_tokens=cfg["max_tokens"]
-        )
+        ))
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         logging.error("OpenAI API error: %s", e, exc_info=True)
         raise RuntimeError("LLM call failed")
@@ -228,18 +246,12 @@ def get_direct_drive_image_url(share_link):
 async def process_and_log_image_chat_message(
     image_bytes, ext, orig_filename, prompt, user_id, conv_id, reply
 ):
-    # 1. Save to disk
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
-    local_filename = f"{uuid4()}.{ext}"
-    local_path = os.path.join(UPLOAD_DIR, local_filename)
-    with open(local_path, "wb") as f:
-        f.write(image_bytes)
-
-    # 2. Upload to Google Drive
-    public_url = upload_file_to_drive(local_path, orig_filename)
+    # 1. Upload to Google Drive straight from memory
+    mime_type = mimetypes.guess_type(orig_filename)[0] or f"image/{ext}"
+    public_url = await upload_to_drive(image_bytes, orig_filename, mime_type)
     direct_image_url = get_direct_drive_image_url(public_url)
 
-    # 3. Prepare chat message for MongoDB (no base64, only Drive URL)
+    # 2. Prepare chat message for MongoDB (no base64, only Drive URL)
     mongo_user_msg = {
         "role": "user",
         "content": [
@@ -255,7 +267,7 @@ async def process_and_log_image_chat_message(
         "timestamp": datetime.utcnow().isoformat(),
     }
 
-    # 4. Logging: Save to MongoDB (thread-safe)
+    # 3. Logging: Save to MongoDB (thread-safe)
     from app.services.chat_engine import conversations  # Ensure this import works as expected
     convo = await conversations.find_one({"conversation_id": conv_id})
     if convo:
@@ -280,27 +292,14 @@ async def process_and_log_image_chat_message(
         }
         await conversations.insert_one(new_convo)
 
-    # 5. Cleanup local file
-    try:
-        os.remove(local_path)
-    except Exception:
-        pass
-
 
 async def process_and_log_file_chat_message(
     file_bytes, ext, orig_filename, mime_type, prompt, user_id, conv_id, reply
 ):
-    # 1. Save to disk
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
-    local_filename = f"{uuid4()}.{ext}"
-    local_path = os.path.join(UPLOAD_DIR, local_filename)
-    with open(local_path, "wb") as f:
-        f.write(file_bytes)
-
-    # 2. Upload to Google Drive
-    public_url = upload_file_to_drive(local_path, orig_filename)
+    # 1. Upload to Google Drive straight from memory
+    public_url = await upload_to_drive(file_bytes, orig_filename, mime_type)
 
-    # 3. Prepare chat message for MongoDB (no base64, only Drive URL)
+    # 2. Prepare chat message for MongoDB (no base64, only Drive URL)
     mongo_user_msg = {
         "role": "user",
         "content": [
@@ -316,7 +315,7 @@ async def process_and_log_file_chat_message(
         "timestamp": datetime.utcnow().isoformat(),
     }
 
-    # 4. Logging: Save to MongoDB (thread-safe)
+    # 3. Logging: Save to MongoDB (thread-safe)
     convo = await conversations.find_one({"conversation_id": conv_id})
     if convo:
         await conversations.update_one(
@@ -339,9 +338,3 @@ async def process_and_log_file_chat_message(
             "messages": [mongo_user_msg, reply_msg]
         }
         await conversations.insert_one(new_convo)
-
-    # 5. Cleanup local file
-    try:
-        os.remove(local_path)
-    except Exception:
-        pass
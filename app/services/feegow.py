@@ -1,18 +1,42 @@
 # app/services/feegow.py
 
-import requests
+import httpx
 import os
 from datetime import datetime
+from typing import Optional
+
+from app.core.logger import logger
+from app.core.outbound import POLICIES, async_transport
 
 FEEGOW_API_URL = "https://api.feegow.com/v1/api/appoints/new-appoint"
 FEEGOW_TOKEN = os.getenv("FEEGOW_API_TOKEN", "your-feegow-access-token")
+FEEGOW_TIMEOUT_SECONDS = POLICIES["feegow"].timeout
+
+_http: Optional[httpx.AsyncClient] = None
+
+
+def feegow_http() -> httpx.AsyncClient:
+    global _http
+    if _http is None:
+        _http = httpx.AsyncClient(timeout=FEEGOW_TIMEOUT_SECONDS, transport=async_transport("feegow"))
+    return _http
+
+
+async def close_feegow() -> None:
+    global _http
+    if _http is not None:
+        await _http.aclose()
+        _http = None
 
 
-def forward_to_feegow(appointment: dict):
+async def forward_to_feegow(appointment: dict, idempotency_key: str = None):
+    """Called from the appointment outbox; raises on a non-200 answer."""
     headers = {
         "Content-Type": "application/json",
         "x-access-token": FEEGOW_TOKEN  # 👈 correct header key
     }
+    if idempotency_key:
+        headers["Idempotency-Key"] = idempotency_key
 
 
     # Safely convert datetime fields to strings
@@ -35,12 +59,12 @@ def forward_to_feegow(appointment: dict):
         }
     }
 
-    print("📡 Pushing appointment to Feegow...")
-    response = requests.post(FEEGOW_API_URL, headers=headers, json=payload)
+    logger.info(f"Pushing appointment {appointment.get('id')} to Feegow")
+    response = await feegow_http().post(FEEGOW_API_URL, headers=headers, json=payload)
 
     if response.status_code == 200:
-        print("✅ Appointment pushed to Feegow successfully!")
-        print(response.json())
+        logger.info(f"Appointment {appointment.get('id')} pushed to Feegow")
     else:
-        print(f"❌ Feegow API Error: {response.text}")
+        # The body can echo patient data back; keep it out of the logs
+        logger.warning(f"Feegow rejected appointment {appointment.get('id')}: HTTP {response.status_code}")
         response.raise_for_status()
@@ -2,52 +2,34 @@
 
 import os
 import uuid
-import tempfile
 from datetime import datetime
 from fastapi import UploadFile, HTTPException
-from pdf2image import convert_from_bytes
-import pytesseract
-import docx
-from firecrawl import FirecrawlApp
-from motor.motor_asyncio import AsyncIOMotorClient
 from app.core.config import settings
-from app.services.vector_store import upsert_to_pinecone
-from openai import OpenAI
+from app.services.vector_store import upsert_to_pinecone, upsert_chunks_to_pinecone, delete_chunk_range
+from app.services.tabular_ingestor import TABULAR_EXTENSIONS, iter_table_chunks, table_to_parquet
+from app.db.mongo import crawl_pages_collection, db, document_tables_collection, urls_collection
+from app.services.text_extraction import extract_text
+from starlette.concurrency import iterate_in_threadpool
+from app.services.site_crawler import SiteCrawler, HttpxFetchBackend, MongoPageStore, PageState
+from app.core.clients import FIRECRAWL_SCRAPE_TIMEOUT_MS, get_openai, get_firecrawl
+from app.core.outbound import dependency
 from concurrent.futures import ThreadPoolExecutor
 import asyncio
 from app.core.logger import logger
-from PIL import Image
-import json
-import pandas as pd
-import io
+from bson import ObjectId
+from typing import Optional
 
 ALLOWED_EXTENSIONS = {".pdf", ".docx", ".txt", ".jpeg", ".jpg", ".png", ".csv", ".xlsx", ".json"}
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+EMBED_BATCH_SIZE = 64  # table chunks embedded per OpenAI call
 
-# MongoDB setup
-mongo_client = AsyncIOMotorClient(settings.MONGODB_URI)
-db = mongo_client[settings.MONGODB_DB]
+# MongoDB setup (shared client)
 documents = db["documents"]
-urls = db["urls"]
+urls = urls_collection
+crawl_pages = crawl_pages_collection
 
-# Firecrawl setup
-firecrawl = FirecrawlApp(api_key=settings.FIRECRAWL_API_KEY)
-
-# OpenAI embedding client
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
 executor = ThreadPoolExecutor()
 
-MAX_OCR_IMAGE_DIM = 3000  # px; you can adjust as needed
-
-def downscale_if_needed(img):
-    width, height = img.size
-    if max(width, height) > MAX_OCR_IMAGE_DIM:
-        scale = MAX_OCR_IMAGE_DIM / float(max(width, height))
-        new_size = (int(width * scale), int(height * scale))
-        logger.warning(f"Downscaled image from {img.size} to {new_size} for OCR.")
-        return img.resize(new_size, Image.LANCZOS)
-    return img
-
 def chunk_text(text: str, chunk_size=400, overlap=50):
     chunks = []
     start = 0
@@ -60,121 +42,36 @@ def chunk_text(text: str, chunk_size=400, overlap=50):
 
 async def embed_text(text: str) -> list[float]:
     loop = asyncio.get_event_loop()
-    res = await loop.run_in_executor(executor, lambda: client.embeddings.create(
+    res = await loop.run_in_executor(executor, lambda: get_openai().embeddings.create(
         model="text-embedding-3-small",
         input=text
     ))
     return res.data[0].embedding
 
 
-async def process_file(file: UploadFile, user_id: str) -> dict:
+async def ingest_file_bytes(filename: str, content: bytes, user_id: str) -> dict:
+    """
+    Ingest an already-read upload. OCR/parsing runs on the thread pool so that
+    several files can be processed concurrently without blocking the event loop.
+    """
     try:
-        ext = os.path.splitext(file.filename)[1].lower()
+        ext = os.path.splitext(filename)[1].lower()
         if ext not in ALLOWED_EXTENSIONS:
             raise HTTPException(status_code=400, detail=f"Unsupported file type: {ext}")
 
-        content = await file.read()
         if len(content) > MAX_FILE_SIZE:
             raise HTTPException(status_code=400, detail="File size exceeds 5MB limit.")
 
+        if ext in TABULAR_EXTENSIONS:
+            return await ingest_table_bytes(filename, ext, content, user_id)
+
         file_id = str(uuid.uuid4())
-        text = ""
-
-        # PDF
-        if ext == ".pdf":
-            try:
-                from pdf2image import convert_from_bytes
-                images = convert_from_bytes(content)
-                texts = []
-                for img in images:
-                    img = downscale_if_needed(img)
-                    texts.append(pytesseract.image_to_string(img))
-                text = "\n".join(texts)
-                if len(text.strip()) < 100:
-                    raise HTTPException(status_code=400, detail="PDF appears to contain no readable text.")
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"PDF OCR failed: {str(e)}")
-
-        # DOCX
-        elif ext == ".docx":
-            try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".docx") as tmp:
-                    tmp.write(content)
-                    tmp.flush()
-                    doc = docx.Document(tmp.name)
-                text = "\n".join(para.text for para in doc.paragraphs)
-                os.remove(tmp.name)
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"DOCX parsing failed: {str(e)}")
-
-        # TXT
-        elif ext == ".txt":
-            try:
-                text = content.decode("utf-8")
-            except Exception as e:
-                raise HTTPException(status_code=400, detail="Unable to decode text file.")
-
-        # IMAGE FILES (JPEG/JPG/PNG)
-        elif ext in [".jpeg", ".jpg", ".png"]:
-            try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tmp:
-                    tmp.write(content)
-                    tmp.flush()
-                    img = Image.open(tmp.name)
-                    img = downscale_if_needed(img)
-                    text = pytesseract.image_to_string(img)
-                    os.remove(tmp.name)
-                if not text.strip():
-                    raise HTTPException(status_code=400, detail="Image contains no readable text.")
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"Image OCR failed: {str(e)}")
-
-        elif ext == ".csv":
-            try:
-                # Try reading as UTF-8; fallback to latin1 for legacy files
-                try:
-                    df = pd.read_csv(io.BytesIO(content), encoding="utf-8")
-                except UnicodeDecodeError:
-                    df = pd.read_csv(io.BytesIO(content), encoding="latin1")
-                # Convert DataFrame to a readable text (limit rows/cols if needed)
-                text = df.to_csv(index=False)
-                if df.empty:
-                    raise HTTPException(status_code=400, detail="CSV contains no data.")
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"CSV parsing failed: {str(e)}")
-
-        # XLSX
-        elif ext == ".xlsx":
-            try:
-                df = pd.read_excel(io.BytesIO(content))
-                text = df.to_csv(index=False)
-                if df.empty:
-                    raise HTTPException(status_code=400, detail="XLSX contains no data.")
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"XLSX parsing failed: {str(e)}")
-
-        
-        elif ext == ".json":
-            try:
-                # Try decoding as UTF-8, fallback to latin1 for weird files
-                try:
-                    data = json.loads(content.decode("utf-8"))
-                except UnicodeDecodeError:
-                    data = json.loads(content.decode("latin1"))
-                except Exception as e:
-                    raise HTTPException(status_code=400, detail=f"JSON decoding failed: {str(e)}")
-
-                # Convert the loaded JSON to a pretty string for text search/embedding
-                text = json.dumps(data, ensure_ascii=False, indent=2)
-                if not text.strip():
-                    raise HTTPException(status_code=400, detail="JSON appears to be empty or invalid.")
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"JSON parsing failed: {str(e)}")
-        # Add more types as elif branches here if you wish
+        loop = asyncio.get_running_loop()
+        text = await loop.run_in_executor(executor, extract_text, ext, content)
 
         doc_record = {
             "file_id": file_id,
-            "filename": file.filename,
+            "filename": filename,
             "user_id": user_id,
             "extension": ext,
             "file_data": content,
@@ -190,20 +87,112 @@ async def process_file(file: UploadFile, user_id: str) -> dict:
 
         return {
             "document_id": str(result.inserted_id),
-            "filename": file.filename,
+            "filename": filename,
             "text_snippet": text[:200],
             "chunk_count": None,
             "source_type": "file"
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"🔥 process_file failed: {e}")
         raise HTTPException(status_code=500, detail=f"File ingestion failed: {str(e)}")
 
+
+async def ingest_table_bytes(filename: str, ext: str, content: bytes, user_id: str) -> dict:
+    """
+    Row-aware CSV/XLSX ingestion: rows are streamed from the parser in a worker
+    thread, packed into header-repeating chunks and embedded in batches, so
+    memory stays bounded by the batch rather than the spreadsheet.
+    """
+    doc_id = ObjectId()
+    chunk_count = 0
+    row_count = 0
+    preview = ""
+    sheets = []
+    batch = []
+
+    async def flush():
+        nonlocal chunk_count, batch
+        chunk_count += await upsert_chunks_to_pinecone(
+            str(doc_id), [chunk.as_vector_chunk() for chunk in batch], start_index=chunk_count
+        )
+        batch = []
+
+    try:
+        async for chunk in iterate_in_threadpool(iter_table_chunks(ext, content, filename)):
+            preview = preview or chunk.text
+            row_count += chunk.row_count
+            if chunk.sheet and chunk.sheet not in sheets:
+                sheets.append(chunk.sheet)
+            batch.append(chunk)
+            if len(batch) >= EMBED_BATCH_SIZE:
+                await flush()
+        if batch:
+            await flush()
+    except Exception:
+        await delete_chunk_range(str(doc_id), 0, chunk_count)
+        raise
+
+    if not chunk_count:
+        raise HTTPException(status_code=400, detail=f"{ext[1:].upper()} contains no data.")
+
+    doc_record = {
+        "_id": doc_id,
+        "file_id": str(uuid.uuid4()),
+        "filename": filename,
+        "user_id": user_id,
+        "extension": ext,
+        "file_data": content,
+        "text": preview,  # header + first rows; the full table lives in the vectors
+        "row_count": row_count,
+        "sheets": sheets,
+        "chunk_count": chunk_count,
+        "source_type": "file",
+        "created_at": datetime.utcnow()
+    }
+    await documents.insert_one(doc_record)
+    logger.info(f"Inserted table document {doc_id} ({row_count} rows, {chunk_count} chunks)")
+
+    # Columnar copy for exact aggregate answers (see services/table_qa.py)
+    try:
+        loop = asyncio.get_running_loop()
+        tables = await loop.run_in_executor(executor, table_to_parquet, ext, content)
+        if tables:
+            await document_tables_collection.insert_many([
+                {
+                    **table,
+                    "document_id": str(doc_id),
+                    "filename": filename,
+                    "user_id": user_id,
+                    "created_at": datetime.utcnow()
+                }
+                for table in tables
+            ])
+    except Exception as e:
+        logger.error(f"Parquet export failed for {filename}: {e}")
+
+    return {
+        "document_id": str(doc_id),
+        "filename": filename,
+        "text_snippet": preview[:200],
+        "chunk_count": chunk_count,
+        "source_type": "file"
+    }
+
+
+async def process_file(file: UploadFile, user_id: str) -> dict:
+    content = await file.read()
+    return await ingest_file_bytes(file.filename, content, user_id)
+
 async def process_url(url: str, user_id: str) -> dict:
     try:
         logger.info(f"Scraping URL: {url}")
-        response = firecrawl.scrape_url(url=url, formats=["markdown"])
+        # Firecrawl's SDK is synchronous; keep it off the event loop
+        response = await dependency("firecrawl").run_sync(
+            get_firecrawl().scrape_url, url=url, formats=["markdown"], timeout=FIRECRAWL_SCRAPE_TIMEOUT_MS
+        )
         content = response.markdown
         logger.info(f"Scraped content ({len(content)} chars) from URL")
 
@@ -234,3 +223,67 @@ async def process_url(url: str, user_id: str) -> dict:
     except Exception as e:
         logger.error(f"🔥 process_url failed: {e}")
         raise HTTPException(status_code=500, detail=f"URL ingestion failed: {str(e)}")
+
+
+async def _ingest_crawled_page(
+    url: str, text: str, previous: Optional[PageState], user_id: str, root_url: str
+) -> tuple[str, int]:
+    """Stores a new/changed crawled page in `urls` and (re-)embeds it."""
+    if previous and previous.doc_id:
+        doc_id = previous.doc_id
+        await urls.update_one(
+            {"_id": ObjectId(doc_id)},
+            {"$set": {"text": text, "updated_at": datetime.utcnow()}}
+        )
+    else:
+        result = await urls.insert_one({
+            "source": url,
+            "user_id": user_id,
+            "type": "url",
+            "text": text,
+            "source_type": "url",
+            "crawl_root": root_url,
+            "created_at": datetime.utcnow()
+        })
+        doc_id = str(result.inserted_id)
+
+    chunk_count = await upsert_to_pinecone(doc_id, text)
+    if previous:
+        await delete_chunk_range(doc_id, chunk_count, previous.chunk_count)
+    return doc_id, chunk_count
+
+
+async def crawl_site(
+    root_url: str,
+    user_id: str,
+    max_pages: int = 50,
+    max_depth: int = 2,
+    concurrency: int = 4,
+    delay_seconds: float = 0.5,
+    backend=None,
+) -> dict:
+    """
+    Crawls a site section or sitemap and feeds new/changed pages into the
+    embedding pipeline. Unchanged pages (304, or same content hash) are skipped.
+    """
+    owns_backend = backend is None
+    backend = backend or HttpxFetchBackend()
+
+    async def on_changed(url, text, previous):
+        return await _ingest_crawled_page(url, text, previous, user_id, root_url)
+
+    crawler = SiteCrawler(
+        backend,
+        MongoPageStore(crawl_pages),
+        on_changed,
+        max_pages=max_pages,
+        max_depth=max_depth,
+        concurrency=concurrency,
+        delay_seconds=delay_seconds,
+    )
+    try:
+        report = await crawler.crawl(root_url)
+    finally:
+        if owns_backend:
+            await backend.aclose()
+    return report.as_dict()
@@ -1,25 +1,32 @@
 # app/services/find_specialist_engine.py
 
+import asyncio
 from datetime import datetime
-from app.db.mongo import specialist_history_collection
+from app.db.mongo import specialist_history_collection, specialist_turns_collection
 import re
 import json
-from openai import OpenAI
+from typing import AsyncIterator, List
+from app.core.clients import get_async_openai
 from app.core.config import settings
-from app.services.prompt_templates import FIND_SPECIALIST_PROMPT
-from pinecone import Pinecone
-import openai
+from app.services.prompt_templates import FIND_SPECIALIST_PROMPT, ROUTED_SPECIALIST_PROMPT
 from app.core.logger import logger
 
 OPENAI_API_KEY = settings.OPENAI_API_KEY
-PINECONE_API_KEY = settings.PINECONE_API_KEY  # Store in env
-INDEX_HOST = "https://nudii-experts-description-7iqky9x.svc.aped-4627-b74a.pinecone.io"
-NAMESPACE = "specialist"
+SPECIALIST_MODEL = "gpt-4.1"
+LLM_TIMEOUT_SECONDS = 30.0
+SESSION_RECENT_TURNS = 5  # turns kept embedded in the session document
+PLACEHOLDER_IMAGE = "https://nudii.com.br/wp-content/uploads/2025/05/placeholder.png"
 
-pc = Pinecone(api_key=PINECONE_API_KEY)
-pinecone_index = pc.Index(host=INDEX_HOST)
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL)
+def error_response() -> dict:
+    return {
+        "response_message": "Sorry, there was an issue processing your request.",
+        "Name": "",
+        "Specialization": "",
+        "Registration": "",
+        "Image": PLACEHOLDER_IMAGE,
+        "doctor_description": ""
+    }
 
 def clean_and_parse(raw: str) -> dict:
     match = re.search(r"\{[\s\S]*\}", raw)
@@ -34,15 +41,15 @@ def clean_and_parse(raw: str) -> dict:
             elif all(k in parsed for k in ["response_message", "Name", "Specialization", "Registration", "Image", "doctor_description"]):
                 return parsed
         except Exception as e:
-            print("JSON in markdown but failed to parse:", e)
+            logger.warning(f"Specialist JSON in markdown failed to parse: {e}")
     # Fallback for plain text
-    print("Received non-JSON, wrapping as fallback JSON.")
+    logger.warning("Specialist response was not JSON, wrapping it as a fallback answer")
     return {
         "response_message": raw.strip(),
         "Name": "",
         "Specialization": "",
         "Registration": "",
-        "Image": "https://nudii.com.br/wp-content/uploads/2025/05/placeholder.png",
+        "Image": PLACEHOLDER_IMAGE,
         "doctor_description": ""
     }
 
@@ -53,35 +60,52 @@ async def save_specialist_history(
     session_id: str,
     response: dict
 ):
+    """
+    Appends the turn to specialist_turns (full history) and to the session's
+    embedded `queries`, which only keeps the last SESSION_RECENT_TURNS.
+    Sessions older than specialist_turns must be copied over first by
+    app/scripts/migrate_specialist_turns.py (run before deploying), or this
+    trim drops their older turns.
+    """
+    now = datetime.utcnow()
     entry = {
         "query": query,
         "doctor_name": doctor_name,
         "response": response,
-        "timestamp": datetime.utcnow()
+        "timestamp": now
     }
-    await specialist_history_collection.update_one(
-        {"user_email": user_email, "session_id": session_id},
-        {"$push": {"queries": entry}, "$set": {"last_updated": datetime.utcnow()}},
-        upsert=True
+    await asyncio.gather(
+        specialist_turns_collection.insert_one(
+            {"user_email": user_email, "session_id": session_id, **entry}
+        ),
+        specialist_history_collection.update_one(
+            {"user_email": user_email, "session_id": session_id},
+            {
+                "$push": {"queries": {"$each": [entry], "$slice": -SESSION_RECENT_TURNS}},
+                "$set": {"last_updated": now},
+            },
+            upsert=True
+        ),
     )
 
 async def get_recent_specialist_suggestions(user_email: str, max_records=5, session_id: str = None):
     """
-    Get the last N specialist suggestions for a user and session, sorted by time descending.
+    Get the last N specialist turns for a user and session (most recent last).
+    Only those N array entries are read from the session document.
     """
     session_doc = await specialist_history_collection.find_one(
-        {"user_email": user_email, "session_id": session_id}
+        {"user_email": user_email, "session_id": session_id},
+        {"_id": 0, "queries": {"$slice": -max_records}}
     )
-    if session_doc and "queries" in session_doc:
-        # Return last N turns (most recent last)
-        return session_doc["queries"][-max_records:]
-    return []
+    return session_doc.get("queries", []) if session_doc else []
 
 async def get_full_specialist_session_history(user_email: str, session_id: str):
-    session_doc = await specialist_history_collection.find_one(
-        {"user_email": user_email, "session_id": session_id}
-    )
-    return session_doc["queries"] if session_doc and "queries" in session_doc else []
+    """Every turn of a session, oldest first, from the append-only turns collection."""
+    cursor = specialist_turns_collection.find(
+        {"user_email": user_email, "session_id": session_id},
+        {"_id": 0, "user_email": 0, "session_id": 0}
+    ).sort("timestamp", 1)
+    return await cursor.to_list(length=None)
 
 
 def is_similar_query(new_query: str, old_query: str) -> bool:
@@ -108,69 +132,243 @@ def get_specialization(doc):
         ([doc.get('specialization', '')] if doc.get('specialization', '') else [])
     )
 
-def find_specialist_response(
+def build_specialist_messages(
     user_query: str,
-    system_prompt: str = FIND_SPECIALIST_PROMPT,
     context_str: str = "",
-    history: list = None
-) -> dict:
+    history: list = None,
+    instructions: str = FIND_SPECIALIST_PROMPT
+) -> list:
     """
-    Calls OpenAI LLM for specialist recommendation.
-    Optionally injects context_str (retrieved specialist info) and conversation history.
-    - user_query: Current query string from user.
-    - system_prompt: The base prompt for the LLM.
-    - context_str: Optional context block, e.g., Pinecone RAG results.
+    The one place the find-specialist prompt is assembled: profiles (once),
+    then instructions, then previous turns, then the current query.
+    - context_str: retrieved profiles, one JSON line each.
     - history: List of {'query':..., 'response':...} for previous turns.
     """
-    # 1. Compose system prompt
-    system_block = system_prompt
     if context_str:
-        system_block += f"\n\nHere are relevant doctor profiles from our database:\n{context_str}"
+        system_block = (
+            "Here are the relevant specialist profiles (choose only from these):\n"
+            f"{context_str}\n\n"
+            f"{instructions.strip()}"
+        )
+    else:
+        system_block = instructions.strip()
 
-    # 2. Compose message history for OpenAI
     messages = [{"role": "system", "content": system_block}]
-    # Add conversation history, if provided
-    if history:
-        for entry in history:
-            if "query" in entry:
-                messages.append({"role": "user", "content": entry["query"]})
-            if "response" in entry and entry["response"]:
-                resp_msg = entry["response"].get("response_message", "")
-                if resp_msg:
-                    messages.append({"role": "assistant", "content": resp_msg})
-    # Always end with the current query
+    for entry in history or []:
+        if "query" in entry:
+            messages.append({"role": "user", "content": entry["query"]})
+        if "response" in entry and entry["response"]:
+            resp_msg = entry["response"].get("response_message", "")
+            if resp_msg:
+                messages.append({"role": "assistant", "content": resp_msg})
     messages.append({"role": "user", "content": user_query})
-    #logger.info(messages)
+    return messages
 
-    # 3. Call OpenAI
+
+async def find_specialist_response(
+    user_query: str,
+    context_str: str = "",
+    history: list = None
+) -> dict:
+    """
+    Calls OpenAI LLM for specialist recommendation with the prompt from
+    build_specialist_messages().
+    """
+    messages = build_specialist_messages(user_query, context_str, history)
+
+    # Call OpenAI
     try:
-        resp = client.chat.completions.create(
-            model="gpt-4.1",
+        resp = await get_async_openai().chat.completions.create(
+            model=SPECIALIST_MODEL,
             messages=messages,
             temperature=0,
-            max_tokens=1024
+            max_tokens=1024,
+            timeout=LLM_TIMEOUT_SECONDS,
         )
         raw = resp.choices[0].message.content
+        if resp.usage:
+            logger.info(
+                f"find-specialist tokens: input={resp.usage.prompt_tokens} "
+                f"output={resp.usage.completion_tokens} profiles={len(context_str.splitlines())}"
+            )
         try:
             return clean_and_parse(raw)
         except Exception as e:
-            print("Returning fallback due to JSON parse failure.")
-            return {
-                "response_message": "Sorry, there was an issue processing your request.",
-                "Name": "",
-                "Specialization": "",
-                "Registration": "",
-                "Image": "https://nudii.com.br/wp-content/uploads/2025/05/placeholder.png",
-                "doctor_description": ""
-            }
+            logger.warning(f"Returning the fallback answer, specialist JSON parse failed: {e}")
+            return error_response()
 
     except Exception as e:
-        print("GPT call failed:", e)
-        return {
-            "response_message": "Sorry, there was an issue processing your request.",
-            "Name": "",
-            "Specialization": "",
-            "Registration": "",
-            "Image": "https://nudii.com.br/wp-content/uploads/2025/05/placeholder.png",
-            "doctor_description": ""
-        }
+        logger.error(f"Specialist GPT call failed: {e}", exc_info=True)
+        return error_response()
+
+
+# ---------------------
+# Pre-routed requests
+# ---------------------
+
+async def find_routed_specialist_response(
+    user_query: str,
+    candidates: list,
+    history: list = None
+) -> dict:
+    """
+    For queries the specialty pre-router resolved: the model only picks among
+    `candidates` (SpecialistProfile) by id and writes each response_message;
+    the card fields come from the profile store. Falls back to the full prompt
+    over the same candidates if the short answer can't be used.
+    """
+    by_id = {profile.id: profile for profile in candidates}
+    context_str = "\n".join(f"[{profile.id}] {profile.rendered}" for profile in candidates)
+    messages = build_specialist_messages(user_query, context_str, history, ROUTED_SPECIALIST_PROMPT)
+
+    try:
+        resp = await get_async_openai().chat.completions.create(
+            model=SPECIALIST_MODEL,
+            messages=messages,
+            temperature=0,
+            max_tokens=400,
+            response_format={"type": "json_object"},
+            timeout=LLM_TIMEOUT_SECONDS,
+        )
+        if resp.usage:
+            logger.info(
+                f"find-specialist (routed) tokens: input={resp.usage.prompt_tokens} "
+                f"output={resp.usage.completion_tokens} profiles={len(candidates)}"
+            )
+        picks = json.loads(resp.choices[0].message.content).get("specialists", [])
+        specialists = [
+            {"response_message": pick.get("response_message", ""), **by_id[pick.get("id")].card}
+            for pick in picks[:3]
+            if isinstance(pick, dict) and pick.get("id") in by_id
+        ]
+        if specialists:
+            return {"specialists": specialists}
+        logger.warning("Routed specialist answer named no known candidate, using full prompt")
+    except Exception as e:
+        logger.warning(f"Routed specialist call failed, using full prompt: {e}")
+
+    return await find_specialist_response(
+        user_query, "\n".join(profile.rendered for profile in candidates), history
+    )
+
+
+async def routed_specialist_events(user_query: str, candidates: list, history: list = None) -> AsyncIterator[dict]:
+    """find_routed_specialist_response() as the card/done events of stream_specialist_cards()."""
+    result = await find_routed_specialist_response(user_query, candidates, history)
+    for index, card in enumerate(result.get("specialists") or [result]):
+        yield {"type": "card", "index": index, "specialist": card}
+    yield {"type": "done", "response": result}
+
+
+# ---------------------
+# Streaming
+# ---------------------
+
+class SpecialistCardParser:
+    """
+    Incremental parser for a streamed {"specialists": [{...}, ...]} object:
+    feed() takes text in arbitrary pieces and returns each specialist object
+    as soon as its closing brace has arrived.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = None          # scan position, once the array has opened
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._obj_start = None
+        self.closed = False
+
+    def feed(self, text: str) -> List[dict]:
+        self.buffer += text
+        if self.closed:
+            return []
+        if self._pos is None:
+            match = re.search(r'"specialists"\s*:\s*\[', self.buffer)
+            if not match:
+                return []
+            self._pos = match.end()
+
+        cards, buf, i = [], self.buffer, self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                if self._depth == 0:
+                    self._obj_start = i
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0 and self._obj_start is not None:
+                    try:
+                        cards.append(json.loads(buf[self._obj_start:i + 1]))
+                    except ValueError as e:
+                        logger.warning(f"Skipping unparsable specialist card: {e}")
+                    self._obj_start = None
+            elif ch == "]" and self._depth == 0:
+                self.closed = True
+                break
+            i += 1
+        self._pos = i
+        return cards
+
+
+async def stream_specialist_cards(
+    user_query: str,
+    context_str: str = "",
+    history: list = None
+) -> AsyncIterator[dict]:
+    """
+    Streams the recommendation in JSON mode. Yields {"type": "card", "index", "specialist"}
+    for each specialist as soon as it is complete, then {"type": "done", "response"}
+    with the full parsed object. If the stream breaks after some cards went out,
+    the "done" response (and so the saved turn) holds exactly those cards.
+    """
+    messages = build_specialist_messages(user_query, context_str, history)
+    parser = SpecialistCardParser()
+    emitted = []
+
+    try:
+        stream = await get_async_openai().chat.completions.create(
+            model=SPECIALIST_MODEL,
+            messages=messages,
+            temperature=0,
+            max_tokens=1024,
+            response_format={"type": "json_object"},
+            stream=True,
+            stream_options={"include_usage": True},
+            timeout=LLM_TIMEOUT_SECONDS,
+        )
+        async for event in stream:
+            if event.usage:
+                logger.info(
+                    f"find-specialist tokens: input={event.usage.prompt_tokens} "
+                    f"output={event.usage.completion_tokens} profiles={len(context_str.splitlines())}"
+                )
+            if not event.choices:
+                continue
+            for card in parser.feed(event.choices[0].delta.content or ""):
+                yield {"type": "card", "index": len(emitted), "specialist": card}
+                emitted.append(card)
+        result = clean_and_parse(parser.buffer)
+    except Exception as e:
+        logger.error(f"GPT stream failed after {len(emitted)} cards: {e}", exc_info=True)
+        result = {"specialists": emitted} if emitted else error_response()
+    else:
+        if emitted and not result.get("specialists"):
+            result = {"specialists": emitted}   # array streamed fine, the trailing JSON didn't parse
+
+    # Flat single-object answers and fallbacks arrive whole: send them as one card
+    if not emitted:
+        for index, card in enumerate(result.get("specialists") or [result]):
+            yield {"type": "card", "index": index, "specialist": card}
+    yield {"type": "done", "response": result}
@@ -1,75 +1,118 @@
 # app/services/google.py
 
+import asyncio
+import io
 import os
-import requests
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from app.core.credentials import get_gcp_credentials
 from app.core.logger import logger
+from app.core.outbound import POLICIES, dependency
+from app.services.sheets_exporter import sheet_exporter
 from datetime import datetime
 
 # Load configs from environment
 GOOGLE_DRIVE_FOLDER_ID = os.getenv("GOOGLE_DRIVE_FOLDER_ID")
-GOOGLE_SHEETS_WEBHOOK_URL = os.getenv("GOOGLE_SHEETS_WEBHOOK_URL")
 GOOGLE_DRIVE_SCOPES = ["https://www.googleapis.com/auth/drive"]
+# Set when the upload folder is already shared "anyone with the link": files inherit it,
+# so the per-file permissions call can be skipped
+GOOGLE_DRIVE_FOLDER_PUBLIC = os.getenv("GOOGLE_DRIVE_FOLDER_PUBLIC", "").lower() in ("1", "true", "yes")
 
+DRIVE_UPLOAD_WORKERS = 4                # concurrent uploads; more requests wait for a worker
+DRIVE_CHUNK_SIZE = 4 * 1024 * 1024      # resumable chunk size, a multiple of 256 KiB
+DRIVE_NUM_RETRIES = 3                   # per chunk, with the client library's backoff
+DRIVE_REQUEST_TIMEOUT = POLICIES["google_drive"].timeout   # socket timeout of each HTTP request, i.e. per chunk
 
-def upload_file_to_drive(local_path: str, filename: str) -> str:
+drive_executor = ThreadPoolExecutor(max_workers=DRIVE_UPLOAD_WORKERS, thread_name_prefix="drive-upload")
+_worker_state = threading.local()
+
+
+@lru_cache(maxsize=1)
+def _drive_credentials():
+    return get_gcp_credentials(GOOGLE_DRIVE_SCOPES)
+
+
+def _drive_service():
     """
-    Uploads a file to Google Drive and returns a public shareable link.
+    One authorized Drive service per upload worker. Built once per thread (the
+    discovery document ships with the client library) because the underlying
+    HTTP client is not thread-safe; the credentials are shared. Each request
+    (one chunk of an upload) has its own socket timeout, so a stalled upload
+    fails while one that is making progress is never cut off.
     """
+    service = getattr(_worker_state, "drive", None)
+    if service is None:
+        import httplib2
+        from google_auth_httplib2 import AuthorizedHttp
+        from googleapiclient.discovery import build
+
+        http = AuthorizedHttp(_drive_credentials(), http=httplib2.Http(timeout=DRIVE_REQUEST_TIMEOUT))
+        service = build("drive", "v3", http=http, cache_discovery=False)
+        _worker_state.drive = service
+    return service
+
+
+def _upload_media_to_drive(media, filename: str) -> str:
     if not GOOGLE_DRIVE_FOLDER_ID:
         raise ValueError("Missing GOOGLE_DRIVE_FOLDER_ID")
 
-    # Load credentials using shared helper
-    creds = get_gcp_credentials(GOOGLE_DRIVE_SCOPES)
-    drive_service = build("drive", "v3", credentials=creds)
-
+    drive_service = _drive_service()
     file_metadata = {
         "name": filename,
         "parents": [GOOGLE_DRIVE_FOLDER_ID]
     }
 
-    media = MediaFileUpload(local_path, resumable=True)
-
-    uploaded = drive_service.files().create(
-        body=file_metadata,
-        media_body=media,
-        fields="id"
-    ).execute()
+    # Chunked resumable upload: a failed chunk is retried, not the whole file
+    request = drive_service.files().create(body=file_metadata, media_body=media, fields="id")
+    uploaded = None
+    while uploaded is None:
+        _, uploaded = request.next_chunk(num_retries=DRIVE_NUM_RETRIES)
 
     file_id = uploaded.get("id")
 
     # Make file public
-    drive_service.permissions().create(
-        fileId=file_id,
-        body={"role": "reader", "type": "anyone"},
-    ).execute()
+    if not GOOGLE_DRIVE_FOLDER_PUBLIC:
+        drive_service.permissions().create(
+            fileId=file_id,
+            body={"role": "reader", "type": "anyone"},
+        ).execute(num_retries=DRIVE_NUM_RETRIES)
 
     public_url = f"https://drive.google.com/file/d/{file_id}/view?usp=sharing"
     logger.info(f"Uploaded to Google Drive: {public_url}")
     return public_url
 
 
-def post_to_google_sheets(form_data: dict):
+def upload_bytes_to_drive(data: bytes, filename: str, mime_type: str = "application/octet-stream") -> str:
+    """
+    Uploads an in-memory file to Google Drive and returns a public shareable link. Blocking.
+    """
+    from googleapiclient.http import MediaIoBaseUpload
+
+    media = MediaIoBaseUpload(io.BytesIO(data), mimetype=mime_type, chunksize=DRIVE_CHUNK_SIZE, resumable=True)
+    return _upload_media_to_drive(media, filename)
+
+
+async def upload_to_drive(data: bytes, filename: str, mime_type: str = "application/octet-stream") -> str:
     """
-    Sends the submitted form data to a Google Sheets webhook URL.
+    Uploads from memory on the Drive worker pool, so Drive latency never blocks the event loop.
+    The breaker is applied inside the worker: the upload is bounded per chunk by the HTTP timeout,
+    not as a whole, so a timed-out caller never leaves an upload running with its link lost.
     """
-    if not GOOGLE_SHEETS_WEBHOOK_URL:
-        logger.warning("Sheets webhook not configured")
-        return
+    loop = asyncio.get_running_loop()
+    drive = dependency("google_drive")
+    return await loop.run_in_executor(
+        drive_executor, lambda: drive.call_sync(lambda: upload_bytes_to_drive(data, filename, mime_type))
+    )
 
-    try:
-        response = requests.post(GOOGLE_SHEETS_WEBHOOK_URL, json=form_data)
 
-        if response.ok:
-            logger.info("Data posted to Google Sheets")
-        else:
-            logger.error(f"Failed to send data to Google Sheets: {response.text}")
-    except Exception as e:
-        logger.exception(f"Exception while posting to Sheets: {e}")
+async def post_to_google_sheets(form_data: dict):
+    """
+    Queues a row for the Google Sheets webhook; the exporter sends it in the background.
+    """
+    await sheet_exporter.export(form_data)
 
-def post_to_google_sheets_signup(user_doc: dict):
+async def post_to_google_sheets_signup(user_doc: dict):
 
     sheet_row = {
         "Timestamp": user_doc["created_at"].strftime("%m/%d/%Y %H:%M"),
@@ -82,11 +125,10 @@ def post_to_google_sheets_signup(user_doc: dict):
         "Lead Source": user_doc.get("lead_source", ""),
         "Google Drive Link": "",
     }
-    print("SENDING TO SHEETS:", sheet_row)
-    post_to_google_sheets(sheet_row)
+    await post_to_google_sheets(sheet_row)
 
 
-def post_to_google_sheets_clinical_trial(form_data: dict):
+async def post_to_google_sheets_clinical_trial(form_data: dict):
     """
     Maps clinical trial intake form data to Google Sheets row fields exactly.
     """
@@ -100,4 +142,4 @@ def post_to_google_sheets_clinical_trial(form_data: dict):
         "Lead Source": form_data.get("lead_source", ""),
         "Google Drive Link": form_data.get("google_drive_link", ""),
     }
-    post_to_google_sheets(sheet_row)
+    await post_to_google_sheets(sheet_row)
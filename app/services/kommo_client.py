@@ -0,0 +1,138 @@
+# app/services/kommo_client.py
+
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.outbound import POLICIES, async_transport
+from app.db.mongo import kommo_tokens_collection
+from app.models.kommo import KommoToken
+
+SUBDOMAIN = "imf"
+KOMMO_BASE_URL = f"https://{SUBDOMAIN}.kommo.com"
+KOMMO_TIMEOUT_SECONDS = POLICIES["kommo"].timeout
+TOKEN_REFRESH_MARGIN = timedelta(minutes=10)   # refresh this long before the token expires
+TOKEN_DOC_ID = "kommo"
+# Token file written by the original OAuth setup; imported into Mongo once if Mongo has none
+LEGACY_TOKEN_FILE = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "kommo_token.json"))
+
+
+class KommoAuthError(Exception):
+    pass
+
+
+def with_expiry(payload: dict, now: Optional[datetime] = None) -> KommoToken:
+    token = KommoToken(**payload)
+    if token.expires_at is None:
+        token.expires_at = (now or datetime.utcnow()) + timedelta(seconds=token.expires_in)
+    return token
+
+
+def needs_refresh(token: Optional[KommoToken], now: Optional[datetime] = None) -> bool:
+    if token is None or token.expires_at is None:
+        return True
+    return (now or datetime.utcnow()) >= token.expires_at - TOKEN_REFRESH_MARGIN
+
+
+class KommoClient:
+    """
+    Async Kommo API client over one keep-alive connection pool. The OAuth
+    token lives in memory, is persisted to `kommo_tokens`, and is refreshed
+    before it expires by a single caller while concurrent requests wait.
+    """
+
+    def __init__(self, base_url: str = KOMMO_BASE_URL, collection=kommo_tokens_collection, transport=None):
+        self.base_url = base_url
+        self.collection = collection
+        self._transport = transport
+        self._http: Optional[httpx.AsyncClient] = None
+        self._token: Optional[KommoToken] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=KOMMO_TIMEOUT_SECONDS,
+                transport=self._transport or async_transport(
+                    "kommo", limits=httpx.Limits(max_connections=10, max_keepalive_connections=5)
+                ),
+            )
+        return self._http
+
+    async def _load_stored_token(self) -> Optional[KommoToken]:
+        doc = await self.collection.find_one({"_id": TOKEN_DOC_ID}, {"_id": 0})
+        if doc:
+            return with_expiry(doc)
+        if os.path.exists(LEGACY_TOKEN_FILE):
+            with open(LEGACY_TOKEN_FILE, "r") as f:
+                token = with_expiry(json.load(f))
+            await self._store(token)
+            logger.info("Imported Kommo token from kommo_token.json into Mongo")
+            return token
+        return None
+
+    async def _store(self, token: KommoToken) -> None:
+        await self.collection.update_one(
+            {"_id": TOKEN_DOC_ID},
+            {"$set": {**token.dict(), "updated_at": datetime.utcnow()}},
+            upsert=True,
+        )
+
+    async def _refresh(self, token: KommoToken) -> KommoToken:
+        res = await self.http.post("/oauth2/access_token", json={
+            "client_id": settings.KOMMO_CLIENT_ID,
+            "client_secret": settings.KOMMO_CLIENT_SECRET,
+            "grant_type": "refresh_token",
+            "refresh_token": token.refresh_token,
+            "redirect_uri": settings.KOMMO_REDIRECT_URI,
+        })
+        if res.status_code != 200:
+            raise KommoAuthError(f"Kommo token refresh failed: {res.status_code} {res.text[:300]}")
+        refreshed = with_expiry(res.json())
+        await self._store(refreshed)
+        logger.info(f"Kommo token refreshed, valid until {refreshed.expires_at:%Y-%m-%d %H:%M} UTC")
+        return refreshed
+
+    async def access_token(self, force_refresh: bool = False) -> str:
+        token = self._token
+        if token is not None and not force_refresh and not needs_refresh(token):
+            return token.access_token
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # Whoever held the lock may already have refreshed it
+            if self._token is not token and not needs_refresh(self._token):
+                return self._token.access_token
+            if self._token is None:
+                self._token = await self._load_stored_token()
+            if self._token is None:
+                raise KommoAuthError("No Kommo token stored.")
+            if force_refresh or needs_refresh(self._token):
+                self._token = await self._refresh(self._token)
+            return self._token.access_token
+
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """Authorized request; a 401 (token revoked early) triggers one refresh and retry."""
+        token = await self.access_token()
+        res = await self.http.request(method, path, headers={"Authorization": f"Bearer {token}"}, **kwargs)
+        if res.status_code == 401:
+            token = await self.access_token(force_refresh=True)
+            res = await self.http.request(method, path, headers={"Authorization": f"Bearer {token}"}, **kwargs)
+        return res
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+
+kommo_client = KommoClient()
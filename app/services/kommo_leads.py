@@ -0,0 +1,133 @@
+# app/services/kommo_leads.py
+
+import asyncio
+import time
+from typing import Awaitable, Callable, List, Optional, Set, Tuple
+from uuid import uuid4
+
+from app.core.logger import logger
+
+BATCH_WINDOW_SECONDS = 0.25    # how long a lead waits for others to share its request
+MAX_BATCH_SIZE = 50            # Kommo's limit per complex-leads request
+MAX_REQUESTS_PER_SECOND = 5    # Kommo allows 7/s per account; leave room for other calls
+TRANSIENT_CLIENT_STATUS = {408, 409, 425, 429}
+
+
+def is_rejected_payload(exc: BaseException) -> bool:
+    """A 4xx that retrying won't fix: Kommo refused something in the request body."""
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None)
+    return isinstance(status, int) and 400 <= status < 500 and status not in TRANSIENT_CLIENT_STATUS
+
+
+class KommoLeadBatcher:
+    """
+    Coalesces leads from every flow into batched `leads/complex` requests.
+
+    `submit` parks the lead for up to BATCH_WINDOW_SECONDS (less if a batch
+    fills up) and resolves with Kommo's result for that lead. Requests go out
+    one at a time, spaced to stay under the account rate limit. Kommo rejects
+    a whole batch for one invalid lead, so a rejected batch is split in half
+    and resent until only the offending leads fail.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[List[dict]], Awaitable[List[dict]]],
+        window: float = BATCH_WINDOW_SECONDS,
+        max_batch: int = MAX_BATCH_SIZE,
+        rate: float = MAX_REQUESTS_PER_SECOND,
+        is_rejection: Callable[[BaseException], bool] = is_rejected_payload,
+    ):
+        self._send = send
+        self.is_rejection = is_rejection
+        self.window = window
+        self.max_batch = max_batch
+        self.min_interval = 1.0 / rate
+        self._pending: List[Tuple[dict, asyncio.Future]] = []
+        self._timer: Optional[asyncio.Task] = None
+        self._in_flight: Set[asyncio.Task] = set()
+        self._send_lock: Optional[asyncio.Lock] = None
+        self._next_request_at = 0.0
+
+    async def submit(self, lead: dict) -> dict:
+        """Queues one lead; returns {"id", "contact_id", ...} once its batch is created."""
+        lead = {**lead, "request_id": lead.get("request_id") or uuid4().hex}
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((lead, future))
+
+        while len(self._pending) >= self.max_batch:
+            batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            self._spawn(self._send_batch(batch))
+        if self._pending and self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+        return await future
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.window)
+        self._timer = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        batch, self._pending = self._pending, []
+        for i in range(0, len(batch), self.max_batch):
+            await self._send_batch(batch[i:i + self.max_batch])
+
+    async def _request(self, leads: List[dict]) -> List[dict]:
+        if self._send_lock is None:
+            self._send_lock = asyncio.Lock()
+        async with self._send_lock:
+            delay = self._next_request_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                return await self._send(leads)
+            finally:
+                self._next_request_at = time.monotonic() + self.min_interval
+
+    async def _send_batch(self, batch: List[Tuple[dict, asyncio.Future]]) -> None:
+        try:
+            results = await self._request([lead for lead, _ in batch])
+        except Exception as e:
+            if len(batch) > 1 and self.is_rejection(e):
+                logger.warning(f"Kommo rejected a batch of {len(batch)} leads, resending in halves: {e}")
+                middle = len(batch) // 2
+                await self._send_batch(batch[:middle])
+                await self._send_batch(batch[middle:])
+                return
+            logger.warning(f"Kommo batch of {len(batch)} leads failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        logger.info(f"Kommo batch created {len(results)} of {len(batch)} leads")
+        by_request_id = {}
+        for result in results:
+            request_ids = result.get("request_id") or []
+            for request_id in request_ids if isinstance(request_ids, list) else [request_ids]:
+                by_request_id[str(request_id)] = result
+        for position, (lead, future) in enumerate(batch):
+            if future.done():
+                continue
+            result = by_request_id.get(lead["request_id"])
+            if result is None and len(results) == len(batch):
+                result = results[position]  # Kommo answers in request order
+            if result is None:
+                future.set_exception(RuntimeError(f"Kommo returned no result for lead {lead['request_id']}"))
+            else:
+                future.set_result(result)
+
+    async def close(self) -> None:
+        """Sends whatever is still waiting; called on shutdown."""
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        await self.flush()
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
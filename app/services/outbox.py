@@ -0,0 +1,224 @@
+# app/services/outbox.py
+
+"""
+Transactional outbox for calls to third-party systems.
+
+A document that has to be delivered somewhere carries its own delivery state
+under `sync.<target>`, written in the same insert as the document itself, so
+the request that creates it never waits on the third party. The dispatcher
+claims due entries, delivers them with retries and exponential backoff, and
+dead-letters entries that keep failing.
+"""
+
+import asyncio
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+from app.core.logger import logger
+
+OUTBOX_FIELD = "sync"
+MAX_ATTEMPTS = 8
+BASE_BACKOFF_SECONDS = 10
+MAX_BACKOFF_SECONDS = 6 * 3600
+LEASE_SECONDS = 120           # a claimed entry is retried if its worker dies before finishing
+POLL_INTERVAL_SECONDS = 5
+BATCH_SIZE = 20               # entries per target per pass, i.e. max concurrent deliveries per target
+HISTORY_LIMIT = 10            # per-attempt outcomes kept on each entry
+
+PENDING = "pending"
+SENDING = "sending"
+DONE = "done"
+DEAD = "dead"
+
+
+class PermanentDeliveryError(Exception):
+    """Raised by a delivery function when retrying cannot help (e.g. a rejected payload)."""
+
+
+def outbox_entry(idempotency_key: str, now: Optional[datetime] = None) -> dict:
+    return {
+        "status": PENDING,
+        "attempts": 0,
+        "idempotency_key": idempotency_key,
+        "next_attempt_at": now or datetime.utcnow(),
+        "last_error": None,
+    }
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Exponential backoff with jitter, so retries of a shared outage don't fire together."""
+    cap = min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2 ** max(attempts - 1, 0))
+    return random.uniform(cap / 2, cap)
+
+
+def attempt_record(target: str, now: datetime, error: Optional[Exception] = None) -> dict:
+    """$push appending one attempt's outcome to the entry's capped history."""
+    outcome = {"at": now, "ok": error is None}
+    if error is not None:
+        outcome["error"] = str(error)[:200]
+    return {f"{OUTBOX_FIELD}.{target}.history": {"$each": [outcome], "$slice": -HISTORY_LIMIT}}
+
+
+def failure_update(target: str, attempts: int, error: Exception, now: datetime) -> dict:
+    """$set for a failed delivery: rescheduled with backoff, or dead-lettered."""
+    prefix = f"{OUTBOX_FIELD}.{target}"
+    dead = isinstance(error, PermanentDeliveryError) or attempts >= MAX_ATTEMPTS
+    update = {
+        f"{prefix}.attempts": attempts,
+        f"{prefix}.last_error": str(error)[:500],
+        f"{prefix}.status": DEAD if dead else PENDING,
+    }
+    if dead:
+        update[f"{prefix}.dead_at"] = now
+    else:
+        update[f"{prefix}.next_attempt_at"] = now + timedelta(seconds=backoff_seconds(attempts))
+    return update
+
+
+@dataclass
+class OutboxTarget:
+    name: str
+    collection: object
+    deliver: Callable[[dict, str], Awaitable[None]]   # (document, idempotency key)
+    on_delivered: Optional[Dict] = None                # extra fields $set on success
+    on_dead: Optional[Callable[[dict], Awaitable[None]]] = None   # called once an entry is dead-lettered
+
+
+class OutboxDispatcher:
+    def __init__(self, targets: List[OutboxTarget]):
+        self.targets = {t.name: t for t in targets}
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _claim(self, target: OutboxTarget, now: datetime) -> Optional[dict]:
+        prefix = f"{OUTBOX_FIELD}.{target.name}"
+        # SENDING entries whose lease ran out are claimable again
+        return await target.collection.find_one_and_update(
+            {f"{prefix}.status": {"$in": [PENDING, SENDING]}, f"{prefix}.next_attempt_at": {"$lte": now}},
+            {"$set": {
+                f"{prefix}.status": SENDING,
+                f"{prefix}.next_attempt_at": now + timedelta(seconds=LEASE_SECONDS),
+            }},
+            sort=[(f"{prefix}.next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _deliver(self, target: OutboxTarget, doc: dict) -> None:
+        prefix = f"{OUTBOX_FIELD}.{target.name}"
+        entry = doc[OUTBOX_FIELD][target.name]
+        try:
+            await target.deliver(doc, entry.get("idempotency_key") or f"{target.name}:{doc['_id']}")
+        except Exception as e:
+            attempts = entry.get("attempts", 0) + 1
+            now = datetime.utcnow()
+            update = failure_update(target.name, attempts, e, now)
+            await target.collection.update_one(
+                {"_id": doc["_id"]}, {"$set": update, "$push": attempt_record(target.name, now, e)}
+            )
+            logger.warning(
+                f"Outbox {target.name} delivery of {doc['_id']} failed "
+                f"(attempt {attempts}, {update[f'{prefix}.status']}): {e}"
+            )
+            if update[f"{prefix}.status"] == DEAD and target.on_dead:
+                await target.on_dead(doc)
+            return
+
+        now = datetime.utcnow()
+        await target.collection.update_one({"_id": doc["_id"]}, {
+            "$set": {
+                f"{prefix}.status": DONE,
+                f"{prefix}.attempts": entry.get("attempts", 0) + 1,
+                f"{prefix}.delivered_at": now,
+                f"{prefix}.last_error": None,
+                **(target.on_delivered or {}),
+            },
+            "$push": attempt_record(target.name, now),
+        })
+        logger.info(f"Outbox {target.name} delivered {doc['_id']}")
+
+    async def _drain(self, target: OutboxTarget) -> int:
+        claimed = []
+        while len(claimed) < BATCH_SIZE:
+            doc = await self._claim(target, datetime.utcnow())
+            if doc is None:
+                break
+            claimed.append(doc)
+        # Delivered together, so targets that batch requests (Kommo) can coalesce them
+        await asyncio.gather(*(self._deliver(target, doc) for doc in claimed))
+        return len(claimed)
+
+    async def run_once(self) -> int:
+        """One pass over every target; targets are delivered concurrently."""
+        counts = await asyncio.gather(*(self._drain(t) for t in self.targets.values()))
+        return sum(counts)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                busy = await self.run_once()
+            except Exception as e:
+                logger.warning(f"Outbox pass failed: {e}")
+                busy = 0
+            if busy:
+                continue
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def notify(self) -> None:
+        """Wakes the dispatcher after new entries were written."""
+        self._wake.set()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _requeue_filter(self, target: OutboxTarget) -> dict:
+        # In-flight entries are left alone: their lease expiring already makes them claimable
+        prefix = f"{OUTBOX_FIELD}.{target.name}"
+        already_delivered = {field: {"$ne": value} for field, value in (target.on_delivered or {}).items()}
+        return {f"{prefix}.status": {"$nin": [DONE, SENDING]}, **already_delivered}
+
+    def _requeue_update(self, target: OutboxTarget, extra: Optional[Dict] = None) -> dict:
+        prefix = f"{OUTBOX_FIELD}.{target.name}"
+        return {"$set": {
+            f"{prefix}.status": PENDING,
+            f"{prefix}.attempts": 0,
+            f"{prefix}.next_attempt_at": datetime.utcnow(),
+            **{f"{prefix}.{field}": value for field, value in (extra or {}).items()},
+        }}
+
+    async def requeue(self, target_name: str, doc_id) -> bool:
+        """Puts a dead or failed entry back in the queue with a fresh attempt budget."""
+        target = self.targets[target_name]
+        result = await target.collection.update_one(
+            {"_id": doc_id, **self._requeue_filter(target)}, self._requeue_update(target)
+        )
+        if result.modified_count:
+            self.notify()
+        return bool(result.modified_count)
+
+    async def requeue_many(self, target_name: str, doc_ids: list, extra: Optional[Dict] = None) -> int:
+        """`requeue` for a page of documents in one write; `extra` is stored on each requeued entry."""
+        target = self.targets[target_name]
+        result = await target.collection.update_many(
+            {"_id": {"$in": doc_ids}, **self._requeue_filter(target)}, self._requeue_update(target, extra)
+        )
+        if result.modified_count:
+            self.notify()
+        return result.modified_count
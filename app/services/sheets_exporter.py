@@ -0,0 +1,189 @@
+# app/services/sheets_exporter.py
+
+"""
+Buffered export of rows to the Google Sheets webhook.
+
+Callers only append a row to a Mongo-backed queue; a background task flushes
+the queue in batches, when BATCH_SIZE rows are waiting or every
+FLUSH_INTERVAL_SECONDS, and retries failed batches with backoff. Rows survive
+restarts because they are only deleted once the webhook accepted them.
+"""
+
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional
+from uuid import uuid4
+
+import httpx
+
+from app.core.logger import logger
+from app.core.outbound import POLICIES, async_transport
+from app.db.mongo import sheet_rows_collection
+from app.services.outbox import LEASE_SECONDS, backoff_seconds
+
+BATCH_SIZE = 50
+FLUSH_INTERVAL_SECONDS = 10
+MAX_ATTEMPTS = 10
+WEBHOOK_TIMEOUT_SECONDS = POLICIES["google_sheets"].timeout
+
+
+class MongoRowQueue:
+    def __init__(self, collection=sheet_rows_collection):
+        self.collection = collection
+
+    async def add(self, row: dict) -> None:
+        now = datetime.utcnow()
+        await self.collection.insert_one({"row": row, "attempts": 0, "created_at": now, "next_attempt_at": now})
+
+    async def claim(self, limit: int) -> List[dict]:
+        """
+        Leases up to `limit` due rows to this flush. The update re-checks that each
+        row is still due, so rows another worker claimed meanwhile are skipped; a
+        lease that runs out (worker died mid-flush) makes the rows due again.
+        """
+        now = datetime.utcnow()
+        due = {"next_attempt_at": {"$lte": now}, "attempts": {"$lt": MAX_ATTEMPTS}}
+        candidates = await self.collection.find(due, {"_id": 1}).sort("created_at", 1).limit(limit).to_list(length=limit)
+        if not candidates:
+            return []
+        claim_id = uuid4().hex
+        await self.collection.update_many(
+            {"_id": {"$in": [c["_id"] for c in candidates]}, **due},
+            {"$set": {"next_attempt_at": now + timedelta(seconds=LEASE_SECONDS), "claim_id": claim_id}},
+        )
+        return await self.collection.find({"claim_id": claim_id}).sort("created_at", 1).to_list(length=limit)
+
+    async def ack(self, ids: list) -> None:
+        if ids:
+            await self.collection.delete_many({"_id": {"$in": ids}})
+
+    async def retry(self, entries: List[dict], error: Exception) -> None:
+        ids = [e["_id"] for e in entries]
+        attempts = max(e.get("attempts", 0) for e in entries) + 1
+        now = datetime.utcnow()
+        await self.collection.update_many(
+            {"_id": {"$in": ids}},
+            {
+                "$inc": {"attempts": 1},
+                "$set": {
+                    "next_attempt_at": now + timedelta(seconds=backoff_seconds(attempts)),
+                    "last_error": str(error)[:500],
+                },
+            },
+        )
+        dead = await self.collection.update_many(
+            {"_id": {"$in": ids}, "attempts": {"$gte": MAX_ATTEMPTS}}, {"$set": {"dead_at": now}}
+        )
+        if dead.modified_count:
+            logger.error(f"Dead-lettered {dead.modified_count} Sheets rows after {MAX_ATTEMPTS} attempts: {error}")
+
+    async def dead_letters(self, limit: int = 100) -> List[dict]:
+        return await self.collection.find({"dead_at": {"$exists": True}}).sort("dead_at", -1).to_list(length=limit)
+
+
+class SheetExporter:
+    def __init__(
+        self,
+        url: Optional[str],
+        queue=None,
+        batch_mode: bool = False,
+        http: Optional[httpx.AsyncClient] = None,
+    ):
+        self.url = url
+        self.queue = queue or MongoRowQueue()
+        # Batch mode posts {"rows": [...]} in one call; the Apps Script must accept that shape.
+        # Otherwise rows are posted one by one over the same connection.
+        self.batch_mode = batch_mode
+        self._http = http
+        self._wake = asyncio.Event()
+        self._added = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None:
+            # Apps Script answers with a redirect to the script output
+            self._http = httpx.AsyncClient(
+                timeout=WEBHOOK_TIMEOUT_SECONDS, follow_redirects=True, transport=async_transport("google_sheets")
+            )
+        return self._http
+
+    async def export(self, row: dict) -> None:
+        """Queues one row; returns after a single Mongo insert."""
+        if not self.url:
+            logger.warning("Sheets webhook not configured")
+            return
+        await self.queue.add(row)
+        self._added += 1
+        if self._added >= BATCH_SIZE:
+            self._wake.set()
+
+    async def _post(self, row_or_batch) -> None:
+        res = await self.http.post(self.url, json=row_or_batch)
+        res.raise_for_status()
+
+    async def flush(self) -> int:
+        """Sends every due row; stops at the first failing batch. Returns rows delivered."""
+        self._added = 0
+        delivered = 0
+        while True:
+            entries = await self.queue.claim(BATCH_SIZE)
+            if not entries:
+                return delivered
+            sent = []
+            try:
+                if self.batch_mode:
+                    await self._post({"rows": [e["row"] for e in entries]})
+                    sent = entries
+                else:
+                    for entry in entries:
+                        await self._post(entry["row"])
+                        sent.append(entry)
+            except Exception as e:
+                await self.queue.ack([s["_id"] for s in sent])
+                await self.queue.retry(entries[len(sent):], e)
+                logger.warning(f"Sheets export failed after {delivered + len(sent)} rows: {e}")
+                return delivered + len(sent)
+            await self.queue.ack([s["_id"] for s in sent])
+            delivered += len(sent)
+            logger.info(f"Exported {len(sent)} rows to Google Sheets")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=FLUSH_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"Sheets export pass failed: {e}")
+
+    def start(self) -> None:
+        if self.url and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stops the flusher and makes a last attempt at whatever is queued."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"Final Sheets export failed, rows kept for next start: {e}")
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+
+sheet_exporter = SheetExporter(
+    os.getenv("GOOGLE_SHEETS_WEBHOOK_URL"),
+    batch_mode=os.getenv("GOOGLE_SHEETS_WEBHOOK_BATCH", "").lower() in ("1", "true", "yes"),
+)
@@ -1,8 +1,8 @@
 # app/services/simple_chat_engine.py
 
-from openai import OpenAI
+from app.core.clients import get_openai
 from app.core.config import settings
-from motor.motor_asyncio import AsyncIOMotorClient
+from app.db.mongo import db
 from uuid import uuid4
 from datetime import datetime
 import asyncio
@@ -10,16 +10,8 @@ import json
 from typing import List, Dict, Optional, Any
 
 # MongoDB setup
-mongo_client = AsyncIOMotorClient(settings.MONGODB_URI)
-db = mongo_client[settings.MONGODB_DB]
 conversations = db["conversations"]
 
-# OpenAI client
-client = OpenAI(
-    api_key=settings.OPENAI_API_KEY,
-    base_url=settings.OPENAI_BASE_URL
-)
-
 def generate_timestamped_msgs(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     return [
         {**msg, "timestamp": datetime.utcnow().isoformat()}
@@ -61,7 +53,7 @@ async def simple_chat_with_assistant(
     final_messages = [system_prompt] + prior_messages + message_dicts
 
     try:
-        response = client.chat.completions.create(
+        response = get_openai().chat.completions.create(
             model=cfg["model"],
             messages=final_messages,
             temperature=cfg["temperature"],
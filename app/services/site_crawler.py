@@ -0,0 +1,327 @@
+# app/services/site_crawler.py
+
+import asyncio
+import hashlib
+import time
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Protocol, Tuple
+from urllib import robotparser
+from urllib.parse import urljoin, urldefrag, urlparse
+
+import httpx
+
+from app.core.logger import logger
+
+USER_AGENT = "HealthcareAI-Crawler/1.0"
+
+
+# ---------------------
+# Fetch backends
+# ---------------------
+
+@dataclass
+class FetchResult:
+    url: str
+    status: int
+    headers: Dict[str, str]
+    body: str
+
+
+class FetchBackend(Protocol):
+    async def fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> FetchResult: ...
+
+    async def aclose(self) -> None: ...
+
+
+class HttpxFetchBackend:
+    """Default backend: a single pooled async HTTP client."""
+
+    def __init__(self, timeout: float = 15.0, user_agent: str = USER_AGENT):
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            follow_redirects=True,
+            headers={"User-Agent": user_agent},
+        )
+
+    async def fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> FetchResult:
+        res = await self._client.get(url, headers=headers or {})
+        return FetchResult(
+            url=str(res.url),
+            status=res.status_code,
+            headers={k.lower(): v for k, v in res.headers.items()},
+            body=res.text,
+        )
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+# ---------------------
+# Page state (for conditional re-fetch)
+# ---------------------
+
+@dataclass
+class PageState:
+    url: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = None
+    doc_id: Optional[str] = None
+    chunk_count: int = 0
+    links: List[str] = field(default_factory=list)
+    fetched_at: Optional[datetime] = None
+
+
+class InMemoryPageStore:
+    def __init__(self):
+        self.pages: Dict[str, PageState] = {}
+
+    async def get(self, url: str) -> Optional[PageState]:
+        return self.pages.get(url)
+
+    async def save(self, state: PageState) -> None:
+        self.pages[state.url] = state
+
+
+class MongoPageStore:
+    """Persists PageState documents keyed by URL in a Motor collection."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def get(self, url: str) -> Optional[PageState]:
+        doc = await self.collection.find_one({"url": url}, {"_id": 0})
+        return PageState(**doc) if doc else None
+
+    async def save(self, state: PageState) -> None:
+        await self.collection.update_one({"url": state.url}, {"$set": asdict(state)}, upsert=True)
+
+
+# ---------------------
+# Crawl report
+# ---------------------
+
+@dataclass
+class CrawlReport:
+    root_url: str
+    changed: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+    failed: Dict[str, str] = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+# on_changed(url, text, previous_state) -> (doc_id, chunk_count)
+ChangedPageHandler = Callable[[str, str, Optional[PageState]], Awaitable[Tuple[str, int]]]
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def normalize_url(url: str) -> str:
+    return urldefrag(url)[0]
+
+
+def extract_page(html: str, base_url: str) -> Tuple[str, List[str]]:
+    """Returns (visible text, absolute links) for an HTML page."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    links = [normalize_url(urljoin(base_url, a["href"])) for a in soup.find_all("a", href=True)]
+    for tag in soup(["script", "style", "noscript", "nav", "footer", "header"]):
+        tag.decompose()
+    text = soup.get_text("\n", strip=True)
+    return text, links
+
+
+def parse_sitemap(xml_text: str) -> Tuple[List[str], List[str]]:
+    """Returns (page urls, nested sitemap urls) from a sitemap or sitemap index."""
+    root = ET.fromstring(xml_text)
+    locs = [el.text.strip() for el in root.iter() if el.tag.endswith("loc") and el.text]
+    if root.tag.endswith("sitemapindex"):
+        return [], locs
+    return locs, []
+
+
+class SiteCrawler:
+    """
+    Crawls a site section (every page under the root URL's path) or a sitemap with
+    bounded concurrency and a per-host politeness delay. Pages are only re-ingested
+    when their ETag / Last-Modified validators or content hash change.
+    """
+
+    def __init__(
+        self,
+        backend: FetchBackend,
+        store,
+        on_changed: ChangedPageHandler,
+        max_pages: int = 50,
+        max_depth: int = 2,
+        concurrency: int = 4,
+        delay_seconds: float = 0.5,
+        respect_robots: bool = True,
+    ):
+        self.backend = backend
+        self.store = store
+        self.on_changed = on_changed
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.concurrency = concurrency
+        self.delay_seconds = delay_seconds
+        self.respect_robots = respect_robots
+
+        self._host_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._last_request: Dict[str, float] = {}
+        self._robots: Dict[str, Optional[robotparser.RobotFileParser]] = {}
+
+    # ---------------------
+    # Politeness
+    # ---------------------
+
+    async def _fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> FetchResult:
+        host = urlparse(url).netloc
+        async with self._host_locks[host]:
+            wait = self._last_request.get(host, 0.0) + self.delay_seconds - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._last_request[host] = time.monotonic()
+        return await self.backend.fetch(url, headers)
+
+    async def _allowed(self, url: str) -> bool:
+        if not self.respect_robots:
+            return True
+        parsed = urlparse(url)
+        if parsed.netloc not in self._robots:
+            parser = None
+            try:
+                res = await self._fetch(f"{parsed.scheme}://{parsed.netloc}/robots.txt")
+                if res.status == 200:
+                    parser = robotparser.RobotFileParser()
+                    parser.parse(res.body.splitlines())
+            except Exception as e:
+                logger.warning(f"robots.txt unavailable for {parsed.netloc}: {e}")
+            self._robots[parsed.netloc] = parser
+        parser = self._robots[parsed.netloc]
+        return parser is None or parser.can_fetch(USER_AGENT, url)
+
+    # ---------------------
+    # Crawl
+    # ---------------------
+
+    def _in_scope(self, url: str, root: str) -> bool:
+        u, r = urlparse(url), urlparse(root)
+        root_path = r.path
+        if "." in root_path.rsplit("/", 1)[-1]:
+            root_path = root_path.rsplit("/", 1)[0]  # root is a page: its directory is the section
+        section = root_path.rstrip("/") + "/"
+        in_section = u.path == root_path or u.path.startswith(section)
+        return u.scheme in ("http", "https") and u.netloc == r.netloc and in_section
+
+    async def _seed_urls(self, root_url: str) -> List[Tuple[str, int]]:
+        if not urlparse(root_url).path.endswith(".xml"):
+            return [(root_url, 0)]
+
+        pages, pending, seen_maps = [], [root_url], set()
+        while pending and len(pages) < self.max_pages:
+            sitemap_url = pending.pop()
+            if sitemap_url in seen_maps:
+                continue
+            seen_maps.add(sitemap_url)
+            res = await self._fetch(sitemap_url)
+            if res.status != 200:
+                raise RuntimeError(f"Sitemap fetch failed ({res.status}): {sitemap_url}")
+            urls, nested = parse_sitemap(res.body)
+            pages.extend(urls)
+            pending.extend(nested)
+        # Sitemap entries are leaves: don't follow their links
+        return [(normalize_url(u), self.max_depth) for u in pages[: self.max_pages]]
+
+    async def _process(self, url: str, root_url: str, report: CrawlReport) -> List[str]:
+        if not await self._allowed(url):
+            report.skipped.append(url)
+            return []
+
+        previous = await self.store.get(url)
+        headers = {}
+        if previous and previous.etag:
+            headers["If-None-Match"] = previous.etag
+        if previous and previous.last_modified:
+            headers["If-Modified-Since"] = previous.last_modified
+
+        res = await self._fetch(url, headers)
+        if res.status == 304 and previous:
+            report.unchanged.append(url)
+            return previous.links
+        if res.status != 200:
+            report.failed[url] = f"HTTP {res.status}"
+            return []
+
+        text, links = extract_page(res.body, res.url)
+        state = PageState(
+            url=url,
+            etag=res.headers.get("etag"),
+            last_modified=res.headers.get("last-modified"),
+            content_hash=content_hash(text),
+            doc_id=previous.doc_id if previous else None,
+            chunk_count=previous.chunk_count if previous else 0,
+            links=[link for link in dict.fromkeys(links) if self._in_scope(link, root_url)],
+            fetched_at=datetime.utcnow(),
+        )
+
+        if previous and previous.content_hash == state.content_hash:
+            report.unchanged.append(url)
+        elif not text.strip():
+            report.failed[url] = "Page contains no readable text"
+            return state.links
+        else:
+            state.doc_id, state.chunk_count = await self.on_changed(url, text, previous)
+            report.changed.append(url)
+
+        await self.store.save(state)
+        return state.links
+
+    async def crawl(self, root_url: str) -> CrawlReport:
+        root_url = normalize_url(root_url)
+        report = CrawlReport(root_url=root_url)
+        queue: asyncio.Queue = asyncio.Queue()
+        seen = set()
+
+        for url, depth in await self._seed_urls(root_url):
+            if url not in seen:
+                seen.add(url)
+                queue.put_nowait((url, depth))
+
+        async def worker():
+            while True:
+                url, depth = await queue.get()
+                try:
+                    links = await self._process(url, root_url, report)
+                    if depth < self.max_depth:
+                        for link in links:
+                            if link not in seen and len(seen) < self.max_pages:
+                                seen.add(link)
+                                queue.put_nowait((link, depth + 1))
+                except Exception as e:
+                    logger.warning(f"Crawl failed for {url}: {e}")
+                    report.failed[url] = str(e)
+                finally:
+                    queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        try:
+            await queue.join()
+        finally:
+            for w in workers:
+                w.cancel()
+
+        logger.info(
+            f"Crawl of {root_url} finished: {len(report.changed)} changed, "
+            f"{len(report.unchanged)} unchanged, {len(report.failed)} failed"
+        )
+        return report
@@ -0,0 +1,315 @@
+# app/services/specialist_directory.py
+
+import io
+import json
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from pymongo import UpdateOne
+
+from app.core.clients import PINECONE_REQUEST_TIMEOUT
+from app.core.logger import logger
+from app.core.outbound import dependency
+from app.db.mongo import db
+from app.services.find_specialist_engine import get_registration, get_specialization
+from app.services.specialist_profiles import (
+    SPECIALIST_NAMESPACE,
+    SpecialistProfile,
+    get_specialist_index,
+    specialist_profiles,
+)
+from app.services.vector_store import embed_texts
+
+doctors_collection = db["doctors"]
+
+EMBED_BATCH_SIZE = 64
+MAX_REMOVAL_FRACTION = 0.5   # refuse to drop more than this share of the directory without force
+REQUIRED_COLUMNS = ["Name", "Specialization", "Registration"]
+OPTIONAL_STORY_COLUMNS = ["my_story", "Description"]
+
+_REGISTRATION_RE = re.compile(r"\b(CR[A-Z]{1,2})[-\s]*([A-Z]{2})\s*:?\s*(\d+)", re.IGNORECASE)
+
+
+def registration_key(registration) -> Optional[str]:
+    """Stable directory key from the first council registration ("CRM-SP: 83270" -> "crm-sp-83270")."""
+    if isinstance(registration, list):
+        registration = " | ".join(str(r) for r in registration)
+    match = _REGISTRATION_RE.search(str(registration or ""))
+    if not match:
+        return None
+    council, state, number = match.groups()
+    return f"{council}-{state}-{int(number)}".lower()
+
+
+def profile_text(doc: dict) -> str:
+    """The text that gets embedded for a specialist; only changes here cost an embedding."""
+    specialties = ", ".join(get_specialization(doc))
+    return "\n".join(part for part in [doc.get("name", ""), specialties, doc.get("my_story", "")] if part)
+
+
+def _flatten(value) -> str:
+    if isinstance(value, list):
+        return " | ".join(str(v) for v in value)
+    return "" if value is None else str(value)
+
+
+# ---------------------
+# Spreadsheet
+# ---------------------
+
+@dataclass
+class DirectoryRow:
+    key: str
+    name: str
+    specialization: str
+    registration: str
+    image_url: str = ""
+    image_drive_url: str = ""
+    my_story: str = ""
+
+
+def read_directory_sheet(content: bytes) -> Tuple[List[DirectoryRow], List[str]]:
+    """Returns (rows, problems). Rows without a usable registration are reported, not synced."""
+    import pandas as pd
+
+    df = pd.read_excel(io.BytesIO(content), dtype=str).fillna("")
+    missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Directory sheet is missing columns: {', '.join(missing)}")
+
+    story_column = next((c for c in OPTIONAL_STORY_COLUMNS if c in df.columns), None)
+    rows, problems, seen = [], [], set()
+    for record in df.to_dict("records"):
+        name = record["Name"].strip()
+        if not name:
+            continue
+        key = registration_key(record["Registration"])
+        if not key:
+            problems.append(f"{name}: no council registration in '{record['Registration']}'")
+            continue
+        if key in seen:
+            problems.append(f"{name}: duplicate registration {key}")
+            continue
+        seen.add(key)
+        rows.append(DirectoryRow(
+            key=key,
+            name=name,
+            specialization=record["Specialization"].strip(),
+            registration=record["Registration"].strip(),
+            image_url=record.get("Image", "").strip(),
+            image_drive_url=record.get("Image in Google Drive", "").strip(),
+            my_story=record[story_column].strip() if story_column else "",
+        ))
+    return rows, problems
+
+
+# ---------------------
+# Diff
+# ---------------------
+
+@dataclass
+class VectorChange:
+    key: str
+    vector_id: str
+    doc: dict
+    reembed: bool   # False: metadata-only update
+    is_new: bool = False
+
+
+@dataclass
+class DirectorySyncPlan:
+    vector_changes: List[VectorChange] = field(default_factory=list)
+    vector_deletes: List[str] = field(default_factory=list)      # vector ids
+    doctor_upserts: List[dict] = field(default_factory=list)     # full doctor records
+    doctor_deletes: List[str] = field(default_factory=list)      # keys
+    doctor_delete_ids: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)           # keys
+    problems: List[str] = field(default_factory=list)
+
+    def report(self) -> dict:
+        return {
+            "added": sorted(c.key for c in self.vector_changes if c.is_new),
+            "reembedded": sum(1 for c in self.vector_changes if c.reembed),
+            "metadata_updated": sum(1 for c in self.vector_changes if not c.reembed),
+            "vectors_removed": len(self.vector_deletes),
+            "doctors_upserted": len(self.doctor_upserts),
+            "doctors_removed": sorted(self.doctor_deletes),
+            "unchanged": len(self.unchanged),
+            "problems": self.problems,
+        }
+
+
+def _merge_doc(existing: dict, row: DirectoryRow) -> dict:
+    """Sheet fields over the stored profile; fields the sheet doesn't carry (e.g. my_story) are kept."""
+    doc = dict(existing)
+    doc["name"] = row.name
+    specialty_field = next((f for f in ("medical_specialty", "specialty") if existing.get(f)), "specialization")
+    if _flatten(existing.get(specialty_field)) != row.specialization:
+        doc[specialty_field] = [row.specialization] if specialty_field != "specialization" else row.specialization
+    if _flatten(existing.get("crm")) != row.registration:
+        doc["crm"] = row.registration
+    if row.image_drive_url:
+        doc["Image in Google Drive"] = row.image_drive_url
+    if row.my_story:
+        doc["my_story"] = row.my_story
+    return doc
+
+
+def plan_directory_sync(
+    rows: List[DirectoryRow],
+    profiles: List[SpecialistProfile],
+    doctors: List[dict],
+) -> DirectorySyncPlan:
+    """Pure diff of the sheet against the vector directory and the doctors collection."""
+    plan = DirectorySyncPlan()
+    sheet_keys = {row.key for row in rows}
+
+    vectors_by_key: Dict[str, List[SpecialistProfile]] = {}
+    for profile in profiles:
+        key = registration_key(get_registration(profile.doc))
+        if key:
+            vectors_by_key.setdefault(key, []).append(profile)
+    doctors_by_key = {}
+    for doctor in doctors:
+        key = doctor.get("key") or registration_key(doctor.get("registration"))
+        if key:
+            doctors_by_key[key] = doctor
+
+    for row in rows:
+        existing = vectors_by_key.get(row.key, [])
+        current = existing[0] if existing else None
+        doc = _merge_doc(current.doc if current else {}, row)
+        # Extra vectors for the same doctor are duplicates: keep the first
+        plan.vector_deletes.extend(p.id for p in existing[1:])
+
+        vector_unchanged = current is not None and doc == current.doc
+        if current is None:
+            plan.vector_changes.append(VectorChange(row.key, f"specialist-{row.key}", doc, reembed=True, is_new=True))
+        elif not vector_unchanged:
+            reembed = profile_text(doc) != profile_text(current.doc)
+            plan.vector_changes.append(VectorChange(row.key, current.id, doc, reembed=reembed))
+
+        stored = doctors_by_key.get(row.key)
+        record = {
+            "id": stored["id"] if stored else f"doc-{uuid4().hex[:8]}",
+            "key": row.key,
+            "name": row.name,
+            "specialization": row.specialization,
+            "registration": row.registration,
+            "image_url": row.image_url,
+        }
+        doctor_unchanged = stored is not None and all(stored.get(k) == v for k, v in record.items())
+        if not doctor_unchanged:
+            plan.doctor_upserts.append(record)
+
+        if vector_unchanged and doctor_unchanged:
+            plan.unchanged.append(row.key)
+
+    for key, stale in vectors_by_key.items():
+        if key not in sheet_keys:
+            plan.vector_deletes.extend(p.id for p in stale)
+    plan.doctor_deletes = sorted(k for k in doctors_by_key if k not in sheet_keys)
+    plan.doctor_delete_ids = [doctors_by_key[k]["id"] for k in plan.doctor_deletes]
+    return plan
+
+
+# ---------------------
+# Apply
+# ---------------------
+
+async def _apply_vector_changes(changes: List[VectorChange]) -> None:
+    to_embed = [c for c in changes if c.reembed]
+    for i in range(0, len(to_embed), EMBED_BATCH_SIZE):
+        batch = to_embed[i:i + EMBED_BATCH_SIZE]
+        embeddings = await embed_texts([profile_text(c.doc) for c in batch])
+        vectors = [
+            {"id": c.vector_id, "values": values, "metadata": {"doc": json.dumps(c.doc, ensure_ascii=False)}}
+            for c, values in zip(batch, embeddings)
+        ]
+        await dependency("pinecone").run_sync(
+            get_specialist_index().upsert,
+            vectors=vectors,
+            namespace=SPECIALIST_NAMESPACE,
+            _request_timeout=PINECONE_REQUEST_TIMEOUT,
+            idempotent=True,
+        )
+
+    for c in changes:
+        if not c.reembed:
+            await dependency("pinecone").run_sync(
+                get_specialist_index().update,
+                id=c.vector_id,
+                set_metadata={"doc": json.dumps(c.doc, ensure_ascii=False)},
+                namespace=SPECIALIST_NAMESPACE,
+                _request_timeout=PINECONE_REQUEST_TIMEOUT,
+                idempotent=True,
+            )
+
+
+async def sync_specialist_directory(content: bytes, dry_run: bool = False, force: bool = False) -> dict:
+    """
+    Brings the doctors collection and the specialist vector namespace in line
+    with the directory spreadsheet, touching only what changed. New and changed
+    doctors are written before anything is removed, so the directory is never
+    empty mid-sync.
+    """
+    rows, problems = read_directory_sheet(content)
+    if not rows:
+        raise ValueError("Directory sheet has no valid rows; refusing to sync an empty directory")
+
+    await specialist_profiles.load()
+    doctors = await doctors_collection.find({}, {"_id": 0}).to_list(length=None)
+    plan = plan_directory_sync(rows, specialist_profiles.all(), doctors)
+    plan.problems.extend(problems)
+
+    directory_size = max(len(specialist_profiles), len(doctors), 1)
+    removing = max(len(plan.vector_deletes), len(plan.doctor_deletes))
+    if removing / directory_size > MAX_REMOVAL_FRACTION and not force:
+        raise ValueError(
+            f"Sync would remove {removing} of {directory_size} specialists; re-run with force to confirm"
+        )
+
+    report = plan.report()
+    report["dry_run"] = dry_run
+    if dry_run:
+        return report
+
+    # 1. Upserts first: both stores only ever gain or update entries here
+    await _apply_vector_changes(plan.vector_changes)
+    if plan.doctor_upserts:
+        now = datetime.utcnow()
+        await doctors_collection.bulk_write([
+            UpdateOne(
+                {"$or": [{"key": r["key"]}, {"id": r["id"]}]},
+                {"$set": {**r, "updated_at": now}},
+                upsert=True,
+            )
+            for r in plan.doctor_upserts
+        ])
+
+    # 2. Removals last
+    if plan.vector_deletes:
+        for i in range(0, len(plan.vector_deletes), 1000):  # Pinecone caps deletes at 1000 ids
+            await dependency("pinecone").run_sync(
+                get_specialist_index().delete,
+                ids=plan.vector_deletes[i:i + 1000],
+                namespace=SPECIALIST_NAMESPACE,
+                _request_timeout=PINECONE_REQUEST_TIMEOUT,
+                idempotent=True,
+            )
+    if plan.doctor_deletes:
+        await doctors_collection.delete_many({"id": {"$in": plan.doctor_delete_ids}})
+
+    # Reload here rather than on the next request; the new store is swapped in
+    # whole, so requests keep using the old one until it is ready
+    if plan.vector_changes or plan.vector_deletes:
+        try:
+            await specialist_profiles.load()
+        except Exception as e:
+            logger.warning(f"Specialist directory reload after sync failed, dropping changed profiles: {e}")
+            specialist_profiles.invalidate([c.vector_id for c in plan.vector_changes] + plan.vector_deletes)
+    logger.info(f"Specialist directory sync: {report}")
+    return report
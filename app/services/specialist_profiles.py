@@ -0,0 +1,195 @@
+# app/services/specialist_profiles.py
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.core.clients import PINECONE_REQUEST_TIMEOUT, get_pinecone
+from app.core.logger import logger
+from app.core.outbound import dependency
+from app.services.find_specialist_engine import PLACEHOLDER_IMAGE, get_registration, get_specialization
+from app.utils.tokens import truncate_to_tokens
+
+SPECIALIST_INDEX_HOST = "https://nudii-experts-description-7iqky9x.svc.aped-4627-b74a.pinecone.io"
+SPECIALIST_NAMESPACE = "specialist"
+MAX_DESCRIPTION_TOKENS = 250   # per profile; the story is the only unbounded field
+FETCH_BATCH_SIZE = 100      # ids per Pinecone fetch call
+LOAD_RETRY_SECONDS = 60     # after a failed full load, fall back to per-id fetches for this long
+DIRECTORY_LOAD_TIMEOUT = 60    # the full load lists and fetches the whole namespace
+
+
+@lru_cache(maxsize=1)
+def get_specialist_index():
+    return get_pinecone().Index(host=SPECIALIST_INDEX_HOST)
+
+
+@dataclass(frozen=True)
+class SpecialistProfile:
+    id: str
+    doc: dict        # parsed metadata['doc']
+    card: dict       # the fields the model may return for this doctor
+    rendered: str    # `card` as one JSON line, ready for the prompt
+
+
+def parse_profile(vector_id: str, metadata: Optional[dict]) -> Optional[SpecialistProfile]:
+    try:
+        doc = json.loads((metadata or {}).get("doc", "{}"))
+    except (TypeError, ValueError) as e:
+        logger.warning(f"Skipping specialist {vector_id}: bad doc JSON ({e})")
+        return None
+
+    card = {
+        "Name": doc.get("name", ""),
+        "Specialization": get_specialization(doc),
+        "Registration": get_registration(doc),
+        "Image": doc.get("Image in Google Drive", PLACEHOLDER_IMAGE),
+        "doctor_description": truncate_to_tokens(doc.get("my_story") or "", MAX_DESCRIPTION_TOKENS),
+    }
+    return SpecialistProfile(vector_id, doc, card, json.dumps(card, ensure_ascii=False))
+
+
+class SpecialistProfileStore:
+    """
+    Parsed specialist profiles keyed by vector id. The directory is loaded once
+    from the index metadata; searches then only need ids back from Pinecone.
+    """
+
+    def __init__(self, index=None, namespace: str = SPECIALIST_NAMESPACE):
+        self._index = index  # None: the shared specialist index, resolved on first use
+        self.namespace = namespace
+        self._profiles: Dict[str, SpecialistProfile] = {}
+        self._loaded = False
+        self._load_failed_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._load_task: Optional[asyncio.Task] = None
+        self.version = 0  # bumped whenever the set of profiles changes
+
+    @property
+    def index(self):
+        return self._index if self._index is not None else get_specialist_index()
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def all(self) -> List[SpecialistProfile]:
+        return list(self._profiles.values())
+
+    def _fetch_sync(self, ids: List[str]) -> Dict[str, SpecialistProfile]:
+        profiles = {}
+        for i in range(0, len(ids), FETCH_BATCH_SIZE):
+            res = self.index.fetch(
+                ids=ids[i:i + FETCH_BATCH_SIZE], namespace=self.namespace, _request_timeout=PINECONE_REQUEST_TIMEOUT
+            )
+            for vector_id, vector in res.vectors.items():
+                profile = parse_profile(vector_id, vector.metadata)
+                if profile:
+                    profiles[vector_id] = profile
+        return profiles
+
+    def _load_all_sync(self) -> Dict[str, SpecialistProfile]:
+        ids = [vector_id for page in self.index.list(namespace=self.namespace, _request_timeout=PINECONE_REQUEST_TIMEOUT) for vector_id in page]
+        return self._fetch_sync(ids)
+
+    async def load(self) -> int:
+        """(Re)loads the whole directory and swaps it in at once."""
+        profiles = await dependency("pinecone").run_sync(self._load_all_sync, idempotent=True, timeout=DIRECTORY_LOAD_TIMEOUT)
+        self._profiles = profiles
+        self._loaded = True
+        self.version += 1
+        self._load_failed_at = None
+        logger.info(f"Loaded {len(profiles)} specialist profiles")
+        return len(profiles)
+
+    def _load_retry_pending(self) -> bool:
+        return bool(self._load_failed_at) and time.monotonic() - self._load_failed_at < LOAD_RETRY_SECONDS
+
+    async def ensure_loaded(self) -> None:
+        """Waits for the full directory load; for warm-up and background use, not the request path."""
+        if self._loaded:
+            return
+        async with self._lock:
+            if self._loaded or self._load_retry_pending():
+                return
+            try:
+                await self.load()
+            except Exception as e:
+                self._load_failed_at = time.monotonic()
+                logger.warning(f"Specialist directory load failed, fetching per request: {e}")
+
+    def start_loading(self) -> None:
+        """Starts the full load in the background unless it is running, done or recently failed."""
+        if self._loaded or self._load_retry_pending() or (self._load_task and not self._load_task.done()):
+            return
+        self._load_task = asyncio.create_task(self.ensure_loaded())
+
+    async def get_many(self, ids: Iterable[str]) -> List[SpecialistProfile]:
+        """
+        Profiles for `ids` in the given order; ids missing from the store are
+        fetched once. Never waits on the directory load: while the store is
+        cold, the ids are fetched directly and the load runs in the background.
+        """
+        ids = list(ids)
+        if not self._loaded:
+            self.start_loading()
+        missing = [i for i in ids if i not in self._profiles]
+        if missing:
+            fetched = await dependency("pinecone").run_sync(self._fetch_sync, missing, idempotent=True)
+            if fetched:
+                self._profiles.update(fetched)
+                self.version += 1
+        return [self._profiles[i] for i in ids if i in self._profiles]
+
+    def invalidate(self, ids: Optional[Iterable[str]] = None) -> None:
+        """Drops the given ids (or everything) so they are re-read on next use."""
+        self.version += 1
+        if ids is None:
+            self._profiles, self._loaded = {}, False
+            return
+        for vector_id in ids:
+            self._profiles.pop(vector_id, None)
+
+
+specialist_profiles = SpecialistProfileStore()
+
+
+_async_index = None
+
+
+def get_async_specialist_index():
+    """
+    Non-blocking client for the specialist index. Created on first use because
+    its aiohttp session has to be opened inside the running event loop.
+    """
+    global _async_index
+    if _async_index is None:
+        _async_index = get_pinecone().IndexAsyncio(host=SPECIALIST_INDEX_HOST)
+    return _async_index
+
+
+async def close_async_specialist_index() -> None:
+    global _async_index
+    if _async_index is not None:
+        await _async_index.close()
+        _async_index = None
+
+
+async def query_specialist_ids(embedding: List[float], top_k: int) -> List[Tuple[str, float]]:
+    """Nearest specialists as (vector id, score); no metadata travels over the wire."""
+    res = await dependency("pinecone").call(
+        lambda: get_async_specialist_index().query(
+            vector=embedding,
+            top_k=top_k,
+            namespace=SPECIALIST_NAMESPACE,
+            include_metadata=False,
+            include_values=False,
+        ),
+        idempotent=True,
+    )
+    return [(m["id"], m["score"]) for m in res.get("matches", [])]
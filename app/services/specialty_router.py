@@ -0,0 +1,145 @@
+# app/services/specialty_router.py
+
+import asyncio
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set
+
+from app.core.deadline import RETRIEVAL_MAX_SECONDS, RETRIEVAL_SHARE, degrade
+from app.core.logger import logger
+from app.services.specialist_profiles import SpecialistProfile, specialist_profiles
+from app.utils.text import normalize_text
+
+MAX_ROUTED_CANDIDATES = 8  # more matches than this is too broad to skip retrieval
+
+# Canonical specialty -> terms (accent-free) that name it, in Portuguese and English
+SPECIALTY_SYNONYMS: Dict[str, List[str]] = {
+    "gastroenterologia": [
+        "gastroenterologia", "gastroenterologista", "gastroenterologistas", "gastro",
+        "gastroenterology", "gastroenterologist", "gastroenterologists",
+    ],
+    "coloproctologia": [
+        "coloproctologia", "coloproctologista", "proctologia", "proctologista",
+        "coloproctology", "proctology", "proctologist", "colorectal surgeon", "colorectal surgery",
+    ],
+    "nutricao": [
+        "nutricao", "nutricionista", "nutricionistas", "nutrition", "nutritionist",
+        "nutritionists", "dietitian", "dietician", "dietitians",
+    ],
+    "dermatologia": ["dermatologia", "dermatologista", "dermatology", "dermatologist"],
+    "psicologia": [
+        "psicologia", "psicologo", "psicologa", "psicoterapia", "psicoterapeuta",
+        "psychology", "psychologist", "psychotherapy", "psychotherapist", "therapist", "terapeuta",
+    ],
+    "reumatologia": ["reumatologia", "reumatologista", "rheumatology", "rheumatologist"],
+    "cirurgia bariatrica": [
+        "bariatrica", "cirurgia bariatrica", "bariatric", "bariatric surgery", "bariatric surgeon",
+    ],
+    "cirurgia do aparelho digestivo": [
+        "gastrocirurgia", "gastrocirurgiao", "cirurgia do aparelho digestivo",
+        "cirurgiao do aparelho digestivo", "cirurgiao digestivo", "digestive surgery", "digestive surgeon",
+    ],
+    "cirurgia geral": ["cirurgia geral", "cirurgiao geral", "general surgery", "general surgeon"],
+}
+
+# A query that excludes or compares doctors needs the model, not a lookup
+NEGATION_TERMS = ["nao", "not", "don t", "dont", "sem", "without", "instead", "outro", "outra", "other", "another"]
+
+_TERMS = [
+    (f" {normalize_text(term).strip()} ", specialty)
+    for specialty, terms in SPECIALTY_SYNONYMS.items()
+    for term in terms
+]
+
+
+def match_specialties(text: str) -> Set[str]:
+    normalized = normalize_text(text)
+    return {specialty for term, specialty in _TERMS if term in normalized}
+
+
+def _specialization_text(profile: SpecialistProfile) -> str:
+    value = profile.card.get("Specialization") or []
+    return " ".join(value) if isinstance(value, list) else str(value)
+
+
+class SpecialtyIndex:
+    """
+    Inverted index: canonical specialty -> specialist ids. Specializations are
+    indexed first; the description is only used when they name no known
+    specialty (the same rule the find-specialist prompt gives the model).
+    """
+
+    def __init__(self, profiles: Iterable[SpecialistProfile]):
+        self.profiles: Dict[str, SpecialistProfile] = {}
+        self.postings: Dict[str, Set[str]] = defaultdict(set)
+        for profile in profiles:
+            self.profiles[profile.id] = profile
+            specialties = match_specialties(_specialization_text(profile))
+            if not specialties:
+                specialties = match_specialties(profile.card.get("doctor_description", ""))
+            for specialty in specialties:
+                self.postings[specialty].add(profile.id)
+
+    def lookup(self, query: str) -> Optional[List[SpecialistProfile]]:
+        """Candidates when the query names specialties unambiguously, else None."""
+        normalized = normalize_text(query)
+        if any(f" {term} " in normalized for term in NEGATION_TERMS):
+            return None
+        specialties = match_specialties(query)
+        if not specialties or any(not self.postings.get(s) for s in specialties):
+            return None
+        ids = set().union(*(self.postings[s] for s in specialties))
+        if len(ids) > MAX_ROUTED_CANDIDATES:
+            return None
+        return sorted((self.profiles[i] for i in ids), key=lambda p: p.card.get("Name", ""))
+
+
+@dataclass
+class RouterStats:
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return round(self.hits / total, 4) if total else 0.0
+
+    def as_dict(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate}
+
+
+router_stats = RouterStats()
+_index: Optional[SpecialtyIndex] = None
+_index_version = -1
+
+
+async def _load_directory() -> None:
+    await asyncio.shield(specialist_profiles.ensure_loaded())
+
+
+async def route_specialist_query(query: str) -> Optional[List[SpecialistProfile]]:
+    """
+    Resolves explicit specialty requests ("preciso de um nutricionista") straight
+    from the profile store, skipping the embedding and vector search.
+    """
+    global _index, _index_version
+    if not specialist_profiles.loaded:
+        # A cold directory load can take far longer than the request budget: the
+        # load keeps going in the background and this request falls back to retrieval
+        await degrade(
+            "specialist_router", _load_directory(), None,
+            limit=RETRIEVAL_MAX_SECONDS, share=RETRIEVAL_SHARE,
+        )
+        if not specialist_profiles.loaded:
+            return None
+    if specialist_profiles.loaded and _index_version != specialist_profiles.version:
+        _index = SpecialtyIndex(specialist_profiles.all())
+        _index_version = specialist_profiles.version
+
+    candidates = _index.lookup(query) if _index else None
+    if candidates:
+        router_stats.hits += 1
+        logger.info(f"Specialty pre-router hit: {len(candidates)} candidates ({router_stats.hit_rate:.0%} hit rate)")
+    else:
+        router_stats.misses += 1
+    return candidates
@@ -0,0 +1,152 @@
+# app/services/table_qa.py
+
+import asyncio
+import io
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from app.core.logger import logger
+from app.db.mongo import document_tables_collection
+from app.utils.text import normalize_text
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+TABLE_CACHE_SIZE = 16     # decoded DataFrames kept in memory (tables are immutable)
+MAX_GROUPS_IN_ANSWER = 20
+MAX_TABLES_SCANNED = 50   # most recent tables whose columns are matched against the question
+
+# Normalized (lowercase, accent-free) trigger phrases per aggregation
+AGGREGATE_KEYWORDS: Dict[str, List[str]] = {
+    "mean": ["average", "mean", "avg", "media", "medio"],
+    "median": ["median", "mediana"],
+    "sum": ["sum", "total", "soma", "somatorio"],
+    "min": ["minimum", "min", "lowest", "smallest", "minimo", "menor"],
+    "max": ["maximum", "max", "highest", "largest", "peak", "maximo", "maior"],
+    "count": ["how many", "count", "number of", "quantos", "quantas", "quantidade"],
+}
+GROUP_BY_MARKERS = ["by", "per", "for each", "por", "para cada"]
+
+_table_cache: "OrderedDict[str, pd.DataFrame]" = OrderedDict()
+
+
+@dataclass
+class AggregateQuery:
+    op: str
+    column: Optional[str]
+    group_by: Optional[str] = None
+
+
+def _find_op(question: str) -> Optional[str]:
+    for op, phrases in AGGREGATE_KEYWORDS.items():
+        if any(f" {phrase} " in question for phrase in phrases):
+            return op
+    return None
+
+
+def _find_column(fragment: str, columns: List[str]) -> Optional[str]:
+    # Longest column name wins ("calprotectin fecal" over "calprotectin")
+    matches = [c for c in columns if normalize_text(c).strip() and normalize_text(c) in fragment]
+    return max(matches, key=lambda c: len(normalize_text(c)), default=None)
+
+
+def detect_aggregate(question: str, columns: List[str]) -> Optional[AggregateQuery]:
+    """Recognizes '<aggregate> <column> [by <column>]' questions against known columns."""
+    q = normalize_text(question)
+    op = _find_op(q)
+    if not op:
+        return None
+
+    group_by = None
+    for marker in GROUP_BY_MARKERS:
+        head, sep, tail = q.partition(f" {marker} ")
+        if sep:
+            group_by = _find_column(" " + tail, columns)
+            if group_by:
+                q = head + " "
+                break
+
+    column = _find_column(q, columns)
+    if column is None and op != "count":
+        return None
+    return AggregateQuery(op=op, column=column, group_by=group_by)
+
+
+def _fmt(value) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else str(round(value, 4))
+
+
+def run_aggregate(df: "pd.DataFrame", query: AggregateQuery) -> Optional[str]:
+    """Vectorized aggregation over a string-typed table; numbers are coerced here. None if the column isn't numeric."""
+    import pandas as pd
+
+    label = f"{query.op}({query.column or 'rows'})"
+    if query.op == "count" and query.column is None:
+        values = pd.Series(1, index=df.index)
+    elif query.op == "count":
+        values = df[query.column].replace("", pd.NA)
+    else:
+        values = pd.to_numeric(df[query.column].str.replace(",", ".", regex=False), errors="coerce")
+        if values.notna().sum() == 0:
+            return None
+        label += f" over {int(values.notna().sum())} numeric values"
+
+    if not query.group_by:
+        return f"{label} = {_fmt(values.agg(query.op))}"
+
+    result = values.groupby(df[query.group_by]).agg(query.op)
+    lines = [f"- {key}: {_fmt(val)}" for key, val in result.head(MAX_GROUPS_IN_ANSWER).items()]
+    if len(result) > MAX_GROUPS_IN_ANSWER:
+        lines.append(f"- ... {len(result) - MAX_GROUPS_IN_ANSWER} more groups")
+    return "\n".join([f"{label} by {query.group_by}:"] + lines)
+
+
+async def _load_table(table_id) -> "pd.DataFrame":
+    import pandas as pd
+
+    key = str(table_id)
+    if key in _table_cache:
+        _table_cache.move_to_end(key)
+        return _table_cache[key]
+
+    doc = await document_tables_collection.find_one({"_id": table_id}, {"parquet": 1})
+    df = await asyncio.to_thread(pd.read_parquet, io.BytesIO(doc["parquet"]))
+    _table_cache[key] = df
+    if len(_table_cache) > TABLE_CACHE_SIZE:
+        _table_cache.popitem(last=False)
+    return df
+
+
+async def answer_table_question(question: str) -> Optional[str]:
+    """
+    If `question` is an aggregate over a column of an ingested table (the same
+    shared knowledge base the vector search covers), computes it exactly and returns a compact result block for the
+    prompt. Returns None when the question isn't a table aggregate. Only questions naming a column
+    (or a group-by column) of a table are answered: "how many" alone says nothing about which table.
+    """
+    if not question or not _find_op(normalize_text(question)):
+        return None
+
+    metas = await document_tables_collection.find(
+        {}, {"parquet": 0}
+    ).sort("created_at", -1).to_list(length=MAX_TABLES_SCANNED)
+
+    results = []
+    for meta in metas:
+        query = detect_aggregate(question, meta["columns"])
+        if not query or (query.column is None and not query.group_by):
+            continue
+        try:
+            df = await _load_table(meta["_id"])
+            answer = await asyncio.to_thread(run_aggregate, df, query)
+        except Exception as e:
+            logger.warning(f"Table aggregate failed for {meta.get('filename')}: {e}")
+            continue
+        if answer is None:
+            continue
+        source = meta["filename"] + (f" (sheet: {meta['sheet']})" if meta.get("sheet") else "")
+        results.append(f"Computed from {source}, {meta['row_count']} rows:\n{answer}")
+
+    return "\n\n".join(results) or None
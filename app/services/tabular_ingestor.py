@@ -0,0 +1,221 @@
+# app/services/tabular_ingestor.py
+
+import codecs
+import csv
+import io
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+
+from app.utils.tokens import count_tokens
+
+TABULAR_EXTENSIONS = {".csv", ".xlsx"}
+MAX_CHUNK_TOKENS = 350    # per chunk, header included
+CSV_READ_ROWS = 1000      # rows pulled from the CSV parser at a time
+
+
+@dataclass
+class TableChunk:
+    text: str
+    row_start: int
+    row_end: int
+    sheet: Optional[str] = None
+
+    @property
+    def row_count(self) -> int:
+        return self.row_end - self.row_start + 1
+
+    def as_vector_chunk(self) -> dict:
+        metadata = {"row_start": self.row_start, "row_end": self.row_end}
+        if self.sheet:
+            metadata["sheet"] = self.sheet
+        return {"text": self.text, "metadata": metadata}
+
+
+def _format_row(values: Sequence) -> str:
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator="").writerow(["" if v is None else v for v in values])
+    return buf.getvalue()
+
+
+def detect_text_encoding(content: bytes) -> str:
+    """UTF-8 if the whole payload decodes cleanly, else latin1 (legacy exports)."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    view = memoryview(content)
+    step = 1 << 16
+    try:
+        for i in range(0, len(view), step):
+            decoder.decode(view[i:i + step])
+        decoder.decode(b"", final=True)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "latin1"
+
+
+def group_rows(
+    rows: Iterable[Tuple[int, str]],
+    header: str,
+    label: str,
+    sheet: Optional[str] = None,
+    max_tokens: int = MAX_CHUNK_TOKENS,
+) -> Iterator[TableChunk]:
+    """
+    Packs (row_number, csv_line) pairs into chunks of at most `max_tokens`.
+    Every chunk starts with a label line and the column header, so a retrieved
+    chunk can be read on its own. A single oversized row becomes its own chunk.
+    """
+    header_tokens = count_tokens(header) + count_tokens(label) + 16  # room for "rows N-M"
+    lines: List[str] = []
+    tokens = header_tokens
+    row_start = row_end = 0
+
+    def emit() -> TableChunk:
+        title = f"{label} rows {row_start}-{row_end}"
+        return TableChunk("\n".join([title, header, *lines]), row_start, row_end, sheet)
+
+    for row_number, line in rows:
+        line_tokens = count_tokens(line) + 1  # and its newline
+        if lines and tokens + line_tokens > max_tokens:
+            yield emit()
+            lines, tokens = [], header_tokens
+        if not lines:
+            row_start = row_number
+        lines.append(line)
+        tokens += line_tokens
+        row_end = row_number
+
+    if lines:
+        yield emit()
+
+
+def unique_columns(header: Sequence) -> List[str]:
+    """Column names safe for a columnar store: blank headers named, duplicates suffixed."""
+    names: List[str] = []
+    for i, name in enumerate(header, start=1):
+        base = str(name).strip() if name is not None and str(name).strip() else f"column_{i}"
+        candidate, n = base, 2
+        while candidate in names:
+            candidate, n = f"{base}_{n}", n + 1
+        names.append(candidate)
+    return names
+
+
+def _iter_csv_sheets(content: bytes) -> Iterator[Tuple[Optional[str], List, Iterator[Tuple[int, tuple]]]]:
+    import pandas as pd
+
+    reader = pd.read_csv(
+        io.BytesIO(content),
+        encoding=detect_text_encoding(content),
+        chunksize=CSV_READ_ROWS,
+        dtype=str,
+        keep_default_na=False,
+    )
+    frames = iter(reader)
+    first = next(frames, None)
+    if first is None:
+        return
+
+    def rows():
+        row_number = 0
+        for frame in _prepend(first, frames):
+            for values in frame.itertuples(index=False, name=None):
+                row_number += 1
+                yield row_number, values
+
+    yield None, list(first.columns), rows()
+
+
+def _iter_xlsx_sheets(content: bytes) -> Iterator[Tuple[Optional[str], List, Iterator[Tuple[int, tuple]]]]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            values = sheet.iter_rows(values_only=True)
+            header_row = next(values, None)
+            if header_row is None:
+                continue
+
+            def rows(values=values):
+                for row_number, row in enumerate(values, start=1):
+                    if any(cell is not None and cell != "" for cell in row):
+                        yield row_number, row
+
+            yield sheet.title, list(header_row), rows()
+    finally:
+        workbook.close()
+
+
+def iter_table_sheets(ext: str, content: bytes) -> Iterator[Tuple[Optional[str], List, Iterator[Tuple[int, tuple]]]]:
+    """
+    Yields (sheet, header, numbered rows) per non-empty table, streaming rows
+    from the parser. Each sheet's rows must be consumed before advancing.
+    """
+    if ext == ".csv":
+        yield from _iter_csv_sheets(content)
+    elif ext == ".xlsx":
+        yield from _iter_xlsx_sheets(content)
+    else:
+        raise HTTPException(status_code=400, detail=f"Unsupported table type: {ext}")
+
+
+def _prepend(first, rest):
+    yield first
+    yield from rest
+
+
+def iter_table_chunks(ext: str, content: bytes, filename: str) -> Iterator[TableChunk]:
+    """
+    Streams header-repeating, token-bounded chunks from a CSV/XLSX upload
+    without materializing the whole table. Synchronous: iterate it in a worker thread.
+    """
+    from pandas.errors import EmptyDataError
+
+    try:
+        for sheet, header, rows in iter_table_sheets(ext, content):
+            label = f"Table: {filename} (sheet: {sheet})" if sheet else f"Table: {filename}"
+            lines = ((row_number, _format_row(values)) for row_number, values in rows)
+            yield from group_rows(lines, _format_row(header), label, sheet=sheet)
+    except HTTPException:
+        raise
+    except EmptyDataError:
+        return
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"{ext[1:].upper()} parsing failed: {str(e)}")
+
+
+def table_to_parquet(ext: str, content: bytes) -> List[dict]:
+    """
+    Writes each sheet to an in-memory Parquet file, one row group per
+    CSV_READ_ROWS rows. Values are stored as strings; numeric coercion happens
+    at query time. Returns [{"sheet", "columns", "row_count", "parquet"}].
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from pandas.errors import EmptyDataError
+
+    tables = []
+    try:
+        for sheet, header, rows in iter_table_sheets(ext, content):
+            columns = unique_columns(header)
+            schema = pa.schema([(name, pa.string()) for name in columns])
+            buf = io.BytesIO()
+            row_count = 0
+            with pq.ParquetWriter(buf, schema, compression="zstd") as writer:
+                batch: List[list] = []
+                for _, values in rows:
+                    cells = ["" if v is None else str(v) for v in values]
+                    batch.append((cells + [""] * len(columns))[:len(columns)])
+                    if len(batch) >= CSV_READ_ROWS:
+                        writer.write_table(pa.Table.from_pylist([dict(zip(columns, r)) for r in batch], schema))
+                        row_count += len(batch)
+                        batch = []
+                if batch:
+                    writer.write_table(pa.Table.from_pylist([dict(zip(columns, r)) for r in batch], schema))
+                    row_count += len(batch)
+            if row_count:
+                tables.append({"sheet": sheet, "columns": columns, "row_count": row_count, "parquet": buf.getvalue()})
+    except EmptyDataError:
+        return []
+    return tables
@@ -0,0 +1,125 @@
+# app/services/text_extraction.py
+
+import io
+import json
+from typing import Callable, Dict, Union
+
+from fastapi import HTTPException
+
+from app.core.logger import logger
+
+# Every extractor works on the in-memory upload: no temp files, nothing to clean up.
+# The OCR and docx stacks are imported by the extractor that needs them.
+Buffer = Union[bytes, bytearray, memoryview]
+
+MAX_OCR_IMAGE_DIM = 3000  # px; you can adjust as needed
+
+
+def as_stream(content: Buffer) -> io.BytesIO:
+    """Seekable file-like view for libraries that want one (python-docx, PIL)."""
+    return io.BytesIO(content)
+
+
+def downscale_if_needed(img):
+    from PIL import Image
+
+    width, height = img.size
+    if max(width, height) > MAX_OCR_IMAGE_DIM:
+        scale = MAX_OCR_IMAGE_DIM / float(max(width, height))
+        new_size = (int(width * scale), int(height * scale))
+        logger.warning(f"Downscaled image from {img.size} to {new_size} for OCR.")
+        return img.resize(new_size, Image.LANCZOS)
+    return img
+
+
+def _extract_pdf(content: Buffer) -> str:
+    import pytesseract
+    from pdf2image import convert_from_bytes
+
+    try:
+        images = convert_from_bytes(bytes(content))
+        texts = []
+        for img in images:
+            img = downscale_if_needed(img)
+            texts.append(pytesseract.image_to_string(img))
+        text = "\n".join(texts)
+        if len(text.strip()) < 100:
+            raise HTTPException(status_code=400, detail="PDF appears to contain no readable text.")
+        return text
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"PDF OCR failed: {str(e)}")
+
+
+def _extract_docx(content: Buffer) -> str:
+    import docx
+
+    try:
+        doc = docx.Document(as_stream(content))
+        return "\n".join(para.text for para in doc.paragraphs)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"DOCX parsing failed: {str(e)}")
+
+
+def _extract_txt(content: Buffer) -> str:
+    try:
+        return str(content, "utf-8")
+    except Exception:
+        raise HTTPException(status_code=400, detail="Unable to decode text file.")
+
+
+def _extract_image(content: Buffer) -> str:
+    import pytesseract
+    from PIL import Image
+
+    try:
+        with Image.open(as_stream(content)) as img:
+            text = pytesseract.image_to_string(downscale_if_needed(img))
+        if not text.strip():
+            raise HTTPException(status_code=400, detail="Image contains no readable text.")
+        return text
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Image OCR failed: {str(e)}")
+
+
+def _extract_json(content: Buffer) -> str:
+    try:
+        # Try decoding as UTF-8, fallback to latin1 for weird files
+        try:
+            data = json.loads(str(content, "utf-8"))
+        except UnicodeDecodeError:
+            data = json.loads(str(content, "latin1"))
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"JSON decoding failed: {str(e)}")
+
+        # Convert the loaded JSON to a pretty string for text search/embedding
+        text = json.dumps(data, ensure_ascii=False, indent=2)
+        if not text.strip():
+            raise HTTPException(status_code=400, detail="JSON appears to be empty or invalid.")
+        return text
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"JSON parsing failed: {str(e)}")
+
+
+EXTRACTORS: Dict[str, Callable[[Buffer], str]] = {
+    ".pdf": _extract_pdf,
+    ".docx": _extract_docx,
+    ".txt": _extract_txt,
+    ".jpeg": _extract_image,
+    ".jpg": _extract_image,
+    ".png": _extract_image,
+    ".json": _extract_json,
+}
+
+
+def extract_text(ext: str, content: Buffer) -> str:
+    """Synchronous text extraction for a single in-memory upload; run it off the event loop."""
+    extractor = EXTRACTORS.get(ext)
+    if extractor is None:
+        raise HTTPException(status_code=400, detail=f"Unsupported file type: {ext}")
+    return extractor(content)
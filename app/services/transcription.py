@@ -0,0 +1,218 @@
+# app/services/transcription.py
+
+"""
+Voice-note transcription through AssemblyAI, without blocking the event loop.
+
+Audio is streamed from memory to AssemblyAI over a pooled async client and
+the transcript is awaited with non-blocking polling. Transcripts are cached
+in `transcriptions` by the SHA-256 of the audio, so the same recording is
+only transcribed once. `audio_chat_jobs` runs transcription plus the chat
+reply in the background and keeps the job state for the status endpoint.
+"""
+
+import asyncio
+import hashlib
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, Optional, Set
+from uuid import uuid4
+
+import httpx
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.outbound import POLICIES, async_transport
+from app.db.mongo import audio_jobs_collection, transcriptions_collection
+from app.services.chat_engine import chat_with_assistant
+
+ASSEMBLYAI_BASE_URL = "https://api.assemblyai.com"
+ASSEMBLYAI_TIMEOUT_SECONDS = POLICIES["assemblyai"].timeout
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+POLL_INTERVAL_SECONDS = 1.0
+MAX_POLL_INTERVAL_SECONDS = 5.0
+TRANSCRIPTION_TIMEOUT_SECONDS = 120
+# A job still running after this long was interrupted (e.g. by a restart)
+JOB_STALE_AFTER = timedelta(seconds=TRANSCRIPTION_TIMEOUT_SECONDS + 120)
+
+TRANSCRIBING, REPLYING, COMPLETED, FAILED = "transcribing", "replying", "completed", "failed"
+
+
+class TranscriptionError(Exception):
+    def __init__(self, message: str, status_code: int = 502):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def audio_hash(audio_bytes: bytes) -> str:
+    return hashlib.sha256(audio_bytes).hexdigest()
+
+
+class AssemblyAIClient:
+    def __init__(self, api_key: Optional[str], base_url: str = ASSEMBLYAI_BASE_URL, transport=None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self._transport = transport
+        self._http: Optional[httpx.AsyncClient] = None
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None:
+            if not self.api_key:
+                raise TranscriptionError("ASSEMBLYAI_API_KEY is not configured", status_code=503)
+            self._http = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"authorization": self.api_key},
+                timeout=ASSEMBLYAI_TIMEOUT_SECONDS,
+                transport=self._transport or async_transport("assemblyai"),
+            )
+        return self._http
+
+    @staticmethod
+    def _json(res: httpx.Response, step: str) -> dict:
+        if res.status_code != 200:
+            raise TranscriptionError(f"{step} failed: {res.status_code} {res.text[:300]}")
+        try:
+            return res.json()
+        except ValueError:
+            raise TranscriptionError(f"{step} did not return JSON: {res.text[:300]}")
+
+    async def upload(self, audio_bytes: bytes) -> str:
+        async def chunks() -> AsyncIterator[bytes]:
+            view = memoryview(audio_bytes)
+            for start in range(0, len(view), UPLOAD_CHUNK_BYTES):
+                yield bytes(view[start:start + UPLOAD_CHUNK_BYTES])
+
+        res = await self.http.post("/v2/upload", content=chunks())
+        return self._json(res, "Upload")["upload_url"]
+
+    async def start(self, audio_url: str) -> str:
+        res = await self.http.post("/v2/transcript", json={"audio_url": audio_url, "speech_model": "universal"})
+        return self._json(res, "Transcription start")["id"]
+
+    async def wait(self, transcript_id: str, timeout: float = TRANSCRIPTION_TIMEOUT_SECONDS) -> str:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        interval = POLL_INTERVAL_SECONDS
+        while True:
+            result = self._json(await self.http.get(f"/v2/transcript/{transcript_id}"), "Polling")
+            status = result.get("status")
+            if status == "completed":
+                return result.get("text") or ""
+            if status == "error":
+                raise TranscriptionError(f"Transcription failed: {result.get('error', 'unknown error')}", status_code=400)
+            if loop.time() + interval > deadline:
+                raise TranscriptionError(f"Transcription timed out after {timeout:.0f} seconds.", status_code=504)
+            await asyncio.sleep(interval)
+            interval = min(interval * 1.5, MAX_POLL_INTERVAL_SECONDS)
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+
+class Transcriber:
+    """Content-addressed transcripts; concurrent requests for the same audio share one job."""
+
+    def __init__(self, client: AssemblyAIClient, collection=transcriptions_collection):
+        self.client = client
+        self.collection = collection
+        self._in_progress: Dict[str, asyncio.Task] = {}
+
+    async def transcribe(self, audio_bytes: bytes, digest: Optional[str] = None) -> str:
+        digest = digest or audio_hash(audio_bytes)
+        cached = await self.collection.find_one({"_id": digest}, {"text": 1})
+        if cached:
+            return cached["text"]
+
+        task = self._in_progress.get(digest)
+        if task is None:
+            task = asyncio.create_task(self._transcribe(audio_bytes, digest))
+            self._in_progress[digest] = task
+            task.add_done_callback(lambda _: self._in_progress.pop(digest, None))
+        return await asyncio.shield(task)
+
+    async def _transcribe(self, audio_bytes: bytes, digest: str) -> str:
+        audio_url = await self.client.upload(audio_bytes)
+        transcript_id = await self.client.start(audio_url)
+        text = await self.client.wait(transcript_id)
+        await self.collection.update_one(
+            {"_id": digest},
+            {"$set": {"text": text, "transcript_id": transcript_id, "created_at": datetime.utcnow()}},
+            upsert=True,
+        )
+        logger.info(f"Transcribed audio {digest[:12]} ({len(audio_bytes)} bytes)")
+        return text
+
+
+class AudioChatJobs:
+    """Transcribe-then-reply jobs that run in the background and are polled by id."""
+
+    def __init__(self, transcriber: Transcriber, collection=audio_jobs_collection):
+        self.transcriber = transcriber
+        self.collection = collection
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def run(self, audio_bytes: bytes, user_id: str, conversation_id: Optional[str] = None) -> dict:
+        """Transcribes and replies inline; the request waits but the event loop does not."""
+        text = await self.transcriber.transcribe(audio_bytes)
+        result = await chat_with_assistant(
+            messages=[{"role": "user", "content": text}],
+            user_id=user_id,
+            conversation_id=conversation_id,
+        )
+        return {"reply": result["reply"], "chat_title": result["chat_title"], "transcribed_text": text}
+
+    async def submit(self, audio_bytes: bytes, user_id: str, owner: str, conversation_id: Optional[str] = None) -> str:
+        job_id = uuid4().hex
+        digest = audio_hash(audio_bytes)
+        await self.collection.insert_one({
+            "_id": job_id,
+            "owner": owner,
+            "user_id": user_id,
+            "conversation_id": conversation_id,
+            "audio_hash": digest,
+            "status": TRANSCRIBING,
+            "created_at": datetime.utcnow(),
+        })
+        task = asyncio.create_task(self._process(job_id, audio_bytes, digest, user_id, conversation_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job_id
+
+    async def _process(self, job_id, audio_bytes, digest, user_id, conversation_id) -> None:
+        async def update(fields: dict):
+            await self.collection.update_one({"_id": job_id}, {"$set": {**fields, "updated_at": datetime.utcnow()}})
+
+        try:
+            text = await self.transcriber.transcribe(audio_bytes, digest)
+            await update({"status": REPLYING, "transcribed_text": text})
+            result = await chat_with_assistant(
+                messages=[{"role": "user", "content": text}],
+                user_id=user_id,
+                conversation_id=conversation_id,
+            )
+            await update({"status": COMPLETED, "reply": result["reply"], "chat_title": result["chat_title"]})
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Audio chat job {job_id} failed: {e}")
+            await update({"status": FAILED, "error": str(e)[:500]})
+
+    async def get(self, job_id: str, owner: str) -> Optional[dict]:
+        job = await self.collection.find_one({"_id": job_id, "owner": owner}, {"owner": 0, "audio_hash": 0})
+        if job is None:
+            return None
+        if job["status"] in (TRANSCRIBING, REPLYING) and datetime.utcnow() - job["created_at"] > JOB_STALE_AFTER:
+            job.update(status=FAILED, error="Job was interrupted; please resend the audio.")
+        job["job_id"] = job.pop("_id")
+        return job
+
+    async def close(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.transcriber.client.aclose()
+
+
+audio_chat_jobs = AudioChatJobs(Transcriber(AssemblyAIClient(settings.ASSEMBLYAI_API_KEY)))
@@ -1,26 +1,18 @@
 # app/services/vector_store.py
 
 from typing import List
-from app.db.pinecone import index
-from app.core.config import settings
-from openai import OpenAI
-from concurrent.futures import ThreadPoolExecutor
+from app.db.pinecone import get_index
+from app.core.clients import PINECONE_REQUEST_TIMEOUT, get_async_openai
+from app.core.logger import logger
+from app.core.outbound import dependency
 import asyncio
 
-# OpenAI embedding setup
-client = OpenAI(
-    api_key=settings.OPENAI_API_KEY,
-    base_url=settings.OPENAI_BASE_URL
-)
-executor = ThreadPoolExecutor()
-
-# Generate embedding asynchronously using a thread pool
+# Generate embedding asynchronously (async client: no worker thread per request)
 async def embed_text(text: str) -> List[float]:
-    loop = asyncio.get_event_loop()
-    res = await loop.run_in_executor(executor, lambda: client.embeddings.create(
+    res = await get_async_openai().embeddings.create(
         model="text-embedding-3-small",
         input=text
-    ))
+    )
     return res.data[0].embedding
 
 # Chunking utility
@@ -33,6 +25,36 @@ def chunk_text(text: str, chunk_size: int = 400, overlap: int = 50) -> List[str]
         start += chunk_size - overlap
     return chunks
 
+# Embed many texts with a single API call
+async def embed_texts(texts: List[str]) -> List[List[float]]:
+    res = await get_async_openai().embeddings.create(
+        model="text-embedding-3-small",
+        input=texts
+    )
+    return [item.embedding for item in res.data]
+
+# Upsert pre-built chunks ({"text", "metadata"}) as ids {doc_id}-{start_index + i}
+async def upsert_chunks_to_pinecone(doc_id: str, chunks: List[dict], start_index: int = 0) -> int:
+    embeddings = await embed_texts([chunk["text"] for chunk in chunks])
+
+    vectors = [
+        {
+            "id": f"{doc_id}-{start_index + i}",
+            "values": embedding,
+            "metadata": {
+                **chunk.get("metadata", {}),
+                "chunk_text": chunk["text"],
+                "doc_id": doc_id
+            }
+        }
+        for i, (chunk, embedding) in enumerate(zip(chunks, embeddings))
+    ]
+
+    await dependency("pinecone").run_sync(
+        get_index().upsert, vectors, _request_timeout=PINECONE_REQUEST_TIMEOUT, idempotent=True
+    )
+    return len(vectors)
+
 # Upsert chunks with embeddings to Pinecone
 async def upsert_to_pinecone(doc_id: str, text: str) -> int:
     chunks = chunk_text(text)
@@ -50,6 +72,19 @@ async def upsert_to_pinecone(doc_id: str, text: str) -> int:
         for i, (chunk, embedding) in enumerate(zip(chunks, embeddings))
     ]
 
-    index.upsert(vectors)
-    print(f"Upserted {len(vectors)} chunks to Pinecone for doc_id: {doc_id}")
+    await dependency("pinecone").run_sync(
+        get_index().upsert, vectors, _request_timeout=PINECONE_REQUEST_TIMEOUT, idempotent=True
+    )
+    logger.info(f"Upserted {len(vectors)} chunks to Pinecone for doc_id: {doc_id}")
     return len(vectors)
+
+# Remove chunk vectors [start, stop) left over when a document shrinks on re-ingestion
+async def delete_chunk_range(doc_id: str, start: int, stop: int) -> None:
+    for batch_start in range(start, stop, 1000):  # Pinecone caps deletes at 1000 ids
+        batch_stop = min(stop, batch_start + 1000)
+        await dependency("pinecone").run_sync(
+            get_index().delete,
+            ids=[f"{doc_id}-{i}" for i in range(batch_start, batch_stop)],
+            _request_timeout=PINECONE_REQUEST_TIMEOUT,
+            idempotent=True,
+        )
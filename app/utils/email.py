@@ -1,82 +1,86 @@
 # app/utils/email.py
 
+"""
+Transactional email outbox.
+
+`send_*_email` only renders the message and queues it in `email_outbox`; the
+outbox dispatcher delivers it in the background through the configured
+transport, with retries and a send-rate cap, and records the outcome on the
+user per template, e.g. `verification_email_status` (queued -> sent | failed).
+
+EMAIL_TRANSPORT selects the transport: "sendgrid" (default), "smtp" (e.g. a
+local MailHog/Mailpit on SMTP_HOST:SMTP_PORT) or "file" (writes .eml files
+to EMAIL_OUTBOX_DIR).
+"""
+
+import asyncio
+import html
 import os
+import smtplib
+import time
 from datetime import datetime
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
-from fastapi.concurrency import run_in_threadpool
+from email.message import EmailMessage
+from string import Template
+from typing import Optional
+
+from app.core.logger import logger
+from app.core.outbound import POLICIES, dependency
+from bson import ObjectId
+
+from app.db.mongo import email_outbox_collection, users_collection
+from app.services.outbox import OutboxDispatcher, OutboxTarget, outbox_entry
 
 SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
+EMAIL_TRANSPORT = os.getenv("EMAIL_TRANSPORT", "sendgrid").lower()
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "1025"))
+EMAIL_OUTBOX_DIR = os.getenv("EMAIL_OUTBOX_DIR", "email_outbox")
 
-async def send_verification_email(to_email: str, verification_url: str):
-    if not SENDGRID_API_KEY:
-        raise RuntimeError("SENDGRID_API_KEY is not set")
-
-    html_content = f"""
-    <html>
-      <body style="font-family: Arial, sans-serif; background-color: #f4f4f7; padding: 20px;">
-        <table width="100%" cellpadding="0" cellspacing="0" style="max-width: 600px; margin: auto; background-color: #ffffff; border-radius: 8px; overflow: hidden;">
-          <tr>
-            <td style="background-color: #4F46E5; padding: 20px; color: white; text-align: center;">
-              <h2 style="margin: 0;">Healthcare AI</h2>
-            </td>
-          </tr>
-          <tr>
-            <td style="padding: 30px;">
-              <h3 style="color: #333;">Verify Your Email Address</h3>
-              <p style="color: #555;">
-                Thank you for registering with Healthcare AI. Please click the button below to verify your email address and activate your account.
-              </p>
-              <div style="text-align: center; margin: 30px 0;">
-                <a href="{verification_url}" style="background-color: #4F46E5; color: white; padding: 12px 24px; text-decoration: none; border-radius: 4px; font-weight: bold;">
-                  Verify Email
-                </a>
-              </div>
-              <p style="color: #555;">
-                If you didn’t create an account, you can safely ignore this email.
-              </p>
-              <p style="color: #aaa; font-size: 12px; margin-top: 30px;">
-                This link will expire in 1 hour for security reasons.
-              </p>
-            </td>
-          </tr>
-          <tr>
-            <td style="background-color: #f4f4f7; text-align: center; padding: 20px; font-size: 12px; color: #888;">
-              © {datetime.utcnow().year} Healthcare AI. All rights reserved.
-            </td>
-          </tr>
-        </table>
-      </body>
-    </html>
-    """
-
-    message = Mail(
-        from_email=("info@healthcare.ragioneer.com", "Healthcare AI"),
-        to_emails=to_email,
-        subject="Verify your email address",
-        html_content=html_content,
-    )
+FROM_EMAIL = "info@healthcare.ragioneer.com"
+FROM_NAME = "Healthcare AI"
+MAX_EMAILS_PER_SECOND = 10
 
-    try:
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        response = await run_in_threadpool(sg.send, message)
-        print(f"[SENDGRID] Status: {response.status_code}")
-    except Exception as e:
-        import traceback
-        print("SendGrid email error:", e)
-        print(traceback.format_exc())
-        raise
+# ---------------------
+# Templates (parsed once at import)
+# ---------------------
 
-async def send_password_reset_email(to_email: str, reset_url: str):
-    if not SENDGRID_API_KEY:
-        raise RuntimeError("SENDGRID_API_KEY is not set")
-
-    message = Mail(
-        from_email=("info@healthcare.ragioneer.com", "Healthcare AI"),
-        to_emails=to_email,
-        subject="Reset Your Password",
-        html_content=(f"""
-<html>
+VERIFICATION_TEMPLATE = Template("""<html>
+  <body style="font-family: Arial, sans-serif; background-color: #f4f4f7; padding: 20px;">
+    <table width="100%" cellpadding="0" cellspacing="0" style="max-width: 600px; margin: auto; background-color: #ffffff; border-radius: 8px; overflow: hidden;">
+      <tr>
+        <td style="background-color: #4F46E5; padding: 20px; color: white; text-align: center;">
+          <h2 style="margin: 0;">Healthcare AI</h2>
+        </td>
+      </tr>
+      <tr>
+        <td style="padding: 30px;">
+          <h3 style="color: #333;">Verify Your Email Address</h3>
+          <p style="color: #555;">
+            Thank you for registering with Healthcare AI. Please click the button below to verify your email address and activate your account.
+          </p>
+          <div style="text-align: center; margin: 30px 0;">
+            <a href="$link" style="background-color: #4F46E5; color: white; padding: 12px 24px; text-decoration: none; border-radius: 4px; font-weight: bold;">
+              Verify Email
+            </a>
+          </div>
+          <p style="color: #555;">
+            If you didn’t create an account, you can safely ignore this email.
+          </p>
+          <p style="color: #aaa; font-size: 12px; margin-top: 30px;">
+            This link will expire in 1 hour for security reasons.
+          </p>
+        </td>
+      </tr>
+      <tr>
+        <td style="background-color: #f4f4f7; text-align: center; padding: 20px; font-size: 12px; color: #888;">
+          © $year Healthcare AI. All rights reserved.
+        </td>
+      </tr>
+    </table>
+  </body>
+</html>""")
+
+PASSWORD_RESET_TEMPLATE = Template("""<html>
   <body style="font-family: Arial, sans-serif; background-color: #f4f4f7; padding: 20px;">
     <table width="100%" cellpadding="0" cellspacing="0" style="max-width: 600px; margin: auto; background-color: #ffffff; border-radius: 8px; overflow: hidden;">
       <tr>
@@ -92,7 +96,7 @@ async def send_password_reset_email(to_email: str, reset_url: str):
             If this was you, please click the button below to set a new password.
           </p>
           <div style="text-align: center; margin: 30px 0;">
-            <a href="{reset_url}" style="background-color: #4F46E5; color: white; padding: 12px 24px; text-decoration: none; border-radius: 4px; font-weight: bold;">
+            <a href="$link" style="background-color: #4F46E5; color: white; padding: 12px 24px; text-decoration: none; border-radius: 4px; font-weight: bold;">
               Reset Password
             </a>
           </div>
@@ -107,20 +111,169 @@ async def send_password_reset_email(to_email: str, reset_url: str):
       </tr>
       <tr>
         <td style="background-color: #f4f4f7; text-align: center; padding: 20px; font-size: 12px; color: #888;">
-          © {datetime.utcnow().year} Healthcare AI. All rights reserved.
+          © $year Healthcare AI. All rights reserved.
         </td>
       </tr>
     </table>
   </body>
-</html>
-"""),
+</html>""")
+
+TEMPLATES = {
+    "verification": ("Verify your email address", VERIFICATION_TEMPLATE),
+    "password_reset": ("Reset Your Password", PASSWORD_RESET_TEMPLATE),
+}
+
+
+def render_email(template: str, link: str) -> tuple:
+    """Returns (subject, html) for a template; the link is HTML-escaped."""
+    subject, body = TEMPLATES[template]
+    return subject, body.substitute(link=html.escape(link, quote=True), year=datetime.utcnow().year)
+
+
+# ---------------------
+# Transports
+# ---------------------
+
+class SendGridTransport:
+    def __init__(self, api_key: Optional[str]):
+        self.api_key = api_key
+        self._client = None
+
+    def _send_sync(self, to_email: str, subject: str, html_content: str) -> None:
+        from sendgrid import SendGridAPIClient
+        from sendgrid.helpers.mail import Mail
+
+        if not self.api_key:
+            raise RuntimeError("SENDGRID_API_KEY is not set")
+        if self._client is None:
+            self._client = SendGridAPIClient(self.api_key)
+            self._client.client.timeout = POLICIES["sendgrid"].timeout
+        message = Mail(from_email=(FROM_EMAIL, FROM_NAME), to_emails=to_email, subject=subject, html_content=html_content)
+        response = self._client.send(message)
+        if response.status_code >= 400:
+            raise RuntimeError(f"SendGrid returned {response.status_code}")
+
+    async def send(self, to_email: str, subject: str, html_content: str) -> None:
+        await dependency("sendgrid").run_sync(self._send_sync, to_email, subject, html_content)
+
+
+def _mime_message(to_email: str, subject: str, html_content: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = f"{FROM_NAME} <{FROM_EMAIL}>"
+    message["To"] = to_email
+    message["Subject"] = subject
+    message.set_content(html_content, subtype="html")
+    return message
+
+
+class SmtpTransport:
+    def __init__(self, host: str = SMTP_HOST, port: int = SMTP_PORT):
+        self.host, self.port = host, port
+
+    def _send_sync(self, to_email: str, subject: str, html_content: str) -> None:
+        with smtplib.SMTP(self.host, self.port, timeout=15) as smtp:
+            smtp.send_message(_mime_message(to_email, subject, html_content))
+
+    async def send(self, to_email: str, subject: str, html_content: str) -> None:
+        await asyncio.to_thread(self._send_sync, to_email, subject, html_content)
+
+
+class FileTransport:
+    def __init__(self, directory: str = EMAIL_OUTBOX_DIR):
+        self.directory = directory
+
+    def _send_sync(self, to_email: str, subject: str, html_content: str) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{time.time_ns()}-{to_email}.eml")
+        with open(path, "wb") as f:
+            f.write(_mime_message(to_email, subject, html_content).as_bytes())
+
+    async def send(self, to_email: str, subject: str, html_content: str) -> None:
+        await asyncio.to_thread(self._send_sync, to_email, subject, html_content)
+
+
+def build_transport(name: str = EMAIL_TRANSPORT):
+    if name == "smtp":
+        return SmtpTransport()
+    if name == "file":
+        return FileTransport()
+    return SendGridTransport(SENDGRID_API_KEY)
+
+
+transport = build_transport()
+
+
+# ---------------------
+# Outbox
+# ---------------------
+
+class SendRateLimiter:
+    def __init__(self, per_second: float = MAX_EMAILS_PER_SECOND):
+        self.min_interval = 1.0 / per_second
+        self._next_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def wait(self) -> None:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            delay = self._next_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_at = time.monotonic() + self.min_interval
+
+
+rate_limiter = SendRateLimiter()
+
+
+def email_status_field(template: str) -> str:
+    """Per template, so e.g. a password reset never overwrites the verification outcome."""
+    return f"{template}_email_status"
+
+
+async def _set_user_email_status(email: str, template: str, status: str) -> None:
+    field = email_status_field(template)
+    await users_collection.update_one(
+        {"email": email},
+        {"$set": {field: status, f"{field}_updated_at": datetime.utcnow()}},
     )
-    try:
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        response = await run_in_threadpool(sg.send, message)
-        print(f"[SENDGRID] Reset Email Status: {response.status_code}")
-    except Exception as e:
-        import traceback
-        print("SendGrid reset email error:", e)
-        print(traceback.format_exc())
-        raise
+
+
+async def deliver_email(doc: dict, idempotency_key: str) -> None:
+    await rate_limiter.wait()
+    await transport.send(doc["to"], doc["subject"], doc["html"])
+    await _set_user_email_status(doc["to"], doc["template"], "sent")
+    logger.info(f"Email '{doc['template']}' sent to {doc['to']}")
+
+
+async def _email_failed(doc: dict) -> None:
+    await _set_user_email_status(doc["to"], doc["template"], "failed")
+
+
+email_dispatcher = OutboxDispatcher([
+    OutboxTarget("email", email_outbox_collection, deliver_email, on_dead=_email_failed),
+])
+
+
+async def enqueue_email(to_email: str, template: str, link: str) -> None:
+    """Renders and queues one email; returns after a single insert."""
+    subject, html_content = render_email(template, link)
+    email_id = ObjectId()
+    await email_outbox_collection.insert_one({
+        "_id": email_id,
+        "to": to_email,
+        "template": template,
+        "subject": subject,
+        "html": html_content,
+        "created_at": datetime.utcnow(),
+        "sync": {"email": outbox_entry(f"email:{email_id}")},
+    })
+    email_dispatcher.notify()
+
+
+async def send_verification_email(to_email: str, verification_url: str):
+    await enqueue_email(to_email, "verification", verification_url)
+
+
+async def send_password_reset_email(to_email: str, reset_url: str):
+    await enqueue_email(to_email, "password_reset", reset_url)
@@ -0,0 +1,13 @@
+# app/utils/text.py
+
+import re
+import unicodedata
+
+
+def normalize_text(text: str) -> str:
+    """
+    Lowercase, accent-free words separated by single spaces, padded with a
+    space on each side so phrases can be matched with f" {phrase} " in text.
+    """
+    text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode()
+    return " " + re.sub(r"[^a-z0-9]+", " ", text.lower()).strip() + " "
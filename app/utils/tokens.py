@@ -0,0 +1,62 @@
+# app/utils/tokens.py
+
+import time
+
+import tiktoken
+
+from app.core.logger import logger
+
+ENCODING_NAME = "cl100k_base"
+ENCODING_RETRY_SECONDS = 60
+
+_encoding = None
+_retry_at = 0.0
+
+
+class ByteEncoding:
+    """
+    Stand-in when the BPE file can't be loaded (offline, no tiktoken cache):
+    one token per UTF-8 byte. That overcounts, so token budgets still hold.
+    """
+
+    def encode(self, text: str) -> list:
+        return list(text.encode("utf-8"))
+
+    def decode(self, tokens: list) -> str:
+        return bytes(tokens).decode("utf-8", errors="ignore")
+
+
+_fallback = ByteEncoding()
+
+
+def get_encoding():
+    # Loaded on first use: tiktoken may download the BPE file (or read it from TIKTOKEN_CACHE_DIR)
+    global _encoding, _retry_at
+    if _encoding is not None:
+        return _encoding
+    if time.monotonic() < _retry_at:
+        return _fallback
+    try:
+        _encoding = tiktoken.get_encoding(ENCODING_NAME)
+        return _encoding
+    except Exception as e:
+        _retry_at = time.monotonic() + ENCODING_RETRY_SECONDS
+        logger.warning(f"tiktoken {ENCODING_NAME} unavailable, counting bytes instead: {e}")
+        return _fallback
+
+
+def count_tokens(text: str) -> int:
+    return len(get_encoding().encode(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, suffix: str = "…") -> str:
+    """Cuts `text` to at most `max_tokens`, backing off to the last whitespace."""
+    encoding = get_encoding()
+    tokens = encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    head = encoding.decode(tokens[:max_tokens])
+    cut = head.rstrip()
+    if " " in cut:
+        cut = cut[:cut.rfind(" ")].rstrip(" ,;:")
+    return cut + suffix
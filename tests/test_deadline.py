@@ -0,0 +1,56 @@
+# tests/test_deadline.py
+
+import os
+import sys
+import asyncio
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.core import deadline
+from app.core.deadline import DeadlineExceeded, degrade, request_deadline, stage_timeout, within_deadline
+
+
+async def slow(seconds, value="done"):
+    await asyncio.sleep(seconds)
+    return value
+
+
+def test_slow_optional_stage_is_skipped_and_counted():
+    before = deadline.degraded_stages["retrieval"]
+
+    async def run():
+        with request_deadline("chat", 1.0):
+            context = await degrade("retrieval", slow(1), [], share=0.05)
+            reply = await within_deadline("llm", slow(0.01, "reply"))
+            return context, reply
+
+    assert asyncio.run(run()) == ([], "reply")
+    assert deadline.degraded_stages["retrieval"] == before + 1
+
+
+def test_required_stage_past_budget_raises_504():
+    async def run():
+        with request_deadline("chat", 0.05):
+            await within_deadline("llm", slow(1))
+
+    with pytest.raises(DeadlineExceeded) as exc:
+        asyncio.run(run())
+    assert exc.value.status_code == 504
+    assert exc.value.stage == "llm"
+
+
+def test_nested_budget_keeps_the_tighter_deadline():
+    async def run():
+        with request_deadline("chat", 0.5) as outer:
+            with request_deadline("chat", 30) as inner:
+                assert inner is outer
+                return stage_timeout(limit=10)
+
+    assert asyncio.run(run()) <= 0.5
+
+
+def test_no_deadline_means_no_cap():
+    assert stage_timeout() is None
+    assert asyncio.run(within_deadline("llm", slow(0, "ok"))) == "ok"
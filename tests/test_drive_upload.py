@@ -0,0 +1,53 @@
+# tests/test_drive_upload.py
+
+import os
+import sys
+import asyncio
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services import google
+
+
+class FakeCreate:
+    def __init__(self, media, log):
+        self.media, self.log = media, log
+        self.sent = 0
+
+    def next_chunk(self, num_retries=0):
+        self.log.append(threading.current_thread().name)
+        self.sent += self.media.chunksize()
+        if self.sent < self.media.size():
+            return None, None
+        return None, {"id": "file-1"}
+
+
+class FakeDrive:
+    def __init__(self, log):
+        self.log = log
+
+    def files(self):
+        return self
+
+    def permissions(self):
+        return self
+
+    def create(self, body=None, media_body=None, fields=None, fileId=None):
+        if media_body is None:
+            return type("Done", (), {"execute": lambda self, num_retries=0: {}})()
+        return FakeCreate(media_body, self.log)
+
+
+def test_upload_runs_on_the_drive_pool_in_chunks(monkeypatch):
+    log = []
+    monkeypatch.setattr(google, "GOOGLE_DRIVE_FOLDER_ID", "folder")
+    monkeypatch.setattr(google, "DRIVE_CHUNK_SIZE", 256 * 1024)
+    monkeypatch.setattr(google, "_drive_service", lambda: FakeDrive(log))
+
+    data = b"x" * (256 * 1024 * 3 + 10)
+    url = asyncio.run(google.upload_to_drive(data, "scan.pdf", "application/pdf"))
+
+    assert url == "https://drive.google.com/file/d/file-1/view?usp=sharing"
+    assert len(log) == 4  # 3 full chunks + the remainder
+    assert all(name.startswith("drive-upload") for name in log)
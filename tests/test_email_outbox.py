@@ -0,0 +1,42 @@
+# tests/test_email_outbox.py
+
+import asyncio
+import os
+import sys
+from datetime import datetime
+from email import message_from_bytes
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.utils.email import FileTransport, SendRateLimiter, render_email
+
+
+def test_templates_render_link_escaped_and_current_year():
+    subject, html = render_email("verification", 'https://x.test/verify?token=a&email=b"c')
+    assert subject == "Verify your email address"
+    assert "token=a&amp;email=b&quot;c" in html
+    assert str(datetime.utcnow().year) in html
+
+    subject, html = render_email("password_reset", "https://x.test/reset")
+    assert subject == "Reset Your Password"
+    assert "https://x.test/reset" in html
+
+
+def test_file_transport_writes_eml(tmp_path):
+    asyncio.run(FileTransport(str(tmp_path)).send("a@b.test", "Hello", "<p>hi</p>"))
+    files = list(tmp_path.iterdir())
+    assert len(files) == 1
+    message = message_from_bytes(files[0].read_bytes())
+    assert message["To"] == "a@b.test"
+    assert message["Subject"] == "Hello"
+
+
+def test_rate_limiter_spaces_sends():
+    async def run():
+        limiter = SendRateLimiter(per_second=20)
+        start = asyncio.get_running_loop().time()
+        for _ in range(3):
+            await limiter.wait()
+        return asyncio.get_running_loop().time() - start
+
+    assert asyncio.run(run()) >= 0.09
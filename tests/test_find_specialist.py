@@ -1,6 +1,11 @@
+import asyncio
+import json
+
 import pytest
 from fastapi.testclient import TestClient
 from app import app
+from app.core.deadline import REQUEST_BUDGETS
+from app.routers.deps import get_current_user
 
 # Create a TestClient using your FastAPI app
 client = TestClient(app)
@@ -8,7 +13,13 @@ client = TestClient(app)
 # Monkey‐patch the find_specialist_response used in the router
 @pytest.fixture(autouse=True)
 def stub_find_specialist(monkeypatch):
-    def fake_find_specialist(query: str):
+    async def fake_context(query, user_email, session_id):
+        return [], "", None
+
+    async def fake_save(*args):
+        return None
+
+    async def fake_find_specialist(query: str, rag_context: str, history: list):
         # Return exactly the six‐field dict your schema expects
         return {
             "response_message": "Sure! Based on your symptoms, you should see a specialist.",
@@ -20,9 +31,15 @@ def stub_find_specialist(monkeypatch):
         }
     # Patch the function where it's imported in the router
     monkeypatch.setattr("app.routers.chat.find_specialist_response", fake_find_specialist)
+    # No Mongo or Pinecone: session history, retrieval and the saved turn are stubbed too
+    monkeypatch.setattr("app.routers.chat._specialist_context", fake_context)
+    monkeypatch.setattr("app.routers.chat._save_specialist_turn", fake_save)
+    app.dependency_overrides[get_current_user] = lambda: {"email": "patient@example.com"}
+    yield
+    app.dependency_overrides.pop(get_current_user, None)
 
 def test_find_specialist_success():
-    payload = {"query": "I've been having stomach pain—who should I see?"}
+    payload = {"payload": {"query": "I've been having stomach pain—who should I see?"}, "session_id": "s-1"}
     response = client.post("/chat/find-specialist", json=payload)
     assert response.status_code == 200
 
@@ -44,5 +61,18 @@ def test_find_specialist_success():
 
 def test_find_specialist_bad_payload():
     # Missing the "query" key entirely
-    response = client.post("/chat/find-specialist", json={})
+    response = client.post("/chat/find-specialist", json={"session_id": "s-1"})
     assert response.status_code == 422  # Unprocessable Entity for payload validation
+
+def test_stream_ends_with_an_error_line_past_the_budget(monkeypatch):
+    async def stuck_stream(query, rag_context, history):
+        yield {"type": "card", "index": 0, "specialist": {"Name": "Dr. Test"}}
+        await asyncio.sleep(5)
+        yield {"type": "done", "response": {}}
+
+    monkeypatch.setattr("app.routers.chat.stream_specialist_cards", stuck_stream)
+    monkeypatch.setitem(REQUEST_BUDGETS, "specialist", 0.2)
+    payload = {"payload": {"query": "dor de estômago"}, "session_id": "s-1"}
+    response = client.post("/chat/find-specialist/stream", json=payload)
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert [e["type"] for e in events] == ["card", "error"]
@@ -0,0 +1,169 @@
+# tests/test_indexes.py
+
+"""
+Query-plan checks for the hot queries. The plan tests need a MongoDB server:
+they use MONGODB_TEST_URI (default mongodb://localhost:27017), work in a
+throwaway database and are skipped when no server answers.
+"""
+
+import os
+import sys
+import asyncio
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.db.indexes import INDEXES, ensure_indexes
+from app.services.appointment_sync import APPOINTMENT_TARGETS, SYNC_FLAGS_INDEX, UNSYNCED_QUERY, sync_report_pipeline
+from app.services.outbox import DEAD, PENDING, SENDING
+
+TEST_URI = os.getenv("MONGODB_TEST_URI", "mongodb://localhost:27017")
+NOW = datetime(2026, 1, 1)
+OUTBOXES = [("appointments", target) for target in APPOINTMENT_TARGETS] + [("email_outbox", "email")]
+
+# (collection, filter, sort) as the app issues them
+HOT_QUERIES = [
+    ("conversations", {"conversation_id": "c-1"}, None),
+    ("conversations", {"user_id": "u@example.com"}, [("created_at", -1)]),
+    ("users", {"email": "u@example.com"}, None),
+    ("users", {"verification_token": "t"}, None),
+    ("users", {}, [("created_at", -1)]),
+    ("users", {"role": "admin"}, [("created_at", -1)]),
+    ("specialist_history", {"user_email": "u@example.com", "session_id": "s-1"}, None),
+    ("specialist_history", {}, [("last_updated", -1)]),
+    ("specialist_turns", {"user_email": "u@example.com", "session_id": "s-1"}, [("timestamp", 1)]),
+    ("appointments", {"id": "a-1"}, None),
+    ("appointments", {"user_id": "u-1"}, None),
+    ("appointments", {}, [("created_at", -1)]),
+    ("appointments", {"$or": [{f"sync.{t}.status": DEAD} for t in APPOINTMENT_TARGETS]}, [("created_at", -1)]),
+    ("appointments", UNSYNCED_QUERY, [("_id", 1)]),
+    *[
+        ("appointments", {f"sync.{t}.resync_job": "job-1"}, None)
+        for t in APPOINTMENT_TARGETS
+    ],
+    *[
+        (collection, {f"sync.{t}.status": {"$in": [PENDING, SENDING]}, f"sync.{t}.next_attempt_at": {"$lte": NOW}},
+         [(f"sync.{t}.next_attempt_at", 1)])
+        for collection, t in OUTBOXES
+    ],
+    ("doctors", {"id": "d-1"}, None),
+    ("documents", {}, [("created_at", -1)]),
+    ("urls", {}, [("created_at", -1)]),
+    ("document_tables", {}, [("created_at", -1)]),
+    ("crawl_pages", {"url": "https://example.com"}, None),
+    ("reception_requests", {"user_id": "u-1"}, None),
+    ("exam_requests", {"user_id": "u-1"}, None),
+    ("quote_requests", {"user_id": "u-1"}, None),
+    ("clinical_trial_uploads", {}, [("submitted_at", -1)]),
+    ("sheet_export_queue", {"next_attempt_at": {"$lte": NOW}, "attempts": {"$lt": 10}}, [("created_at", 1)]),
+    ("sheet_export_queue", {"claim_id": "c-1"}, [("created_at", 1)]),
+    ("sheet_export_queue", {"dead_at": {"$exists": True}}, [("dead_at", -1)]),
+]
+
+
+def collscans(explain) -> list:
+    """COLLSCAN stages anywhere under a winning plan (classic or SBE, find or aggregate)."""
+    found = []
+
+    def walk(node, in_winner=False):
+        if isinstance(node, dict):
+            if in_winner and node.get("stage") == "COLLSCAN":
+                found.append(node)
+            for key, value in node.items():
+                walk(value, in_winner or key == "winningPlan")
+        elif isinstance(node, list):
+            for item in node:
+                walk(item, in_winner)
+
+    walk(explain)
+    return found
+
+
+async def _ensure_on(name):
+    motor_client = AsyncIOMotorClient(TEST_URI)
+    try:
+        return await ensure_indexes(motor_client[name])
+    finally:
+        motor_client.close()
+
+
+@pytest.fixture(scope="module")
+def indexed_db():
+    client = MongoClient(TEST_URI, serverSelectionTimeoutMS=500)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        pytest.skip(f"no MongoDB server at {TEST_URI}")
+    name = f"index_check_{uuid4().hex[:8]}"
+    applied = asyncio.run(_ensure_on(name))
+    yield client[name], applied
+    client.drop_database(name)
+    client.close()
+
+
+def test_registry_names_are_unique_and_ttl_indexes_are_single_field():
+    for collection, models in INDEXES.items():
+        names = [m.document["name"] for m in models]
+        assert len(names) == len(set(names)), collection
+        for model in models:
+            if "expireAfterSeconds" in model.document:
+                assert len(model.document["key"]) == 1, (collection, model.document["name"])
+
+
+def test_every_hot_collection_has_indexes():
+    assert {collection for collection, _, _ in HOT_QUERIES} <= set(INDEXES)
+
+
+def test_one_failing_index_does_not_block_the_others():
+    class Collection:
+        async def create_indexes(self, models):
+            name = models[0].document["name"]
+            if name == "email_unique":
+                raise OperationFailure("E11000 duplicate key", code=11000)
+            return [name]
+
+    class Database:
+        def __getitem__(self, name):
+            return Collection()
+
+    applied = asyncio.run(ensure_indexes(Database()))
+    assert "email_unique" not in applied["users"]
+    assert "verification_token" in applied["users"]
+    assert applied["appointments"] == [m.document["name"] for m in INDEXES["appointments"]]
+
+
+def test_registry_applies_idempotently(indexed_db):
+    database, applied = indexed_db
+    for collection, models in INDEXES.items():
+        assert applied[collection] == [m.document["name"] for m in models]
+    again = asyncio.run(_ensure_on(database.name))
+    assert again == applied
+    ttl = database["audio_chat_jobs"].index_information()["created_at_ttl"]
+    assert ttl["expireAfterSeconds"] > 0
+
+
+@pytest.mark.parametrize("collection,query,sort", HOT_QUERIES)
+def test_hot_query_uses_an_index(indexed_db, collection, query, sort):
+    database, _ = indexed_db
+    cursor = database[collection].find(query)
+    if sort:
+        cursor = cursor.sort(sort)
+    plan = cursor.explain()
+    assert not collscans(plan), f"{collection} {query} sort={sort} scans the collection"
+
+
+def test_sync_report_reads_only_the_flags_index(indexed_db):
+    database, _ = indexed_db
+    plan = database.command(
+        "explain",
+        {"aggregate": "appointments", "pipeline": sync_report_pipeline(), "cursor": {}, "hint": SYNC_FLAGS_INDEX},
+        verbosity="queryPlanner",
+    )
+    assert not collscans(plan)
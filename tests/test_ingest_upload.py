@@ -0,0 +1,61 @@
+# tests/test_ingest_upload.py
+
+import os
+import sys
+import json
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import app
+from app.routers.deps import require_admin
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def admin_user():
+    app.dependency_overrides[require_admin] = lambda: {"email": "admin@example.com", "role": "admin"}
+    yield
+    app.dependency_overrides.pop(require_admin, None)
+
+
+def test_upload_streams_one_line_per_file_then_a_summary(monkeypatch):
+    async def fake_ingest_file_bytes(filename, content, user_id):
+        if filename == "bad.txt":
+            raise HTTPException(status_code=400, detail="Unable to decode text file.")
+        if filename == "broken.pdf":
+            raise RuntimeError("parser crashed")
+        return {"filename": filename, "owner": user_id, "size": len(content)}
+
+    monkeypatch.setattr("app.routers.ingest.ingest_file_bytes", fake_ingest_file_bytes)
+
+    files = [
+        ("files", ("test.txt", b"hello world", "text/plain")),
+        ("files", ("bad.txt", b"\xff", "text/plain")),
+        ("files", ("broken.pdf", b"%PDF", "application/pdf")),
+    ]
+    response = client.post("/ingest/upload", files=files, data={"email": "patient@example.com"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 4
+    results = {line["filename"]: line for line in lines[:-1]}
+    assert sorted(line["index"] for line in lines[:-1]) == [0, 1, 2]
+    assert results["test.txt"]["success"] is True
+    assert results["test.txt"]["data"] == {"filename": "test.txt", "owner": "patient@example.com", "size": 11}
+    # One bad file doesn't abort the batch
+    assert results["bad.txt"] == {"index": 1, "filename": "bad.txt", "success": False, "error": "Unable to decode text file."}
+    assert results["broken.pdf"]["success"] is False
+    assert results["broken.pdf"]["error"] == "parser crashed"
+    assert lines[-1] == {"done": True, "total": 3, "succeeded": 1, "failed": 2}
+
+
+def test_upload_requires_an_email():
+    files = [("files", ("test.txt", b"hello world", "text/plain"))]
+    response = client.post("/ingest/upload", files=files)
+    assert response.status_code == 422
@@ -0,0 +1,78 @@
+# tests/test_kommo_client.py
+
+import os
+import sys
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.kommo_client import KommoClient
+
+
+class FakeTokens:
+    def __init__(self, doc):
+        self.doc = doc
+        self.writes = 0
+
+    async def find_one(self, query, projection=None):
+        return dict(self.doc) if self.doc else None
+
+    async def update_one(self, query, update, upsert=False):
+        self.writes += 1
+        self.doc = {k: v for k, v in update["$set"].items() if k != "updated_at"}
+
+
+def client_with(stored, handler):
+    client = KommoClient(base_url="https://kommo.test", collection=FakeTokens(stored))
+    client._http = httpx.AsyncClient(base_url="https://kommo.test", transport=httpx.MockTransport(handler))
+    return client
+
+
+def stored_token(expires_in_minutes):
+    return {
+        "access_token": "old", "refresh_token": "r1", "token_type": "Bearer", "expires_in": 86400,
+        "expires_at": datetime.utcnow() + timedelta(minutes=expires_in_minutes),
+    }
+
+
+def test_token_near_expiry_is_refreshed_once_for_concurrent_requests():
+    refreshes = []
+
+    def handler(request):
+        if request.url.path == "/oauth2/access_token":
+            refreshes.append(request)
+            return httpx.Response(200, json={
+                "access_token": "new", "refresh_token": "r2", "token_type": "Bearer", "expires_in": 86400,
+            })
+        return httpx.Response(200, json={"auth": request.headers["Authorization"]})
+
+    client = client_with(stored_token(expires_in_minutes=2), handler)
+
+    async def run():
+        return await asyncio.gather(*(client.request("GET", "/api/v4/account") for _ in range(10)))
+
+    responses = asyncio.run(run())
+    assert len(refreshes) == 1
+    assert {r.json()["auth"] for r in responses} == {"Bearer new"}
+    assert client.collection.doc["refresh_token"] == "r2"
+
+
+def test_valid_token_is_read_from_storage_only_once():
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(200, json={})
+
+    client = client_with(stored_token(expires_in_minutes=600), handler)
+
+    async def run():
+        for _ in range(3):
+            await client.request("GET", "/api/v4/account")
+
+    asyncio.run(run())
+    assert calls == ["/api/v4/account"] * 3
+    assert client.collection.writes == 0
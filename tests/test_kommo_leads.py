@@ -0,0 +1,65 @@
+# tests/test_kommo_leads.py
+
+import os
+import sys
+import asyncio
+
+import httpx
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.kommo_leads import KommoLeadBatcher
+
+
+class FakeKommo:
+    def __init__(self, fail=False):
+        self.requests = []
+        self.fail = fail
+
+    async def __call__(self, leads):
+        self.requests.append(leads)
+        if self.fail:
+            raise RuntimeError("kommo down")
+        # Kommo answers in request order with the request ids echoed back
+        return [{"id": 1000 + i, "request_id": [lead["request_id"]]} for i, lead in enumerate(leads)][::-1]
+
+
+def submit_all(batcher, leads):
+    async def run():
+        return await asyncio.gather(*(batcher.submit(lead) for lead in leads), return_exceptions=True)
+    return asyncio.run(run())
+
+
+def test_concurrent_leads_share_one_request():
+    kommo = FakeKommo()
+    results = submit_all(KommoLeadBatcher(kommo, window=0.01, rate=1000), [{"name": f"lead {i}"} for i in range(5)])
+    assert len(kommo.requests) == 1 and len(kommo.requests[0]) == 5
+    sent_ids = [lead["request_id"] for lead in kommo.requests[0]]
+    assert [r["request_id"][0] for r in results] == sent_ids
+
+
+def test_batches_are_capped():
+    kommo = FakeKommo()
+    submit_all(KommoLeadBatcher(kommo, window=0.01, max_batch=50, rate=1000), [{"name": str(i)} for i in range(120)])
+    assert [len(r) for r in kommo.requests] == [50, 50, 20]
+
+
+def test_failed_request_fails_every_lead_in_it():
+    results = submit_all(KommoLeadBatcher(FakeKommo(fail=True), window=0.01, rate=1000), [{}, {}])
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_rejected_batch_only_fails_the_invalid_lead():
+    kommo = FakeKommo()
+
+    async def validating(leads):
+        if any(lead.get("name") == "bad" for lead in leads):
+            request = httpx.Request("POST", "https://kommo.test/api/v4/leads/complex")
+            raise httpx.HTTPStatusError("400", request=request, response=httpx.Response(400, request=request))
+        return await kommo(leads)
+
+    leads = [{"name": f"lead {i}"} for i in range(7)] + [{"name": "bad"}]
+    results = submit_all(KommoLeadBatcher(validating, window=0.01, rate=1000), leads)
+    assert isinstance(results[-1], httpx.HTTPStatusError)
+    assert all(isinstance(r, dict) for r in results[:-1])
+    assert sum(len(r) for r in kommo.requests) == 7
@@ -0,0 +1,38 @@
+# tests/test_mongo_client.py
+
+import os
+import sys
+import asyncio
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+
+import app  # noqa: F401  (imports every router and service)
+from app.core.config import settings
+from app.db import mongo
+from app.db.mongo import get_collection
+
+
+def test_every_module_shares_the_one_client():
+    handles = [
+        (name, value)
+        for name, module in list(sys.modules.items()) if name.startswith("app.")
+        for value in vars(module).values()
+        if isinstance(value, (AsyncIOMotorDatabase, AsyncIOMotorCollection))
+    ]
+    assert handles
+    for name, handle in handles:
+        database = handle if isinstance(handle, AsyncIOMotorDatabase) else handle.database
+        assert database.client is mongo.client, name
+
+
+def test_pool_is_sized_from_settings():
+    options = mongo.client.options.pool_options
+    assert options.max_pool_size == settings.MONGODB_MAX_POOL_SIZE
+    assert options.min_pool_size == settings.MONGODB_MIN_POOL_SIZE
+
+
+def test_collection_dependency_resolves_from_the_database():
+    collection = asyncio.run(get_collection("documents")(mongo.db))
+    assert collection.name == "documents" and collection.database is mongo.db
@@ -0,0 +1,138 @@
+# tests/test_outbound.py
+
+import os
+import sys
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.core.outbound import (
+    AsyncResilientTransport,
+    CircuitOpenError,
+    Dependency,
+    DependencyPolicy,
+    LatencyHistogram,
+)
+
+
+def make_dependency(**policy):
+    return Dependency("test", DependencyPolicy(**{"timeout": 1, "backoff": 0, **policy}))
+
+
+def test_idempotent_calls_are_retried_and_others_are_not():
+    dep = make_dependency(retries=2)
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError("reset")
+        return "ok"
+
+    assert asyncio.run(dep.call(flaky, idempotent=True)) == "ok"
+    assert len(attempts) == 3 and dep.counters["retries"] == 2
+
+    attempts.clear()
+    with pytest.raises(ConnectionError):
+        asyncio.run(dep.call(flaky))
+    assert len(attempts) == 1
+
+
+def test_timeout_opens_breaker_which_then_fails_fast():
+    dep = make_dependency(timeout=0.01, retries=0, failure_threshold=2, reset_after=60)
+    calls = []
+
+    async def hang():
+        calls.append(1)
+        await asyncio.sleep(1)
+
+    for _ in range(2):
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(dep.call(hang))
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(dep.call(hang))
+    assert len(calls) == 2
+    assert dep.snapshot()["state"] == "open"
+    assert dep.counters["timeouts"] == 2 and dep.counters["rejected"] == 1
+
+
+def test_timed_out_thread_call_is_not_retried():
+    dep = make_dependency(timeout=0.05, retries=2)
+    release = threading.Event()
+    started = []
+
+    def stuck():
+        started.append(1)
+        release.wait(1)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(dep.run_sync(stuck, idempotent=True))
+    release.set()
+    assert len(started) == 1 and dep.counters["retries"] == 0
+
+
+def test_half_open_probe_closes_breaker_on_success():
+    now = [0.0]
+    dep = make_dependency(retries=0, failure_threshold=1, reset_after=10)
+    dep.breaker.clock = lambda: now[0]
+
+    async def fail():
+        raise ConnectionError("down")
+
+    async def ok():
+        return 1
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(dep.call(fail))
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(dep.call(ok))
+    now[0] = 11
+    assert asyncio.run(dep.call(ok)) == 1
+    assert dep.breaker.state == "closed"
+
+
+def test_client_errors_do_not_trip_the_breaker():
+    dep = make_dependency(failure_threshold=1)
+
+    def handler(request):
+        return httpx.Response(404)
+
+    async def run():
+        async with httpx.AsyncClient(transport=AsyncResilientTransport(dep, httpx.MockTransport(handler))) as http:
+            return [(await http.get("https://dep.test/x")).status_code for _ in range(3)]
+
+    assert asyncio.run(run()) == [404, 404, 404]
+    assert dep.breaker.state == "closed" and dep.counters["errors"] == 0
+
+
+def test_transport_retries_get_on_503_but_not_post():
+    dep = make_dependency(retries=2, failure_threshold=10)
+    seen = []
+
+    def handler(request):
+        seen.append(request.method)
+        return httpx.Response(503) if len(seen) < 3 else httpx.Response(200)
+
+    async def run():
+        async with httpx.AsyncClient(transport=AsyncResilientTransport(dep, httpx.MockTransport(handler))) as http:
+            get = await http.get("https://dep.test/x")
+            seen.clear()
+            post = await http.post("https://dep.test/x", json={})
+            return get.status_code, post.status_code
+
+    assert asyncio.run(run()) == (200, 503)
+    assert seen == ["POST"]
+
+
+def test_histogram_quantiles_use_bucket_bounds():
+    h = LatencyHistogram(buckets=(0.1, 1, float("inf")))
+    for seconds in [0.05] * 90 + [0.5] * 9 + [5]:
+        h.observe(seconds)
+    snap = h.snapshot()
+    assert snap["count"] == 100
+    assert (snap["p50"], snap["p95"], snap["p99"]) == (0.1, 1, 1)
+    assert snap["buckets"]["+Inf"] == 1
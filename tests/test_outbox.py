@@ -0,0 +1,52 @@
+# tests/test_outbox.py
+
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services import outbox
+from app.services.outbox import DEAD, PENDING, PermanentDeliveryError, attempt_record, backoff_seconds, failure_update
+from app.services.appointment_sync import SYNC_FLAG_FIELDS, appointment_outbox, sync_report_pipeline
+
+
+def test_new_appointment_gets_one_pending_entry_per_target():
+    sync = appointment_outbox("appt-1")
+    assert set(sync) == {"feegow", "kommo"}
+    assert all(entry["status"] == PENDING and entry["attempts"] == 0 for entry in sync.values())
+    assert sync["feegow"]["idempotency_key"] != sync["kommo"]["idempotency_key"]
+    assert appointment_outbox("appt-1")["kommo"]["idempotency_key"] == sync["kommo"]["idempotency_key"]
+
+
+def test_backoff_grows_and_is_capped():
+    assert backoff_seconds(1) <= outbox.BASE_BACKOFF_SECONDS
+    assert backoff_seconds(4) >= outbox.BASE_BACKOFF_SECONDS * 4
+    assert backoff_seconds(50) <= outbox.MAX_BACKOFF_SECONDS
+
+
+def test_failures_retry_until_dead_lettered():
+    now = datetime.utcnow()
+    retry = failure_update("kommo", 1, RuntimeError("timeout"), now)
+    assert retry["sync.kommo.status"] == PENDING
+    assert retry["sync.kommo.next_attempt_at"] > now
+
+    dead = failure_update("kommo", outbox.MAX_ATTEMPTS, RuntimeError("timeout"), now)
+    assert dead["sync.kommo.status"] == DEAD
+    assert "sync.kommo.next_attempt_at" not in dead
+
+    rejected = failure_update("feegow", 1, PermanentDeliveryError("400: bad payload"), now)
+    assert rejected["sync.feegow.status"] == DEAD
+
+
+def test_attempt_history_is_capped():
+    push = attempt_record("kommo", datetime.utcnow(), RuntimeError("503"))["sync.kommo.history"]
+    assert push["$slice"] == -outbox.HISTORY_LIMIT
+    assert push["$each"][0]["ok"] is False and push["$each"][0]["error"] == "503"
+
+
+def test_sync_report_reads_only_the_indexed_flags():
+    sort, project, facet = sync_report_pipeline()
+    assert list(sort["$sort"]) == SYNC_FLAG_FIELDS
+    assert set(project["$project"]) == {"_id", *SYNC_FLAG_FIELDS} and project["$project"]["_id"] == 0
+    assert set(facet["$facet"]) == {"total", *SYNC_FLAG_FIELDS}
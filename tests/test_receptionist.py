@@ -0,0 +1,42 @@
+# tests/test_receptionist.py
+
+import os
+import sys
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import app
+from app.core.outbound import CircuitOpenError
+from app.routers import receptionist
+
+client = TestClient(app)
+
+REQUEST = {"user_id": "u-1", "name": "Maria", "phone": "+55 11 90000-0000", "reason": "Remarcar consulta"}
+
+
+class FakeRequests:
+    def __init__(self):
+        self.docs = []
+
+    async def insert_one(self, doc):
+        self.docs.append(doc)
+
+
+def test_kommo_outage_does_not_fail_a_stored_request(monkeypatch):
+    stored = FakeRequests()
+    pushed = []
+
+    async def kommo_down(doc):
+        pushed.append(doc["name"])
+        raise CircuitOpenError("kommo", 30)
+
+    monkeypatch.setattr(receptionist, "reception_requests_collection", stored)
+    monkeypatch.setattr(receptionist, "push_receptionist_request_to_kommo", kommo_down)
+
+    response = client.post("/reception/request", json=REQUEST)
+    assert response.status_code == 200
+    assert response.json() == {"message": "Request received. Our agent will call you shortly."}
+    assert [doc["name"] for doc in stored.docs] == ["Maria"]
+    assert pushed == ["Maria"]   # attempted after the response, failure only logged
@@ -15,23 +15,6 @@ client = TestClient(app)
 
 # --- Ingestion tests ---
 
-def test_ingest_upload(monkeypatch):
-    async def fake_process_file(file):
-        return {"filename": file.filename, "status": "ok"}
-
-    # Patch the function the router actually calls
-    monkeypatch.setattr("app.routers.ingest.process_file", fake_process_file)
-
-    files = [("files", ("test.txt", b"hello world", "text/plain"))]
-    response = client.post("/ingest/upload/", files=files)
-    assert response.status_code == 200
-
-    body = response.json()
-    assert body["status"] == "success"
-    assert isinstance(body["results"], list)
-    assert body["results"][0]["filename"] == "test.txt"
-
-
 def test_ingest_url(monkeypatch):
     async def fake_process_url(url):
         return {"url": url, "status": "ok"}
@@ -0,0 +1,78 @@
+# tests/test_sheets_exporter.py
+
+import os
+import sys
+import asyncio
+from itertools import count
+
+import httpx
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.scripts import sheets_stand_in
+from app.services.sheets_exporter import SheetExporter
+
+
+class MemoryQueue:
+    """Same interface as MongoRowQueue; survives the exporter like the collection would."""
+
+    def __init__(self):
+        self.entries, self._ids = [], count()
+
+    async def add(self, row):
+        self.entries.append({"_id": next(self._ids), "row": row, "attempts": 0})
+
+    async def claim(self, limit):
+        return [e for e in self.entries if not e.get("retry_later")][:limit]
+
+    async def ack(self, ids):
+        self.entries = [e for e in self.entries if e["_id"] not in ids]
+
+    async def retry(self, entries, error):
+        for e in entries:
+            e["attempts"] += 1
+            e["retry_later"] = True
+
+
+def stand_in_exporter(queue, batch_mode):
+    app = sheets_stand_in.app
+    app.state.rows, app.state.requests, app.state.fail_next = [], 0, 0
+    http = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://sheets")
+    return SheetExporter("http://sheets/exec", queue=queue, batch_mode=batch_mode, http=http), app
+
+
+def test_batch_mode_sends_queued_rows_in_one_request():
+    exporter, stand_in = stand_in_exporter(MemoryQueue(), batch_mode=True)
+
+    async def run():
+        for i in range(7):
+            await exporter.export({"Email": f"user{i}@example.com"})
+        return await exporter.flush()
+
+    assert asyncio.run(run()) == 7
+    assert stand_in.state.requests == 1
+    assert [r["Email"] for r in stand_in.state.rows] == [f"user{i}@example.com" for i in range(7)]
+    assert exporter.queue.entries == []
+
+
+def test_failed_rows_stay_queued_and_sent_rows_are_not_resent():
+    queue = MemoryQueue()
+    exporter, stand_in = stand_in_exporter(queue, batch_mode=False)
+
+    async def run():
+        for i in range(3):
+            await exporter.export({"n": i})
+        original_post = exporter._post
+
+        async def post_with_outage(row):
+            if row["n"] == 1:
+                stand_in.state.fail_next = 1  # the webhook goes down before row 1
+            await original_post(row)
+
+        exporter._post = post_with_outage
+        return await exporter.flush()
+
+    assert asyncio.run(run()) == 1
+    assert stand_in.state.rows == [{"n": 0}]
+    assert [e["row"]["n"] for e in queue.entries] == [1, 2]
+    assert all(e["attempts"] == 1 for e in queue.entries)
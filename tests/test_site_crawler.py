@@ -0,0 +1,94 @@
+# tests/test_site_crawler.py
+
+import os
+import sys
+import asyncio
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.site_crawler import SiteCrawler, HttpxFetchBackend, InMemoryPageStore
+
+PAGES = {
+    "/kb/": '<a href="/kb/ibd">IBD</a> <a href="/kb/diet#top">Diet</a> <a href="/blog/x">Out of scope</a>',
+    "/kb/ibd": "<p>Crohn's disease and ulcerative colitis overview.</p> <a href='/kb/missing'>broken</a>",
+    "/kb/diet": "<p>Low-residue diet guidance.</p>",
+    "/blog/x": "<p>Should never be crawled.</p>",
+}
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/robots.txt":
+            body, etag = "User-agent: *\nAllow: /\n", None
+        elif self.path in PAGES:
+            body = PAGES[self.path]
+            etag = '"%s"' % hashlib.md5(body.encode()).hexdigest()
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def site():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def run_crawl(root, store, ingested):
+    async def on_changed(url, text, previous):
+        ingested.append(url)
+        return f"doc-{len(ingested)}", 1
+
+    async def go():
+        backend = HttpxFetchBackend()
+        try:
+            crawler = SiteCrawler(backend, store, on_changed, delay_seconds=0)
+            return await crawler.crawl(root)
+        finally:
+            await backend.aclose()
+
+    return asyncio.run(go())
+
+
+def test_crawl_ingests_section_then_skips_unchanged_pages(site):
+    store, ingested = InMemoryPageStore(), []
+
+    report = run_crawl(f"{site}/kb/", store, ingested)
+    assert sorted(report.changed) == [f"{site}/kb/", f"{site}/kb/diet", f"{site}/kb/ibd"]
+    assert report.failed == {f"{site}/kb/missing": "HTTP 404"}
+    assert f"{site}/blog/x" not in report.changed
+
+    # Second pass: every page answers 304 and nothing is re-embedded
+    ingested.clear()
+    report = run_crawl(f"{site}/kb/", store, ingested)
+    assert ingested == []
+    assert len(report.unchanged) == 3
+
+    # A modified page is the only one re-ingested
+    PAGES["/kb/diet"] = "<p>Updated low-residue diet guidance.</p>"
+    report = run_crawl(f"{site}/kb/", store, ingested)
+    assert ingested == [f"{site}/kb/diet"]
+    assert store.pages[f"{site}/kb/diet"].doc_id == "doc-1"
@@ -0,0 +1,179 @@
+# tests/test_specialist_context.py
+
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import app
+from app.core.deadline import request_deadline
+from app.routers import chat
+from app.routers.deps import get_current_user
+from app.services import specialty_router
+from app.services.specialist_profiles import SpecialistProfileStore
+
+DOCS = {
+    "dr-1": {"name": "Dra. Ana", "specialization": "Gastroenterologia"},
+    "dr-2": {"name": "Dr. Bruno", "specialization": "Coloproctologia"},
+}
+
+
+class SlowIndex:
+    """Specialist index whose listing and fetches hang until `gate` is set."""
+
+    def __init__(self, gate):
+        self.gate = gate
+
+    def list(self, namespace=None, _request_timeout=None):
+        self.gate.wait(5)
+        yield list(DOCS)
+
+    def fetch(self, ids, namespace=None, _request_timeout=None):
+        self.gate.wait(5)
+        return SimpleNamespace(vectors={
+            i: SimpleNamespace(metadata={"doc": json.dumps(DOCS[i])}) for i in ids if i in DOCS
+        })
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """The find-specialist stages with fast defaults; tests slow down the one they need."""
+    async def history(user_email, max_records, session_id):
+        return [{"query": "dor abdominal", "response": {}}]
+
+    async def embed(query):
+        return [0.0]
+
+    async def query_ids(embedding, top_k):
+        return [("dr-2", 0.9), ("dr-1", 0.8)]
+
+    monkeypatch.setattr(chat, "get_recent_specialist_suggestions", history)
+    monkeypatch.setattr(chat, "embed_text", embed)
+    monkeypatch.setattr(chat, "query_specialist_ids", query_ids)
+    return monkeypatch
+
+
+def run_context(budget, query="tenho dor abdominal", release=None):
+    async def run():
+        try:
+            with request_deadline("specialist", budget):
+                started = time.monotonic()
+                context = await chat._specialist_context(query, "u@example.com", "s-1")
+                return context, time.monotonic() - started
+        finally:
+            if release:
+                release.set()   # let abandoned worker threads finish before the loop shuts down
+    return asyncio.run(run())
+
+
+def test_profile_fetch_during_a_cold_directory_load_stays_in_budget(pipeline):
+    gate = threading.Event()
+    store = SpecialistProfileStore(SlowIndex(gate))
+    pipeline.setattr(chat, "specialist_profiles", store)
+    pipeline.setattr(specialty_router, "specialist_profiles", store)
+    (history, rag_context, routed), elapsed = run_context(1.0, release=gate)
+    assert elapsed < 0.8
+    assert routed is None and rag_context == ""   # answered without profiles
+    assert history == [{"query": "dor abdominal", "response": {}}]
+
+
+@pytest.fixture
+def warm_store(pipeline):
+    gate = threading.Event()
+    gate.set()
+    store = SpecialistProfileStore(SlowIndex(gate))
+    asyncio.run(store.ensure_loaded())
+    pipeline.setattr(chat, "specialist_profiles", store)
+    pipeline.setattr(specialty_router, "specialist_profiles", store)
+    return store
+
+
+def test_history_read_overlaps_with_retrieval(pipeline, warm_store):
+    async def slow_history(user_email, max_records, session_id):
+        await asyncio.sleep(0.3)
+        return [{"query": "dor abdominal", "response": {}}]
+
+    async def slow_embed(query):
+        await asyncio.sleep(0.3)
+        return [0.0]
+
+    pipeline.setattr(chat, "get_recent_specialist_suggestions", slow_history)
+    pipeline.setattr(chat, "embed_text", slow_embed)
+    (history, rag_context, routed), elapsed = run_context(5.0)
+    assert elapsed < 0.5
+    assert len(history) == 1
+    assert [json.loads(line)["Name"] for line in rag_context.splitlines()] == ["Dr. Bruno", "Dra. Ana"]
+
+
+def test_history_read_overlaps_with_routing(pipeline, warm_store):
+    async def slow_history(user_email, max_records, session_id):
+        await asyncio.sleep(0.3)
+        return []
+
+    pipeline.setattr(chat, "get_recent_specialist_suggestions", slow_history)
+    (history, rag_context, routed), elapsed = run_context(5.0, query="preciso de um gastroenterologista")
+    assert [p.card["Name"] for p in routed] == ["Dra. Ana"]
+    assert history == [] and rag_context == ""
+    assert elapsed < 0.5
+
+
+def test_slow_history_degrades_to_no_history(pipeline, warm_store):
+    async def stuck_history(user_email, max_records, session_id):
+        await asyncio.sleep(5)
+
+    pipeline.setattr(chat, "get_recent_specialist_suggestions", stuck_history)
+    pipeline.setattr(chat, "HISTORY_TIMEOUT_SECONDS", 0.2)
+    degraded = chat.degraded_stages["specialist_history"]
+    (history, rag_context, routed), elapsed = run_context(5.0)
+    assert history == [] and rag_context and routed is None
+    assert elapsed < 0.5
+    assert chat.degraded_stages["specialist_history"] == degraded + 1
+
+
+def test_slow_retrieval_degrades_to_no_profiles(pipeline, warm_store):
+    async def stuck_query(embedding, top_k):
+        await asyncio.sleep(5)
+
+    pipeline.setattr(chat, "query_specialist_ids", stuck_query)
+    degraded = chat.degraded_stages["specialist_retrieval"]
+    (history, rag_context, routed), elapsed = run_context(2.0)
+    assert rag_context == "" and len(history) == 1
+    assert elapsed < 1.0   # the retrieval share of the budget, not the stage's own cap
+    assert chat.degraded_stages["specialist_retrieval"] == degraded + 1
+
+
+def test_endpoint_answers_when_a_stage_degrades(pipeline, warm_store):
+    seen = {}
+
+    async def stuck_history(user_email, max_records, session_id):
+        await asyncio.sleep(5)
+
+    async def fake_find_specialist(query, rag_context, history):
+        seen.update(rag_context=rag_context, history=history)
+        return {"specialists": []}
+
+    async def fake_save(*args):
+        return None
+
+    pipeline.setattr(chat, "get_recent_specialist_suggestions", stuck_history)
+    pipeline.setattr(chat, "HISTORY_TIMEOUT_SECONDS", 0.2)
+    pipeline.setattr(chat, "find_specialist_response", fake_find_specialist)
+    pipeline.setattr(chat, "_save_specialist_turn", fake_save)
+    app.dependency_overrides[get_current_user] = lambda: {"email": "u@example.com"}
+    try:
+        response = TestClient(app).post(
+            "/chat/find-specialist", json={"payload": {"query": "tenho dor abdominal"}, "session_id": "s-1"}
+        )
+    finally:
+        app.dependency_overrides.pop(get_current_user, None)
+    assert response.status_code == 200
+    assert response.json() == {"specialists": []}
+    assert seen["history"] == [] and "Dr. Bruno" in seen["rag_context"]
@@ -0,0 +1,70 @@
+# tests/test_specialist_directory.py
+
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.specialist_directory import DirectoryRow, plan_directory_sync, registration_key
+from app.services.specialist_profiles import parse_profile
+
+
+def profile(vector_id, **doc):
+    return parse_profile(vector_id, {"doc": json.dumps(doc)})
+
+
+def row(name, specialization, registration, **extra):
+    return DirectoryRow(registration_key(registration), name, specialization, registration, **extra)
+
+
+def test_registration_key_is_stable_across_formats():
+    assert registration_key("CRM-SP: 83270 | RQE: 55787") == "crm-sp-83270"
+    assert registration_key(["CRM SP 083270"]) == "crm-sp-83270"
+    assert registration_key("CRP-SP: 119637") == "crp-sp-119637"
+    assert registration_key("RQE: 1") is None
+
+
+def test_plan_touches_only_changed_doctors():
+    profiles = [
+        profile("v-ana", name="Dra. Ana", medical_specialty=["Gastroenterologia"], crm="CRM-SP: 1", my_story="DII"),
+        profile("v-bia", name="Dra. Bia", specialization="Nutrição", crm="CRM-SP: 2"),
+        profile("v-caio", name="Dr. Caio", specialization="Coloproctologia", crm="CRM-SP: 3"),
+        profile("v-caio-dup", name="Dr. Caio", specialization="Coloproctologia", crm="CRM-SP: 3"),
+        profile("v-gone", name="Dr. Gone", specialization="Dermatologia", crm="CRM-SP: 9"),
+    ]
+    doctors = [
+        {"id": "doc-ana", "name": "Dra. Ana", "specialization": "Gastroenterologia", "registration": "CRM-SP: 1", "image_url": ""},
+        {"id": "doc-gone", "name": "Dr. Gone", "specialization": "Dermatologia", "registration": "CRM-SP: 9", "image_url": ""},
+    ]
+    rows = [
+        row("Dra. Ana", "Gastroenterologia", "CRM-SP: 1"),                                # unchanged vector
+        row("Dra. Bia", "Nutrição", "CRM-SP: 2", image_drive_url="https://img/bia"),      # metadata only
+        row("Dr. Caio", "Coloproctologia e Gastrocirurgia", "CRM-SP: 3"),                 # re-embed
+        row("Dra. Duda", "Reumatologia", "CRM-SP: 4"),                                    # new
+    ]
+
+    plan = plan_directory_sync(rows, profiles, doctors)
+    changes = {c.key: c for c in plan.vector_changes}
+
+    assert "crm-sp-1" not in changes
+    assert changes["crm-sp-2"].reembed is False
+    assert changes["crm-sp-3"].reembed is True and changes["crm-sp-3"].vector_id == "v-caio"
+    assert changes["crm-sp-4"].is_new and changes["crm-sp-4"].vector_id == "specialist-crm-sp-4"
+    assert sorted(plan.vector_deletes) == ["v-caio-dup", "v-gone"]
+    assert plan.doctor_delete_ids == ["doc-gone"]
+
+    # Existing doctor keeps its id (appointments reference it) and gains its key
+    ana = next(d for d in plan.doctor_upserts if d["key"] == "crm-sp-1")
+    assert ana["id"] == "doc-ana"
+    assert plan.unchanged == []  # every doctor record gains its key on the first sync
+
+
+def test_sheet_merge_keeps_fields_the_sheet_does_not_carry():
+    profiles = [profile("v-ana", name="Dra. Ana", medical_specialty=["Gastroenterologia"], crm="CRM-SP: 1", my_story="DII")]
+    plan = plan_directory_sync([row("Dra. Ana", "Hepatologia", "CRM-SP: 1")], profiles, [])
+
+    [change] = plan.vector_changes
+    assert change.doc["my_story"] == "DII"
+    assert change.doc["medical_specialty"] == ["Hepatologia"]
+    assert change.reembed
@@ -0,0 +1,122 @@
+# tests/test_specialist_history.py
+
+import os
+import sys
+import asyncio
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services import find_specialist_engine
+from app.services.find_specialist_engine import (
+    SESSION_RECENT_TURNS,
+    get_full_specialist_session_history,
+    get_recent_specialist_suggestions,
+    save_specialist_history,
+)
+
+
+def matches(doc, query):
+    return all(doc.get(k) == v for k, v in query.items())
+
+
+class FakeSessions:
+    """specialist_history: records every update and applies $push/$each/$slice + $set."""
+
+    def __init__(self):
+        self.docs = []
+        self.updates = []
+        self.projections = []
+
+    async def update_one(self, query, update, upsert=False):
+        self.updates.append(update)
+        doc = next((d for d in self.docs if matches(d, query)), None)
+        if doc is None:
+            assert upsert
+            doc = dict(query)
+            self.docs.append(doc)
+        doc.update(update.get("$set", {}))
+        for field, push in update.get("$push", {}).items():
+            doc[field] = (doc.get(field, []) + push["$each"])[push["$slice"]:]
+
+    async def find_one(self, query, projection=None):
+        self.projections.append(projection)
+        doc = next((d for d in self.docs if matches(d, query)), None)
+        if doc is None:
+            return None
+        return {"queries": doc.get("queries", [])[projection["queries"]["$slice"]:]}
+
+
+class FakeCursor:
+    def __init__(self, docs, projection):
+        self.docs = docs
+        self.projection = projection
+
+    def sort(self, field, direction):
+        self.docs = sorted(self.docs, key=lambda d: d[field], reverse=direction < 0)
+        return self
+
+    async def to_list(self, length=None):
+        hidden = {k for k, v in self.projection.items() if v == 0}
+        return [{k: v for k, v in d.items() if k not in hidden} for d in self.docs]
+
+
+class FakeTurns:
+    def __init__(self):
+        self.docs = []
+
+    async def insert_one(self, doc):
+        self.docs.append(dict(doc, _id=len(self.docs)))
+
+    def find(self, query, projection):
+        return FakeCursor([d for d in self.docs if matches(d, query)], projection)
+
+
+@pytest.fixture
+def stores(monkeypatch):
+    sessions, turns = FakeSessions(), FakeTurns()
+    monkeypatch.setattr(find_specialist_engine, "specialist_history_collection", sessions)
+    monkeypatch.setattr(find_specialist_engine, "specialist_turns_collection", turns)
+    return sessions, turns
+
+
+def save_turns(count, session_id="s-1"):
+    async def run():
+        for i in range(count):
+            await save_specialist_history("u@example.com", f"q{i}", f"Dr. {i}", session_id, {"n": i})
+    asyncio.run(run())
+
+
+def test_session_document_keeps_only_the_recent_turns(stores):
+    sessions, turns = stores
+    save_turns(SESSION_RECENT_TURNS + 3)
+
+    for update in sessions.updates:
+        push = update["$push"]["queries"]
+        assert push["$slice"] == -SESSION_RECENT_TURNS and len(push["$each"]) == 1
+        assert "last_updated" in update["$set"]
+    [doc] = sessions.docs
+    assert [t["query"] for t in doc["queries"]] == [f"q{i}" for i in range(3, SESSION_RECENT_TURNS + 3)]
+    assert len(turns.docs) == SESSION_RECENT_TURNS + 3
+
+
+def test_recent_suggestions_read_only_the_last_entries(stores):
+    sessions, _ = stores
+    save_turns(4)
+
+    recent = asyncio.run(get_recent_specialist_suggestions("u@example.com", 2, "s-1"))
+    assert [t["query"] for t in recent] == ["q2", "q3"]
+    assert sessions.projections[-1] == {"_id": 0, "queries": {"$slice": -2}}
+    assert asyncio.run(get_recent_specialist_suggestions("u@example.com", 2, "other")) == []
+
+
+def test_full_history_comes_from_the_turns_collection(stores):
+    _, turns = stores
+    save_turns(SESSION_RECENT_TURNS + 2)
+    save_turns(1, session_id="s-2")
+
+    history = asyncio.run(get_full_specialist_session_history("u@example.com", "s-1"))
+    assert [t["query"] for t in history] == [f"q{i}" for i in range(SESSION_RECENT_TURNS + 2)]
+    assert set(history[0]) == {"query", "doctor_name", "response", "timestamp"}
+    assert history[-1]["response"] == {"n": SESSION_RECENT_TURNS + 1}
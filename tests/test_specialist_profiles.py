@@ -0,0 +1,151 @@
+# tests/test_specialist_profiles.py
+
+import os
+import sys
+import json
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services import find_specialist_engine
+from app.services.find_specialist_engine import build_specialist_messages, SpecialistCardParser, stream_specialist_cards
+from app.services.specialist_profiles import SpecialistProfileStore, parse_profile, MAX_DESCRIPTION_TOKENS
+from app.utils.tokens import count_tokens
+
+
+def vector(doc):
+    return SimpleNamespace(metadata={"doc": json.dumps(doc)})
+
+
+class FakeIndex:
+    """In-process stand-in for the specialist index: list + fetch only."""
+
+    def __init__(self, docs, gate=None):
+        self.docs = docs
+        self.fetched = []
+        self.gate = gate  # a threading.Event the directory listing waits on
+
+    def list(self, namespace=None, _request_timeout=None):
+        if self.gate:
+            self.gate.wait(5)
+        yield list(self.docs)
+
+    def fetch(self, ids, namespace=None, _request_timeout=None):
+        self.fetched.append(list(ids))
+        return SimpleNamespace(vectors={i: vector(self.docs[i]) for i in ids if i in self.docs})
+
+
+DOCS = {
+    "dr-1": {"name": "Dra. Ana", "medical_specialty": ["Gastroenterologia"], "crm": "CRM-SP 1", "my_story": "Atendo pacientes com doença de Crohn. " * 200},
+    "dr-2": {"name": "Dr. Bruno", "specialization": "Coloproctologia"},
+}
+
+
+def test_profile_card_is_rendered_once_at_parse_time():
+    profile = parse_profile("dr-1", vector(DOCS["dr-1"]).metadata)
+    assert profile.card["Registration"] == ["CRM-SP 1"]
+    assert count_tokens(profile.card["doctor_description"]) <= MAX_DESCRIPTION_TOKENS + 1
+    assert json.loads(profile.rendered) == profile.card
+    assert parse_profile("bad", {"doc": "{not json"}) is None
+
+
+def test_store_loads_directory_once_and_fetches_only_unknown_ids():
+    index = FakeIndex(dict(DOCS))
+    store = SpecialistProfileStore(index)
+
+    async def scenario():
+        await store.ensure_loaded()
+        first = await store.get_many(["dr-2", "dr-1", "gone"])
+        assert len(index.fetched) == 2  # full load + one lookup for the unknown id
+
+        index.docs["dr-3"] = {"name": "Dra. Carla"}
+        second = await store.get_many(["dr-1", "dr-3"])
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert [p.id for p in first] == ["dr-2", "dr-1"]
+    assert [p.card["Name"] for p in second] == ["Dra. Ana", "Dra. Carla"]
+    assert index.fetched[-1] == ["dr-3"]
+
+
+def test_cold_store_fetches_ids_directly_while_the_load_is_in_progress():
+    gate = threading.Event()
+    index = FakeIndex(dict(DOCS), gate=gate)
+    store = SpecialistProfileStore(index)
+
+    async def scenario():
+        started = time.monotonic()
+        profiles = await store.get_many(["dr-2"])
+        elapsed = time.monotonic() - started
+        assert not store.loaded  # the listing is still blocked
+        again = await store.get_many(["dr-1"])   # doesn't queue behind the load either
+        gate.set()
+        await store._load_task
+        return profiles, again, elapsed
+
+    profiles, again, elapsed = asyncio.run(scenario())
+    assert [p.id for p in profiles] == ["dr-2"] and [p.id for p in again] == ["dr-1"]
+    assert elapsed < 1
+    assert store.loaded and len(store) == 2
+    assert index.fetched[:2] == [["dr-2"], ["dr-1"]]
+
+
+def test_prompt_contains_each_profile_exactly_once():
+    profiles = [parse_profile(i, vector(doc).metadata) for i, doc in DOCS.items()]
+    context = "\n".join(p.rendered for p in profiles)
+    history = [{"query": "dor abdominal", "response": {"response_message": "Procure a Dra. Ana."}}]
+
+    messages = build_specialist_messages("e para hemorroidas?", context, history)
+    prompt = "\n".join(m["content"] for m in messages)
+
+    for profile in profiles:
+        assert prompt.count(profile.rendered) == 1
+    assert [m["role"] for m in messages] == ["system", "user", "assistant", "user"]
+
+
+def test_card_parser_emits_each_specialist_as_soon_as_it_closes():
+    cards = [
+        {"response_message": 'Ela trata "DII" {colite}', "Name": "Dra. Ana", "Image": "a.png"},
+        {"response_message": "Proctologia", "Name": "Dr. Bruno", "Image": "b.png"},
+    ]
+    payload = json.dumps({"specialists": cards}, ensure_ascii=False)
+    first_close = payload.index('"a.png"}') + len('"a.png"}')
+
+    parser = SpecialistCardParser()
+    head, tail = payload[:first_close], payload[first_close:]
+    seen = []
+    for i in range(0, len(head), 7):  # arbitrary stream boundaries
+        seen.extend(parser.feed(head[i:i + 7]))
+    assert seen == cards[:1]
+
+    seen.extend(parser.feed(tail))
+    assert seen == cards
+    assert parser.closed
+
+
+def test_broken_stream_reports_the_cards_already_sent(monkeypatch):
+    card = {"response_message": "Proctologia", "Name": "Dr. Bruno", "Image": "b.png"}
+    pieces = ['{"specialists": [', json.dumps(card), ', {"Name": "Dr']
+
+    async def chunks():
+        for piece in pieces:
+            yield SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+        raise ConnectionError("stream reset")
+
+    async def create(**kwargs):
+        return chunks()
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(find_specialist_engine, "get_async_openai", lambda: client)
+
+    async def collect():
+        return [event async for event in stream_specialist_cards("hemorroidas")]
+
+    events = asyncio.run(collect())
+    assert events == [
+        {"type": "card", "index": 0, "specialist": card},
+        {"type": "done", "response": {"specialists": [card]}},
+    ]
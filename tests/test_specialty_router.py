@@ -0,0 +1,71 @@
+# tests/test_specialty_router.py
+
+import os
+import sys
+import json
+import time
+import asyncio
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.specialist_profiles import parse_profile
+from app.core.deadline import request_deadline
+from app.services import specialty_router
+from app.services.specialty_router import SpecialtyIndex, route_specialist_query
+
+DOCS = {
+    "dr-1": {"name": "Dra. Sabrina", "specialization": "Gastroenterologia"},
+    "dr-2": {"name": "Dr. Alexander", "specialization": "Gastrocirurgia e Coloproctologia"},
+    "dr-3": {"name": "Dra. Carla", "specialization": "Nutrição"},
+    "dr-4": {"name": "Dra. Paula", "my_story": "Sou nutricionista clínica, focada em DII."},
+    "dr-5": {"name": "Dr. Renato", "specialization": "Reumatologia", "my_story": "Trabalho com nutricionistas."},
+}
+
+
+def build_index():
+    return SpecialtyIndex(parse_profile(i, {"doc": json.dumps(d)}) for i, d in DOCS.items())
+
+
+def names(profiles):
+    return [p.card["Name"] for p in profiles] if profiles is not None else None
+
+
+def test_explicit_specialty_requests_resolve_to_candidates():
+    index = build_index()
+    assert names(index.lookup("Preciso de um nutricionista")) == ["Dra. Carla", "Dra. Paula"]
+    assert names(index.lookup("I need a dietitian")) == ["Dra. Carla", "Dra. Paula"]
+    assert names(index.lookup("gastroenterologista em SP")) == ["Dra. Sabrina"]
+    assert names(index.lookup("proctologista ou reumatologista?")) == ["Dr. Alexander", "Dr. Renato"]
+
+
+def test_symptoms_negations_and_unknown_specialties_fall_through():
+    index = build_index()
+    assert index.lookup("tenho dor abdominal e diarreia") is None
+    assert index.lookup("não quero um gastroenterologista") is None
+    assert index.lookup("quero outro nutricionista") is None
+    assert index.lookup("preciso de um dermatologista") is None
+
+
+def test_cold_directory_falls_back_to_retrieval_within_the_budget(monkeypatch):
+    class ColdStore:
+        loaded = False
+        version = 0
+
+        async def ensure_loaded(self):
+            await asyncio.sleep(0.5)
+            self.loaded = True
+
+    store = ColdStore()
+    monkeypatch.setattr(specialty_router, "specialist_profiles", store)
+
+    async def route():
+        with request_deadline("specialist", 0.4):
+            started = time.monotonic()
+            result = await route_specialist_query("preciso de um nutricionista")
+            elapsed = time.monotonic() - started
+        await asyncio.sleep(0.6)   # the load carried on in the background
+        return result, elapsed
+
+    result, elapsed = asyncio.run(route())
+    assert result is None and elapsed < 0.3
+    assert store.loaded
@@ -0,0 +1,80 @@
+# tests/test_startup_time.py
+
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Wall-clock budgets depend on the machine: the timing check is an opt-in benchmark
+# (RUN_BENCHMARKS=1); test_heavy_dependencies_are_deferred guards the property itself
+IMPORT_BUDGET_SECONDS = float(os.getenv("IMPORT_BUDGET_SECONDS", "1.0"))
+
+# Must only be imported by the code path that uses them, never at boot
+DEFERRED_MODULES = [
+    "pandas",
+    "openpyxl",
+    "pyarrow",
+    "pytesseract",
+    "pdf2image",
+    "docx",
+    "PIL",
+    "googleapiclient",
+    "firecrawl",
+    "sendgrid",
+    "pinecone",
+    "openai",
+    "bs4",
+]
+
+# Dummy settings and unroutable endpoints: importing the app must not need the network
+REQUIRED_SETTINGS = [
+    "OPENAI_API_KEY", "PINECONE_API_KEY", "PINECONE_ENV", "PINECONE_INDEX", "FIRECRAWL_API_KEY",
+    "SECRET_KEY", "KOMMO_CLIENT_ID", "KOMMO_CLIENT_SECRET", "KOMMO_SUBDOMAIN",
+    "GOOGLE_CLIENT_ID", "GOOGLE_CLIENT_SECRET", "GOOGLE_REDIRECT_URI",
+]
+OFFLINE_ENV = {
+    **{name: "offline" for name in REQUIRED_SETTINGS},
+    "MONGODB_URI": "mongodb://127.0.0.1:1",
+    "HTTP_PROXY": "http://127.0.0.1:1",
+    "HTTPS_PROXY": "http://127.0.0.1:1",
+}
+
+
+def import_app():
+    """Imports `app` in a fresh interpreter under -X importtime; returns (stderr, loaded modules)."""
+    env = {**os.environ}
+    for key, value in OFFLINE_ENV.items():
+        env.setdefault(key, value)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import sys, app; print(' '.join(sys.modules))"],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=60,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    return result.stderr, set(result.stdout.split())
+
+
+def cumulative_seconds(importtime_log: str, module: str) -> float:
+    match = re.search(rf"^import time:\s+\d+ \|\s+(\d+) \| {re.escape(module)}$", importtime_log, re.MULTILINE)
+    assert match, f"{module} missing from -X importtime output"
+    return int(match.group(1)) / 1_000_000
+
+
+@pytest.mark.skipif(not os.getenv("RUN_BENCHMARKS"), reason="benchmark; set RUN_BENCHMARKS=1")
+def test_app_imports_within_budget():
+    # Best of three: a single cold run mostly measures whatever else the machine is doing
+    best = min(cumulative_seconds(import_app()[0], "app") for _ in range(3))
+    assert best < IMPORT_BUDGET_SECONDS
+
+
+def test_heavy_dependencies_are_deferred():
+    _, modules = import_app()
+    assert not [m for m in DEFERRED_MODULES if m in modules]
+
+
+def test_import_writes_no_credentials_file():
+    import_app()
+    assert not os.path.exists(os.path.join(ROOT, "app", "credentials"))
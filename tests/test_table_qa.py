@@ -0,0 +1,47 @@
+# tests/test_table_qa.py
+
+import io
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.table_qa import detect_aggregate, run_aggregate
+from app.services.tabular_ingestor import table_to_parquet
+
+CSV = (
+    "visit,clinic,Calprotectina\n"
+    "1,SP,100\n"
+    "2,SP,200\n"
+    "3,RJ,n/a\n"
+    "4,RJ,\"300,5\"\n"
+).encode()
+
+
+def load_table() -> pd.DataFrame:
+    [table] = table_to_parquet(".csv", CSV)
+    assert table["row_count"] == 4
+    return pd.read_parquet(io.BytesIO(table["parquet"]))
+
+
+def test_portuguese_mean_is_computed_over_numeric_cells():
+    df = load_table()
+    query = detect_aggregate("Qual a média de calprotectina nessas visitas?", list(df.columns))
+    assert (query.op, query.column, query.group_by) == ("mean", "Calprotectina", None)
+    assert run_aggregate(df, query) == "mean(Calprotectina) over 3 numeric values = 200.1667"
+
+
+def test_group_by_and_non_aggregate_questions():
+    df = load_table()
+    query = detect_aggregate("max calprotectina by clinic", list(df.columns))
+    assert run_aggregate(df, query).splitlines()[1:] == ["- RJ: 300.5", "- SP: 200"]
+    assert detect_aggregate("what is crohn's disease?", list(df.columns)) is None
+
+
+def test_aggregate_over_a_text_column_gives_no_answer():
+    df = load_table()
+    query = detect_aggregate("max clinic", list(df.columns))
+    assert query.column == "clinic"
+    assert run_aggregate(df, query) is None
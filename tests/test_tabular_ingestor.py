@@ -0,0 +1,84 @@
+# tests/test_tabular_ingestor.py
+
+import asyncio
+import os
+import sys
+
+import pytest
+from fastapi import HTTPException
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services import file_ingestor
+from app.services.file_ingestor import ingest_file_bytes
+from app.services.tabular_ingestor import group_rows, iter_table_chunks
+from app.utils.tokens import count_tokens
+
+HEADER = "patient,exam,result"
+CSV = (HEADER + "\n" + "".join(f"p{i},Calprotectina fecal,{i * 10}\n" for i in range(1, 201))).encode()
+
+
+def test_every_chunk_repeats_the_label_and_header():
+    chunks = list(iter_table_chunks(".csv", CSV, "exams.csv"))
+    assert len(chunks) > 1
+    for chunk in chunks:
+        title, header, *rows = chunk.text.split("\n")
+        assert title == f"Table: exams.csv rows {chunk.row_start}-{chunk.row_end}"
+        assert header == HEADER
+        assert len(rows) == chunk.row_count
+
+
+def test_row_ranges_cover_the_table_in_order():
+    chunks = list(iter_table_chunks(".csv", CSV, "exams.csv"))
+    assert chunks[0].row_start == 1 and chunks[-1].row_end == 200
+    for before, after in zip(chunks, chunks[1:]):
+        assert after.row_start == before.row_end + 1
+    assert chunks[0].as_vector_chunk()["metadata"] == {"row_start": 1, "row_end": chunks[0].row_end}
+    assert chunks[0].text.split("\n")[2] == "p1,Calprotectina fecal,10"
+
+
+@pytest.mark.parametrize("row", ["p{i},Calprotectina fecal,{i}", "{i},,1"])
+def test_chunks_stay_within_the_token_bound(row):
+    rows = [(i, row.format(i=i)) for i in range(1, 301)]
+    chunks = list(group_rows(rows, HEADER, "Table: exams.csv", max_tokens=120))
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk.text) <= 120 for chunk in chunks)
+    assert sum(chunk.row_count for chunk in chunks) == 300
+
+
+def test_oversized_row_becomes_its_own_chunk():
+    rows = [(1, "short"), (2, "x " * 200), (3, "short")]
+    chunks = list(group_rows(rows, HEADER, "Table: t.csv", max_tokens=60))
+    assert [(c.row_start, c.row_end) for c in chunks] == [(1, 1), (2, 2), (3, 3)]
+
+
+def test_empty_tables_give_no_chunks():
+    assert list(iter_table_chunks(".csv", b"", "empty.csv")) == []
+    assert list(iter_table_chunks(".csv", (HEADER + "\n").encode(), "header.csv")) == []
+
+
+@pytest.mark.parametrize("content", [b"", (HEADER + "\n").encode()])
+def test_empty_table_upload_is_a_400(monkeypatch, content):
+    upserts = []
+
+    async def fake_upsert(doc_id, chunks, start_index=0):
+        upserts.append(chunks)
+        return len(chunks)
+
+    async def fake_delete(doc_id, start, stop):
+        return None
+
+    monkeypatch.setattr(file_ingestor, "upsert_chunks_to_pinecone", fake_upsert)
+    monkeypatch.setattr(file_ingestor, "delete_chunk_range", fake_delete)
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(ingest_file_bytes("empty.csv", content, "admin@example.com"))
+    assert exc.value.status_code == 400
+    assert exc.value.detail == "CSV contains no data."
+    assert upserts == []
+
+
+def test_unsupported_upload_keeps_its_400():
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(ingest_file_bytes("notes.exe", b"MZ", "admin@example.com"))
+    assert exc.value.status_code == 400
@@ -0,0 +1,72 @@
+# tests/test_text_extraction.py
+
+import asyncio
+import io
+import json
+import os
+import sys
+
+import docx
+import pytest
+from fastapi import HTTPException
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services import file_ingestor
+from app.services.text_extraction import EXTRACTORS, extract_text
+
+
+def test_txt_is_decoded_from_memory():
+    content = "Consulta de retorno às 14h".encode("utf-8")
+    assert extract_text(".txt", content) == "Consulta de retorno às 14h"
+    assert extract_text(".txt", memoryview(content)) == "Consulta de retorno às 14h"
+
+
+def test_undecodable_txt_is_a_400():
+    with pytest.raises(HTTPException) as exc:
+        extract_text(".txt", b"\xff\xfe\xfa")
+    assert exc.value.status_code == 400
+
+
+def test_json_is_pretty_printed():
+    content = json.dumps({"exame": "Calprotectina", "valor": 120}, ensure_ascii=False).encode()
+    assert json.loads(extract_text(".json", content)) == {"exame": "Calprotectina", "valor": 120}
+    assert extract_text(".json", '{"nome": "João"}'.encode("latin1")) == '{\n  "nome": "João"\n}'
+
+
+def test_malformed_json_is_a_400():
+    with pytest.raises(HTTPException) as exc:
+        extract_text(".json", b"{not json")
+    assert exc.value.status_code == 400
+
+
+def test_generated_docx_paragraphs_are_extracted():
+    document = docx.Document()
+    document.add_paragraph("Laudo de colonoscopia")
+    document.add_paragraph("Sem alterações.")
+    buf = io.BytesIO()
+    document.save(buf)
+    assert extract_text(".docx", buf.getvalue()) == "Laudo de colonoscopia\nSem alterações."
+
+
+def test_csv_goes_to_the_table_ingestor_not_the_text_extractors(monkeypatch):
+    assert ".csv" not in EXTRACTORS
+    calls = []
+
+    async def fake_ingest_table_bytes(filename, ext, content, user_id):
+        calls.append((filename, ext, content))
+        return {"filename": filename}
+
+    monkeypatch.setattr(file_ingestor, "ingest_table_bytes", fake_ingest_table_bytes)
+    monkeypatch.setattr(file_ingestor, "extract_text", lambda ext, content: pytest.fail("extract_text called"))
+    result = asyncio.run(file_ingestor.ingest_file_bytes("exams.csv", b"a,b\n1,2\n", "admin@example.com"))
+    assert result == {"filename": "exams.csv"}
+    assert calls == [("exams.csv", ".csv", b"a,b\n1,2\n")]
+
+
+@pytest.mark.parametrize("ext", [".exe", ".doc", ""])
+def test_unknown_extension_is_rejected(ext):
+    with pytest.raises(HTTPException) as exc:
+        extract_text(ext, b"anything")
+    assert exc.value.status_code == 400
+    assert exc.value.detail == f"Unsupported file type: {ext}"
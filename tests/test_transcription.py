@@ -0,0 +1,84 @@
+# tests/test_transcription.py
+
+import os
+import sys
+import asyncio
+
+import httpx
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services import transcription
+from app.services.transcription import AssemblyAIClient, TranscriptionError, Transcriber
+
+
+class FakeTranscripts:
+    def __init__(self):
+        self.docs = {}
+
+    async def find_one(self, query, projection=None):
+        return self.docs.get(query["_id"])
+
+    async def update_one(self, query, update, upsert=False):
+        self.docs.setdefault(query["_id"], {}).update(update["$set"])
+
+
+def assemblyai(handler):
+    return AssemblyAIClient("key", base_url="https://aai.test", transport=httpx.MockTransport(handler))
+
+
+def test_transcripts_are_polled_without_blocking_and_cached_by_content(monkeypatch):
+    monkeypatch.setattr(transcription, "POLL_INTERVAL_SECONDS", 0.01)
+    calls = {"upload": 0, "start": 0, "poll": 0}
+
+    def handler(request):
+        assert request.headers["authorization"] == "key"
+        if request.url.path == "/v2/upload":
+            calls["upload"] += 1
+            assert request.read() == b"voice-note"
+            return httpx.Response(200, json={"upload_url": "https://cdn.test/a"})
+        if request.url.path == "/v2/transcript":
+            calls["start"] += 1
+            return httpx.Response(200, json={"id": "t1"})
+        calls["poll"] += 1
+        status = "completed" if calls["poll"] >= 3 else "processing"
+        return httpx.Response(200, json={"status": status, "text": "hello doctor"})
+
+    transcriber = Transcriber(assemblyai(handler), collection=FakeTranscripts())
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.001)
+
+        ticking = asyncio.create_task(ticker())
+        first = await asyncio.gather(*(transcriber.transcribe(b"voice-note") for _ in range(3)))
+        again = await transcriber.transcribe(b"voice-note")
+        ticking.cancel()
+        return first, again, ticks
+
+    first, again, ticks = asyncio.run(run())
+    assert first == ["hello doctor"] * 3 and again == "hello doctor"
+    assert calls["upload"] == 1 and calls["start"] == 1
+    assert ticks > 3  # the loop kept running while the transcript was pending
+
+
+def test_transcription_error_is_reported_as_client_error():
+    def handler(request):
+        if request.url.path == "/v2/upload":
+            return httpx.Response(200, json={"upload_url": "https://cdn.test/a"})
+        if request.url.path == "/v2/transcript":
+            return httpx.Response(200, json={"id": "t1"})
+        return httpx.Response(200, json={"status": "error", "error": "unsupported format"})
+
+    transcriber = Transcriber(assemblyai(handler), collection=FakeTranscripts())
+    try:
+        asyncio.run(transcriber.transcribe(b"bad"))
+    except TranscriptionError as e:
+        assert e.status_code == 400 and "unsupported format" in str(e)
+    else:
+        raise AssertionError("expected TranscriptionError")